@@ -0,0 +1,28 @@
+"""Start-up time of fresh interpreters, which every CLI command and worker process pays"""
+
+import os
+import subprocess
+import sys
+
+import pytest
+
+ROUNDS = 5
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def run(*args):
+    subprocess.run([sys.executable, *args], check=True, capture_output=True, cwd=ROOT)
+
+
+@pytest.mark.parametrize(
+    "module",
+    ["reconchess_tools.cli.main", "reconchess_tools.analysis", "reconchess_tools.ui"],
+)
+def bench_import(benchmark, module):
+    benchmark.pedantic(run, args=("-c", f"import {module}"), rounds=ROUNDS)
+
+
+def bench_cli_help(benchmark):
+    benchmark.pedantic(
+        run, args=("-m", "reconchess_tools.cli.main", "--help"), rounds=ROUNDS
+    )
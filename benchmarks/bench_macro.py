@@ -0,0 +1,28 @@
+import random
+
+import pytest
+
+from reconchess_tools.analysis import analyze_actions
+from reconchess_tools.simulator import simulate_games
+
+ROUNDS = 3
+
+
+@pytest.fixture(scope="module")
+def actions():
+    random.seed(0)
+    return simulate_games(1, max_turns=20)[0].actions()
+
+
+def bench_analyze_game(benchmark, actions):
+    benchmark.pedantic(
+        lambda: list(analyze_actions(actions, max_boards=200)), rounds=ROUNDS
+    )
+
+
+def bench_simulate_games(benchmark):
+    def simulate():
+        random.seed(0)
+        simulate_games(20)
+
+    benchmark.pedantic(simulate, rounds=ROUNDS)
@@ -0,0 +1,53 @@
+from reconchess_tools.mht import MultiHypothesisTracker
+from reconchess_tools.strategy import SENSE_SQUARES
+from reconchess_tools.utilities import simulate_move, simulate_sense
+
+ROUNDS = 5
+
+
+def tracker(position, after_sense=False, after_move=False):
+    """A fresh MHT at the recorded position, optionally advanced through the recorded actions"""
+    mht = MultiHypothesisTracker()
+    mht.boards = [board.copy(stack=False) for board in position.boards]
+    if after_sense or after_move:
+        mht.sense(position.sense, simulate_sense(position.true_board, position.sense))
+    if after_move:
+        mht.move(position.requested_move, *taken_move(position))
+    return mht
+
+
+def taken_move(position):
+    return simulate_move(position.true_board, position.requested_move)
+
+
+def bench_mht_sense(benchmark, position):
+    sense_result = simulate_sense(position.true_board, position.sense)
+    benchmark.pedantic(
+        lambda mht: mht.sense(position.sense, sense_result),
+        setup=lambda: ((tracker(position),), {}),
+        rounds=ROUNDS,
+    )
+
+
+def bench_mht_move(benchmark, position):
+    benchmark.pedantic(
+        lambda mht: mht.move(position.requested_move, *taken_move(position)),
+        setup=lambda: ((tracker(position, after_sense=True),), {}),
+        rounds=ROUNDS,
+    )
+
+
+def bench_mht_op_move(benchmark, position):
+    benchmark.pedantic(
+        lambda mht: mht.op_move(position.op_capture_square),
+        setup=lambda: ((tracker(position, after_move=True),), {}),
+        rounds=ROUNDS,
+    )
+
+
+def bench_mht_speculate_sense(benchmark, position):
+    benchmark.pedantic(
+        lambda mht: mht.speculate_sense(SENSE_SQUARES),
+        setup=lambda: ((tracker(position),), {}),
+        rounds=ROUNDS,
+    )
@@ -0,0 +1,68 @@
+from collections import defaultdict
+
+import chess
+import pytest
+
+from reconchess_tools.mht import MultiHypothesisTracker
+from reconchess_tools.strategy import (
+    SENSE_SQUARES,
+    certain_win,
+    minimax_sense,
+    non_dominated_sense,
+    ranked_choice_vote,
+)
+from reconchess_tools.utilities import requestable_moves, simulate_move
+
+
+@pytest.fixture
+def speculation(position):
+    mht = MultiHypothesisTracker()
+    mht.boards = position.boards
+    mht.speculate_sense(SENSE_SQUARES)
+    return mht.sense_speculation
+
+
+@pytest.fixture
+def votes(position):
+    """Ranked votes over the recorded boards, as the example bot collects them
+
+    The example bot ranks each board's moves with Stockfish. To keep the engine out of the
+    benchmark, each board instead votes for its first few pseudo-legal moves.
+    """
+    votes = []
+    for board in position.boards[:1200]:
+        move_lookup = defaultdict(list)
+        for requested_move in requestable_moves(board):
+            move_lookup[simulate_move(board, requested_move)[0]].append(requested_move)
+        op_king_square = board.king(not board.turn)
+        king_attackers = board.attackers(board.turn, op_king_square)
+        if king_attackers:
+            votes.append(
+                [
+                    [
+                        move
+                        for attacker in king_attackers
+                        for move in move_lookup[chess.Move(attacker, op_king_square)]
+                    ]
+                ]
+            )
+        else:
+            ranked = [move_lookup[move] for move in board.pseudo_legal_moves]
+            votes.append([group for group in ranked if group][:4])
+    return [vote for vote in votes if vote]
+
+
+def bench_non_dominated_sense(benchmark, speculation):
+    benchmark(non_dominated_sense, speculation)
+
+
+def bench_minimax_sense(benchmark, speculation):
+    benchmark(minimax_sense, speculation)
+
+
+def bench_certain_win(benchmark, position):
+    benchmark(certain_win, position.boards)
+
+
+def bench_ranked_choice_vote(benchmark, votes):
+    benchmark(ranked_choice_vote, votes)
@@ -0,0 +1,19 @@
+from reconchess_tools.utilities import (
+    possible_requested_moves,
+    simulate_move,
+    simulate_sense,
+)
+
+
+def bench_simulate_sense(benchmark, position):
+    benchmark(lambda: [simulate_sense(b, position.sense) for b in position.boards])
+
+
+def bench_simulate_move(benchmark, position):
+    benchmark(
+        lambda: [simulate_move(b, position.requested_move) for b in position.boards]
+    )
+
+
+def bench_possible_requested_moves(benchmark, position):
+    benchmark(lambda: [list(possible_requested_moves(b)) for b in position.boards])
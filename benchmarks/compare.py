@@ -0,0 +1,81 @@
+"""Compare benchmark results against the stored baseline
+
+Usage, from the repository root:
+
+    python -m pytest benchmarks --benchmark-json=benchmark.json
+    python benchmarks/compare.py benchmark.json
+
+Exits with status 1 if any benchmark's median time regressed by more than the threshold relative
+to benchmarks/baseline.json. Pass --update to replace the baseline with the given results instead.
+Timings depend on the machine, so the baseline should be updated from the machine that runs the
+comparison.
+"""
+
+import argparse
+import json
+import os
+import sys
+from typing import Dict
+
+BASELINE_PATH = os.path.join(os.path.dirname(__file__), "baseline.json")
+
+
+def medians(results_path: str) -> Dict[str, float]:
+    """Read the median seconds of each benchmark from pytest-benchmark's JSON output"""
+    with open(results_path) as f:
+        results = json.load(f)
+    return {
+        benchmark["name"]: benchmark["stats"]["median"]
+        for benchmark in results["benchmarks"]
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("results", help="JSON output of pytest --benchmark-json")
+    parser.add_argument("--baseline", default=BASELINE_PATH)
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=0.25,
+        help="Largest tolerated slowdown as a fraction of the baseline median",
+    )
+    parser.add_argument("--update", action="store_true")
+    args = parser.parse_args()
+
+    current = medians(args.results)
+    if args.update:
+        with open(args.baseline, "w") as f:
+            json.dump(current, f, indent=2, sort_keys=True)
+            f.write("\n")
+        print(f"Wrote {len(current)} baseline medians to {args.baseline}")
+        return
+
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    regressions = []
+    for name in sorted(set(baseline) | set(current)):
+        if name not in current:
+            print(f"{name:50} missing from results")
+            continue
+        if name not in baseline:
+            print(f"{name:50} {current[name] * 1e3:10.3f} ms (new)")
+            continue
+        change = current[name] / baseline[name] - 1
+        flag = ""
+        if change > args.threshold:
+            regressions.append(name)
+            flag = "  REGRESSION"
+        print(
+            f"{name:50} {current[name] * 1e3:10.3f} ms "
+            f"(baseline {baseline[name] * 1e3:.3f} ms, {change:+.0%}){flag}"
+        )
+    if regressions:
+        print(
+            f"{len(regressions)} benchmarks regressed by more than {args.threshold:.0%}"
+        )
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,46 @@
+import gzip
+import json
+import os
+from typing import List, NamedTuple, Optional
+
+import chess
+import pytest
+
+CORPUS_PATH = os.path.join(os.path.dirname(__file__), "data", "hypotheses.json.gz")
+
+
+class Position(NamedTuple):
+    """A recorded mid-game hypothesis set and the actions taken from it"""
+
+    true_board: chess.Board
+    boards: List[chess.Board]
+    sense: chess.Square
+    requested_move: chess.Move
+    op_capture_square: Optional[chess.Square]
+
+
+def load_corpus():
+    with gzip.open(CORPUS_PATH, "rt") as f:
+        corpus = json.load(f)
+    return {
+        name: Position(
+            chess.Board(position["true_board"]),
+            [chess.Board(fen) for fen in position["boards"]],
+            chess.parse_square(position["sense"]),
+            chess.Move.from_uci(position["requested_move"]),
+            None
+            if position["op_capture_square"] is None
+            else chess.parse_square(position["op_capture_square"]),
+        )
+        for name, position in corpus["positions"].items()
+    }
+
+
+_CORPUS = {}
+
+
+@pytest.fixture(params=["small", "medium", "large"])
+def position(request) -> Position:
+    if not _CORPUS:
+        _CORPUS.update(load_corpus())
+    return _CORPUS[request.param]
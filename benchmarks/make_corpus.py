@@ -0,0 +1,81 @@
+"""Regenerate the benchmark corpus of mid-game hypothesis sets
+
+Plays seeded random games while tracking the sensing player's MHT, and records the first position
+whose hypothesis set falls into each size bucket, together with the true board and the actions
+taken from it. Run from the repository root with `python benchmarks/make_corpus.py`.
+"""
+
+import gzip
+import json
+import os
+import random
+
+import chess
+
+from reconchess_tools.mht import MultiHypothesisTracker, board_fingerprint
+from reconchess_tools.strategy import SENSE_SQUARES
+from reconchess_tools.utilities import (
+    random_requestable_move,
+    simulate_move,
+    simulate_sense,
+)
+
+CORPUS_PATH = os.path.join(os.path.dirname(__file__), "data", "hypotheses.json.gz")
+# Name and range of hypothesis set sizes of the recorded positions
+SIZES = {"small": (20, 100), "medium": (200, 800), "large": (2_000, 3_000)}
+MAX_BOARDS = 3_000
+
+
+def positions_from_game(seed: int):
+    rng = random.Random(seed)
+    random.seed(seed)
+    board = chess.Board()
+    active, waiting = MultiHypothesisTracker(), MultiHypothesisTracker()
+    while board.king(chess.WHITE) is not None and board.king(chess.BLACK) is not None:
+        if board.halfmove_clock >= 100:
+            return
+        sense = rng.choice(SENSE_SQUARES)
+        requested_move = random_requestable_move(board)
+        taken_move, capture_square = simulate_move(board, requested_move)
+        after_move = board.copy(stack=False)
+        after_move.push(taken_move)
+        if after_move.king(not board.turn) is None:
+            return
+        op_requested_move = random_requestable_move(after_move)
+        _, op_capture_square = simulate_move(after_move, op_requested_move)
+        fingerprints = {board_fingerprint(b) for b in active.boards}
+        if board.fullmove_number > 3 and board_fingerprint(board) in fingerprints:
+            yield {
+                "true_board": board.fen(),
+                "boards": [b.fen() for b in active.boards],
+                "sense": chess.SQUARE_NAMES[sense],
+                "requested_move": requested_move.uci(),
+                "op_capture_square": None
+                if op_capture_square is None
+                else chess.SQUARE_NAMES[op_capture_square],
+            }
+        active.sense(sense, simulate_sense(board, sense))
+        active.move(requested_move, taken_move, capture_square)
+        waiting.boards = waiting.boards[:MAX_BOARDS]
+        waiting.op_move(capture_square)
+        board.push(taken_move)
+        active, waiting = waiting, active
+
+
+def main():
+    corpus = {}
+    seed = 0
+    while len(corpus) < len(SIZES):
+        for position in positions_from_game(seed):
+            for name, (low, high) in SIZES.items():
+                if name not in corpus and low <= len(position["boards"]) <= high:
+                    corpus[name] = position
+                    print(f"{name}: {len(position['boards']):,.0f} boards")
+        seed += 1
+    os.makedirs(os.path.dirname(CORPUS_PATH), exist_ok=True)
+    with gzip.open(CORPUS_PATH, "wt") as f:
+        json.dump({"version": 1, "positions": corpus}, f, indent=0, sort_keys=True)
+
+
+if __name__ == "__main__":
+    main()
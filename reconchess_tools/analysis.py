@@ -0,0 +1,227 @@
+"""Headless MHT analysis of recorded games
+
+This runs the same sequence of MHT updates as the replay UI (each player senses and moves, then
+the other player's MHT is expanded by the opponent move) without any rendering, and records
+per-turn metrics: the number of hypotheses before and after each step and the time each step took.
+
+analyze_corpus runs that analysis over a directory of saved GameHistory files on a process pool and
+writes the metrics to CSV or Parquet. Progress is saved after every game, so an interrupted run
+resumes where it left off when started again with the same output.
+"""
+
+import csv
+import os
+from multiprocessing import Pool
+from time import perf_counter
+from typing import Dict, Iterable, Iterator, List, Optional, Sequence, Set
+
+import chess
+from reconchess import GameHistory
+from tqdm import tqdm
+
+from reconchess_tools.mht import MultiHypothesisTracker
+from reconchess_tools.utilities import simulate_move, simulate_sense
+
+METRIC_FIELDS = [
+    "game",
+    "turn",
+    "color",
+    "sense",
+    "requested_move",
+    "taken_move",
+    "capture_square",
+    "boards_before_sense",
+    "boards_after_sense",
+    "sense_seconds",
+    "boards_before_move",
+    "boards_after_move",
+    "move_seconds",
+    "op_boards_before_op_move",
+    "op_boards_after_op_move",
+    "op_move_seconds",
+]
+
+
+def actions_from_history(history: GameHistory) -> List[str]:
+    """Get the sense squares and requested moves of a game in the replay's action notation"""
+    actions = []
+    for turn in history.turns():
+        sense = history.sense(turn)
+        actions.append("00" if sense is None else chess.SQUARE_NAMES[sense])
+        actions.append((history.requested_move(turn) or chess.Move.null()).uci())
+    return actions
+
+
+def analyze_actions(
+    actions: Sequence[str], max_boards: Optional[int] = None
+) -> Iterator[Dict]:
+    """Replay a game through both players' MHTs, yielding one row of metrics per turn
+
+    If max_boards is given, each MHT is truncated to that many boards before expanding it by an
+    opponent move, as the example bot does, so a single explosive game cannot stall a batch.
+    """
+    board = chess.Board()
+    active, waiting = MultiHypothesisTracker(), MultiHypothesisTracker()
+    for turn, (sense, requested_move) in enumerate(zip(actions[::2], actions[1::2])):
+        row = {"turn": turn, "color": chess.COLOR_NAMES[board.turn], "sense": sense}
+        square = None if sense == "00" else chess.parse_square(sense)
+
+        row["boards_before_sense"] = len(active.boards)
+        start = perf_counter()
+        active.sense(square, simulate_sense(board, square))
+        row["sense_seconds"] = perf_counter() - start
+        row["boards_after_sense"] = len(active.boards)
+
+        requested_move = chess.Move.from_uci(requested_move)
+        taken_move, capture_square = simulate_move(board, requested_move)
+        row["requested_move"] = requested_move.uci()
+        row["taken_move"] = taken_move.uci()
+        row["capture_square"] = (
+            None if capture_square is None else chess.SQUARE_NAMES[capture_square]
+        )
+        row["boards_before_move"] = len(active.boards)
+        start = perf_counter()
+        active.move(requested_move, taken_move, capture_square)
+        row["move_seconds"] = perf_counter() - start
+        row["boards_after_move"] = len(active.boards)
+
+        if max_boards is not None:
+            waiting.boards = waiting.boards[:max_boards]
+        row["op_boards_before_op_move"] = len(waiting.boards)
+        start = perf_counter()
+        waiting.op_move(capture_square)
+        row["op_move_seconds"] = perf_counter() - start
+        row["op_boards_after_op_move"] = len(waiting.boards)
+
+        yield row
+        board.push(taken_move)
+        active, waiting = waiting, active
+
+
+def history_paths(history_dir: str) -> List[str]:
+    """Find the saved GameHistory files in a directory tree, as paths relative to it"""
+    paths = []
+    for root, _, files in os.walk(history_dir):
+        for file in files:
+            if file.endswith(".json"):
+                paths.append(os.path.relpath(os.path.join(root, file), history_dir))
+    return sorted(paths)
+
+
+def _analyze_file(args):
+    history_dir, game, max_boards = args
+    try:
+        history = GameHistory.from_file(os.path.join(history_dir, game))
+        rows = list(analyze_actions(actions_from_history(history), max_boards))
+    except Exception as e:
+        return game, None, repr(e)
+    for row in rows:
+        row["game"] = game
+    return game, rows, None
+
+
+class _CsvMetricsWriter:
+    """Append each game's rows to one CSV file, recording finished games in a sidecar file
+
+    A game's rows are only marked done after they are flushed, and rows of unfinished games are
+    dropped on resume, so the CSV never contains partial or duplicated games.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.done_path = path + ".done"
+        self.done: Set[str] = set()
+        if os.path.exists(self.done_path):
+            with open(self.done_path) as f:
+                self.done = {line.rstrip("\n") for line in f if line.strip()}
+        if os.path.exists(path):
+            with open(path, newline="") as f:
+                rows = [row for row in csv.DictReader(f) if row["game"] in self.done]
+            self._write_rows(rows, mode="w")
+        else:
+            self._write_rows([], mode="w")
+
+    def is_done(self, game: str) -> bool:
+        return game in self.done
+
+    def _write_rows(self, rows: Iterable[Dict], mode: str):
+        with open(self.path, mode, newline="") as f:
+            writer = csv.DictWriter(f, METRIC_FIELDS)
+            if mode == "w":
+                writer.writeheader()
+            writer.writerows(rows)
+
+    def write(self, game: str, rows: List[Dict]):
+        self._write_rows(rows, mode="a")
+        with open(self.done_path, "a") as f:
+            f.write(game + "\n")
+        self.done.add(game)
+
+
+class _ParquetMetricsWriter:
+    """Write each game's rows to its own part file of a Parquet dataset directory
+
+    Part files are written under a temporary name and renamed into place, so any part file that
+    exists is complete and the set of part files is the set of finished games.
+    """
+
+    def __init__(self, path: str):
+        try:
+            import pyarrow
+            import pyarrow.parquet
+        except ImportError as e:
+            raise ImportError("Parquet output requires pyarrow") from e
+        self.pyarrow = pyarrow
+        self.path = path
+        os.makedirs(path, exist_ok=True)
+        self.done_parts = {
+            file for file in os.listdir(path) if file.endswith(".parquet")
+        }
+
+    @staticmethod
+    def _part(game: str) -> str:
+        return game.replace(os.sep, "__") + ".parquet"
+
+    def is_done(self, game: str) -> bool:
+        return self._part(game) in self.done_parts
+
+    def write(self, game: str, rows: List[Dict]):
+        table = self.pyarrow.Table.from_pylist(
+            [{field: row[field] for field in METRIC_FIELDS} for row in rows]
+        )
+        part_path = os.path.join(self.path, self._part(game))
+        self.pyarrow.parquet.write_table(table, part_path + ".tmp")
+        os.replace(part_path + ".tmp", part_path)
+        self.done_parts.add(self._part(game))
+
+
+def analyze_corpus(
+    history_dir: str,
+    output: str,
+    output_format: str = "csv",
+    processes: Optional[int] = None,
+    max_boards: Optional[int] = None,
+) -> List[str]:
+    """Analyze every saved game in a directory, skipping games already in the output
+
+    Returns the games that could not be analyzed.
+    """
+    if output_format == "csv":
+        writer = _CsvMetricsWriter(output)
+    elif output_format == "parquet":
+        writer = _ParquetMetricsWriter(output)
+    else:
+        raise ValueError(f"Unknown output format {output_format!r}")
+    games = [game for game in history_paths(history_dir) if not writer.is_done(game)]
+    failed = []
+    with Pool(processes) as pool:
+        results = pool.imap_unordered(
+            _analyze_file, [(history_dir, game, max_boards) for game in games]
+        )
+        for game, rows, error in tqdm(results, total=len(games)):
+            if error is not None:
+                tqdm.write(f"Failed to analyze {game}: {error}")
+                failed.append(game)
+            else:
+                writer.write(game, rows)
+    return failed
@@ -0,0 +1,224 @@
+"""Split a player's clock across its turns and size each turn's work to fit
+
+TimeBudgetController gives each turn an equal share of the clock left over the turns a game is
+expected to have left, and plans the two expensive steps of an MHT bot within that share:
+
+- Expanding the hypotheses by the opponent's move. Its cost is predicted from the mobility of the
+  parent boards (the requests possible on a sample of them), and the plan caps the number of parent
+  boards so that the expansion fits its fraction of the turn.
+- Voting on a move with an engine over a sample of the hypotheses. The plan picks the engine depth,
+  multipv, and number of boards to analyse that fit what is left of the turn.
+
+The costs per child board and per engine analysis start from rough defaults and are calibrated
+from the work actually done, and every turn's plan is recorded next to what it actually spent.
+"""
+
+import random
+from time import perf_counter
+from typing import List, NamedTuple, Optional, Sequence
+
+import chess
+
+from reconchess_tools.utilities import requestable_moves
+
+
+class VotePlan(NamedTuple):
+    boards: int
+    depth: int
+    multipv: int
+
+
+class TurnRecord(NamedTuple):
+    turn: int
+    clock_seconds: float
+    budget_seconds: float
+    parent_boards: int
+    max_parent_boards: int
+    predicted_op_move_seconds: float
+    op_move_seconds: float
+    vote: Optional[VotePlan]
+    predicted_vote_seconds: float
+    vote_seconds: float
+    # Time from the start of the turn to its end, including sensing and any untimed work
+    spent_seconds: float
+
+
+class TimeBudgetController:
+    """Plan the hypothesis cap, vote sample, and engine limits of each turn from the clock
+
+    Call start_turn when the turn starts (before expanding the hypotheses by the opponent move),
+    update_clock with every seconds_left the game reports, record_op_move and record_vote after
+    the planned work, and end_turn when the turn is over.
+    """
+
+    def __init__(
+        self,
+        expected_turns: int = 40,
+        min_remaining_turns: int = 10,
+        reserve_seconds: float = 10.0,
+        op_move_fraction: float = 0.4,
+        sense_fraction: float = 0.15,
+        min_parent_boards: int = 100,
+        max_vote_boards: int = 1_200,
+        min_vote_boards: int = 50,
+        min_depth: int = 4,
+        max_depth: int = 12,
+        multipv: int = 4,
+        seconds_per_child: float = 20e-6,
+        seconds_per_analysis: float = 0.01,
+        depth_growth: float = 1.5,
+        smoothing: float = 0.3,
+    ):
+        # The game is expected to last expected_turns of ours, but the budget always assumes at
+        # least min_remaining_turns are left, and reserve_seconds are never planned for
+        self.expected_turns = expected_turns
+        self.min_remaining_turns = min_remaining_turns
+        self.reserve_seconds = reserve_seconds
+        # The shares of a turn's budget for expanding the hypotheses and for choosing a sense
+        # square; the rest is for voting
+        self.op_move_fraction = op_move_fraction
+        self.sense_fraction = sense_fraction
+        self.min_parent_boards = min_parent_boards
+        self.max_vote_boards = max_vote_boards
+        self.min_vote_boards = min_vote_boards
+        self.min_depth = min_depth
+        self.max_depth = max_depth
+        self.multipv = multipv
+        # Calibrated costs: of generating one child board in op_move, and of one engine analysis
+        # at depth 8 (each further ply costs depth_growth times more)
+        self.seconds_per_child = seconds_per_child
+        self.seconds_per_analysis = seconds_per_analysis
+        self.depth_growth = depth_growth
+        # Weight of the latest measurement in the calibrated costs
+        self.smoothing = smoothing
+
+        self.clock: Optional[float] = None
+        self.turn = -1
+        self.records: List[TurnRecord] = []
+        self._turn_start = None
+        self._children_per_board = 1.0
+        self._plan = {}
+
+    def start_game(self, seconds: float = 900):
+        self.clock = seconds
+        self.turn = -1
+        self.records = []
+
+    def update_clock(self, seconds_left: float):
+        self.clock = seconds_left
+
+    def start_turn(self, boards: Sequence[chess.Board]) -> int:
+        """Start a turn, returning the most parent boards to expand by the opponent's move"""
+        self.turn += 1
+        self._turn_start = perf_counter()
+        remaining_turns = max(self.min_remaining_turns, self.expected_turns - self.turn)
+        budget = max(0.0, self.clock - self.reserve_seconds) / remaining_turns
+        children_per_board = mobility(boards)
+        max_parent_boards = max(
+            self.min_parent_boards,
+            int(
+                budget
+                * self.op_move_fraction
+                / (children_per_board * self.seconds_per_child)
+            ),
+        )
+        parent_boards = min(len(boards), max_parent_boards)
+        self._children_per_board = children_per_board
+        self._plan = {
+            "clock_seconds": self.clock,
+            "budget_seconds": budget,
+            "parent_boards": len(boards),
+            "max_parent_boards": max_parent_boards,
+            "predicted_op_move_seconds": parent_boards
+            * children_per_board
+            * self.seconds_per_child,
+            "op_move_seconds": 0.0,
+            "vote": None,
+            "predicted_vote_seconds": 0.0,
+            "vote_seconds": 0.0,
+        }
+        return max_parent_boards
+
+    def record_op_move(self, seconds: float, parent_boards: int):
+        """Record the time the expansion of the given number of parent boards took"""
+        self._plan["op_move_seconds"] = seconds
+        children = parent_boards * self._children_per_board
+        if children:
+            self.seconds_per_child = self._smoothed(
+                self.seconds_per_child, seconds / children
+            )
+
+    def sense_seconds(self) -> float:
+        """The time to spend choosing this turn's sense square"""
+        return self._plan["budget_seconds"] * self.sense_fraction
+
+    def analysis_seconds(self, depth: int, multipv: int) -> float:
+        """The predicted time of one engine analysis"""
+        # Each additional line costs about half as much again as the first
+        return (
+            self.seconds_per_analysis
+            * self.depth_growth ** (depth - 8)
+            * (1 + (multipv - 1) / 2)
+            / (1 + (self.multipv - 1) / 2)
+        )
+
+    def plan_vote(self, num_boards: int) -> VotePlan:
+        """Choose the vote sample and engine limits that fit what is left of the turn"""
+        remaining = self._plan["budget_seconds"] - (perf_counter() - self._turn_start)
+        wanted = min(num_boards, self.min_vote_boards)
+        multipv = self.multipv
+        depth = self.max_depth
+        # Give up depth first, keeping enough boards for the vote to be representative, then give
+        # up lines, then boards
+        while depth > self.min_depth and wanted * self.analysis_seconds(
+            depth, multipv
+        ) > max(0.0, remaining):
+            depth -= 1
+        if wanted * self.analysis_seconds(depth, multipv) > remaining:
+            multipv = 1
+        boards = min(
+            num_boards,
+            self.max_vote_boards,
+            int(max(0.0, remaining) / self.analysis_seconds(depth, multipv)),
+        )
+        boards = max(boards, min(num_boards, 1))
+        plan = VotePlan(boards, depth, multipv)
+        self._plan["vote"] = plan
+        self._plan["predicted_vote_seconds"] = boards * self.analysis_seconds(
+            depth, multipv
+        )
+        return plan
+
+    def record_vote(self, seconds: float, analyses: int):
+        """Record the time the vote took and the number of engine analyses it ran"""
+        self._plan["vote_seconds"] = seconds
+        plan = self._plan["vote"]
+        if analyses and plan is not None:
+            # Normalize the measurement to the reference depth and multipv
+            reference = self.analysis_seconds(plan.depth, plan.multipv) / (
+                self.seconds_per_analysis
+            )
+            self.seconds_per_analysis = self._smoothed(
+                self.seconds_per_analysis, seconds / analyses / reference
+            )
+
+    def end_turn(self) -> TurnRecord:
+        record = TurnRecord(
+            turn=self.turn,
+            spent_seconds=perf_counter() - self._turn_start,
+            **self._plan,
+        )
+        self.records.append(record)
+        return record
+
+    def _smoothed(self, estimate: float, measurement: float) -> float:
+        return (1 - self.smoothing) * estimate + self.smoothing * measurement
+
+
+def mobility(boards: Sequence[chess.Board], sample_size: int = 50) -> float:
+    """The average number of requests (including passing) possible on a sample of the boards"""
+    if not boards:
+        return 1.0
+    if len(boards) > sample_size:
+        boards = [boards[i] for i in random.sample(range(len(boards)), sample_size)]
+    return sum(len(requestable_moves(board)) + 1 for board in boards) / len(boards)
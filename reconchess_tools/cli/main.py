@@ -1,9 +1,13 @@
-import chess
+import os
+
 import click
-import reconchess
-import requests
 
-from reconchess_tools.ui.replay import Replay
+# Each command imports what it needs when it runs. Importing everything up front would load pygame,
+# the piece images, requests, and reconchess for every command, even just to list the commands.
+
+# The profilers of the profiling module, repeated here so that it isn't imported for the options
+PROFILERS = ["cprofile", "pyinstrument"]
+DEFAULT_SERVER_URL = "https://rbc.jhuapl.edu"
 
 
 @click.group()
@@ -11,18 +15,61 @@ def cli():
     pass
 
 
+def profile_options(command):
+    command = click.option(
+        "--profile",
+        "profile",
+        is_flag=True,
+        help="Time every player callback and write a per-turn timing report.",
+    )(command)
+    command = click.option(
+        "--profiler",
+        "profiler",
+        type=click.Choice(PROFILERS),
+        default=None,
+        help="Also save a profile of each callback (pyinstrument must be installed to use it).",
+    )(command)
+    return command
+
+
 @cli.command()
 @click.argument("white_path", type=str)
 @click.argument("black_path", type=str)
-def bot_match(white_path, black_path):
+@profile_options
+@click.option(
+    "--profile-dir",
+    "profile_dir",
+    default="profile",
+    help="Directory for the game history, timing report, and profiles when profiling.",
+)
+def bot_match(white_path, black_path, profile, profiler, profile_dir):
+    import chess
+    import reconchess
+
+    from reconchess_tools.profiling import (
+        format_timing_summary,
+        play_profiled_game,
+        read_timings,
+        summarize_timings,
+    )
+    from reconchess_tools.ui.replay import Replay
+
     game = reconchess.LocalGame(900)
 
     _, white = reconchess.load_player(white_path)
     _, black = reconchess.load_player(black_path)
 
-    winner_color, win_reason, history = reconchess.play_local_game(
-        white(), black(), game=game
-    )
+    if profile or profiler:
+        winner_color, win_reason, history = play_profiled_game(
+            white(), black(), profile_dir, game=game, profiler=profiler
+        )
+        history.save(os.path.join(profile_dir, "game.json"))
+        timings = read_timings(os.path.join(profile_dir, "timings.csv"))
+        print(format_timing_summary(summarize_timings(timings)))
+    else:
+        winner_color, win_reason, history = reconchess.play_local_game(
+            white(), black(), game=game
+        )
     winner = "Draw" if winner_color is None else chess.COLOR_NAMES[winner_color]
 
     print("Game Over!")
@@ -31,11 +78,47 @@ def bot_match(white_path, black_path):
     Replay.from_history(history).play_sync()
 
 
+def cache_options(command):
+    command = click.option(
+        "--cache-dir",
+        "cache_dir",
+        default=None,
+        help="Directory of cached replay analyses. Defaults to ~/.cache/reconchess-tools/replays.",
+    )(command)
+    command = click.option(
+        "--no-cache",
+        "no_cache",
+        is_flag=True,
+        help="Recompute the replay analysis instead of using or updating the cache.",
+    )(command)
+    return command
+
+
 @cli.command()
 @click.argument("replay_path", type=str)
-def replay_from_file(replay_path):
-    history = reconchess.GameHistory.from_file(replay_path)
-    Replay.from_history(history).play_sync()
+@click.option(
+    "--game",
+    "game",
+    type=int,
+    default=0,
+    help="Index of the game to replay when the file is a game record file.",
+)
+@cache_options
+def replay_from_file(replay_path, game, cache_dir, no_cache):
+    import reconchess
+
+    from reconchess_tools.records import index_path, load_game_records
+    from reconchess_tools.ui.replay import Replay
+
+    if os.path.exists(index_path(replay_path)):
+        record = load_game_records(replay_path)[game]
+        replay = Replay.from_record(record, use_cache=not no_cache, cache_dir=cache_dir)
+    else:
+        history = reconchess.GameHistory.from_file(replay_path)
+        replay = Replay.from_history(
+            history, use_cache=not no_cache, cache_dir=cache_dir
+        )
+    replay.play_sync()
 
 
 @cli.command()
@@ -45,19 +128,295 @@ def replay_from_file(replay_path):
 @click.option(
     "--server-url",
     "server_url",
-    default="https://rbc.jhuapl.edu",
+    default=DEFAULT_SERVER_URL,
     help="URL of the server.",
 )
-def replay_from_server(username, password, game_id, server_url):
-    response = requests.get(
-        server_url + f"/api/games/{game_id}/game_history", auth=(username, password)
+@cache_options
+def replay_from_server(username, password, game_id, server_url, cache_dir, no_cache):
+    from reconchess_tools.histories import HistoryCache, fetch_history
+    from reconchess_tools.ui.replay import Replay
+
+    history = fetch_history(server_url, game_id, (username, password), HistoryCache())
+    Replay.from_history(
+        history, use_cache=not no_cache, cache_dir=cache_dir
+    ).play_sync()
+
+
+@cli.command("fetch-histories")
+@click.argument("username")
+@click.argument("password")
+@click.argument("game_ids", type=int, nargs=-1, required=True)
+@click.option(
+    "--server-url",
+    "server_url",
+    default=DEFAULT_SERVER_URL,
+    help="URL of the server.",
+)
+@click.option(
+    "--output-dir",
+    "output_dir",
+    default="histories",
+    help="Directory to save the game histories in, one <game id>.json per game.",
+)
+@click.option(
+    "--concurrency",
+    "concurrency",
+    type=int,
+    default=8,
+    help="Most downloads to run at once.",
+)
+@click.option(
+    "--history-cache-dir",
+    "history_cache_dir",
+    default=None,
+    help="Directory of downloaded histories. Defaults to ~/.cache/reconchess-tools/histories.",
+)
+def fetch_histories_command(
+    username, password, game_ids, server_url, output_dir, concurrency, history_cache_dir
+):
+    from reconchess_tools.histories import HistoryCache, fetch_histories
+
+    results = fetch_histories(
+        server_url,
+        game_ids,
+        (username, password),
+        HistoryCache(history_cache_dir),
+        max_concurrency=concurrency,
     )
-    if response.status_code != 200:
-        raise requests.HTTPError(response.text)
-    history: reconchess.GameHistory = response.json(cls=reconchess.GameHistoryDecoder)[
-        "game_history"
-    ]
-    Replay.from_history(history).play_sync()
+    os.makedirs(output_dir, exist_ok=True)
+    failed = 0
+    for game_id, result in results.items():
+        if isinstance(result, Exception):
+            failed += 1
+            print(f"Failed to fetch game {game_id}: {result!r}")
+        else:
+            result.save(os.path.join(output_dir, f"{game_id}.json"))
+    print(f"Saved {len(results) - failed:,.0f} game histories to {output_dir}")
+
+
+@cli.command()
+@click.argument("history_dir", type=str)
+@click.argument("output", type=str)
+@click.option(
+    "--format",
+    "output_format",
+    type=click.Choice(["csv", "parquet"]),
+    default="csv",
+    help="Write one CSV file, or a directory of Parquet files (requires pyarrow).",
+)
+@click.option(
+    "--processes",
+    "processes",
+    type=int,
+    default=None,
+    help="Number of worker processes. Defaults to the number of CPUs.",
+)
+@click.option(
+    "--max-boards",
+    "max_boards",
+    type=int,
+    default=None,
+    help="Truncate each MHT to this many boards before expanding it by an opponent move.",
+)
+def analyze(history_dir, output, output_format, processes, max_boards):
+    from reconchess_tools.analysis import analyze_corpus
+
+    failed = analyze_corpus(
+        history_dir,
+        output,
+        output_format=output_format,
+        processes=processes,
+        max_boards=max_boards,
+    )
+    if failed:
+        print(f"Failed to analyze {len(failed):,.0f} games")
+
+
+@cli.command()
+@click.argument("bot_a", type=str)
+@click.argument("bot_b", type=str)
+@click.option("--games", "num_games", type=int, default=100, help="Number of games.")
+@click.option(
+    "--output-dir",
+    "output_dir",
+    default="tournament",
+    help="Directory for the game histories and results.",
+)
+@click.option(
+    "--processes",
+    "processes",
+    type=int,
+    default=None,
+    help="Number of games to play at once. Defaults to the number of CPUs.",
+)
+@click.option(
+    "--seconds-per-player",
+    "seconds_per_player",
+    type=float,
+    default=900,
+    help="Initial clock of each player.",
+)
+@profile_options
+def tournament(
+    bot_a,
+    bot_b,
+    num_games,
+    output_dir,
+    processes,
+    seconds_per_player,
+    profile,
+    profiler,
+):
+    from reconchess_tools.tournament import format_summary, run_tournament, summarize
+
+    results = run_tournament(
+        bot_a,
+        bot_b,
+        num_games,
+        output_dir,
+        processes=processes,
+        seconds_per_player=seconds_per_player,
+        profile=profile or profiler is not None,
+        profiler=profiler,
+    )
+    print(format_summary(summarize(results)))
+
+
+@cli.command()
+@click.argument("history_dir", type=str)
+@click.argument("output", type=str)
+@click.option(
+    "--max-turns",
+    "max_turns",
+    type=int,
+    default=6,
+    help="Number of turns (of both players) to precompute.",
+)
+@click.option(
+    "--min-games",
+    "min_games",
+    type=int,
+    default=2,
+    help="Keep only observation histories seen in at least this many games.",
+)
+@click.option(
+    "--max-boards",
+    "max_boards",
+    type=int,
+    default=None,
+    help="Leave out hypothesis sets larger than this.",
+)
+def build_openings(history_dir, output, max_turns, min_games, max_boards):
+    import reconchess
+
+    from reconchess_tools.analysis import actions_from_history, history_paths
+    from reconchess_tools.openings import build_opening_table, save_opening_table
+
+    games = (
+        actions_from_history(
+            reconchess.GameHistory.from_file(os.path.join(history_dir, path))
+        )
+        for path in history_paths(history_dir)
+    )
+    table = build_opening_table(games, max_turns, min_games, max_boards)
+    save_opening_table(output, table)
+    boards = sum(len(boards) for boards in table.values())
+    print(f"Wrote {len(table):,.0f} hypothesis sets ({boards:,.0f} boards) to {output}")
+
+
+@cli.command()
+@click.argument("history_dir", type=str)
+@click.argument("output", type=str)
+def pack_histories(history_dir, output):
+    import reconchess
+
+    from reconchess_tools.analysis import history_paths
+    from reconchess_tools.records import (
+        index_path,
+        record_from_history,
+        save_game_records,
+    )
+
+    paths = history_paths(history_dir)
+    save_game_records(
+        output,
+        (
+            record_from_history(
+                reconchess.GameHistory.from_file(os.path.join(history_dir, path))
+            )
+            for path in paths
+        ),
+    )
+    print(f"Wrote {len(paths):,.0f} games to {output} and {index_path(output)}")
+
+
+@cli.command()
+@click.argument("bot_path", type=str)
+@click.argument("username")
+@click.argument("password")
+@click.option(
+    "--server-url",
+    "server_url",
+    default=DEFAULT_SERVER_URL,
+    help="URL of the server.",
+)
+@click.option(
+    "--max-games", "max_games", type=int, default=8, help="Most games to play at once."
+)
+@click.option(
+    "--workers",
+    "workers",
+    type=int,
+    default=None,
+    help="Player callbacks to run at once, on threads of this process. Python code in "
+    "callbacks runs one at a time, so more workers only overlap waiting on engines and I/O. "
+    "Defaults to the number of CPUs.",
+)
+@click.option(
+    "--engines",
+    "engines",
+    type=int,
+    default=0,
+    help="Size of the engine pool shared by bots that take an engine (0 for none).",
+)
+def host(bot_path, username, password, server_url, max_games, workers, engines):
+    import asyncio
+
+    import reconchess
+
+    from reconchess_tools.host import EnginePool, GameHost, listen_for_invitations
+
+    _, bot_cls = reconchess.load_player(bot_path)
+    engine_pool = EnginePool(engines) if engines else None
+    game_host = GameHost(workers or os.cpu_count(), engine_pool)
+    try:
+        asyncio.run(
+            listen_for_invitations(
+                game_host, server_url, (username, password), bot_cls, max_games
+            )
+        )
+    except KeyboardInterrupt:
+        pass
+    finally:
+        game_host.close()
+
+
+@cli.command()
+@click.argument("snapshot_path", type=str)
+@click.option(
+    "--board",
+    "indices",
+    type=int,
+    multiple=True,
+    help="Print the FEN of the board at this index. May be given more than once.",
+)
+def inspect_snapshot(snapshot_path, indices):
+    from reconchess_tools.snapshot import load_snapshot
+
+    snapshot = load_snapshot(snapshot_path)
+    print(f"{len(snapshot):,.0f} boards")
+    for index in indices:
+        print(f"{index}: {snapshot[index].fen()}")
 
 
 if __name__ == "__main__":
@@ -1,36 +1,54 @@
 import random
 from collections import defaultdict
+from time import perf_counter
 from typing import List, Optional, Tuple
 
 import chess.engine
 from reconchess import Color, GameHistory, Player, WinReason
 from tqdm import tqdm
 
+from reconchess_tools.budget import TimeBudgetController, VotePlan
 from reconchess_tools.mht import MultiHypothesisTracker
+from reconchess_tools.priors import static_move_prior
+from reconchess_tools.sampled_sense import sampled_sense
 from reconchess_tools.stockfish import create_engine
 from reconchess_tools.strategy import (
     certain_win,
+    king_attackers,
     minimax_sense,
     non_dominated_sense_by_own_pieces,
+    ranked_choice_vote,
 )
 from reconchess_tools.utilities import simulate_move
 
+# Above this many boards, partitioning every board for every square takes too long, so we choose
+# the sense square from a sample of the boards instead
+SAMPLED_SENSE_BOARDS = 20_000
+
 
 class MhtBot(Player):
-    def __init__(self):
+    def __init__(self, engine=None):
         # We use the MHT object to handle all uncertainty tracking. In the methods below, we call
         # the appropriate update methods of the MHT object after which its boards property contains
         # the list of all chess boards that might be the true state of the game board. It is
         # important to be aware that both that list and the boards within it are mutable. It is the
-        # responsibility of the user to avoid mutating those except intentionally, for example, we
-        # slice the list below to prevent if from growing too large, even though that might mean we
-        # lose track of the true board state.
-        self.mht = MultiHypothesisTracker()
+        # responsibility of the user to avoid mutating those except intentionally. We weigh the
+        # opponent's possible moves with a cheap static prior so that, when the list grows too
+        # large, we can keep only the most likely boards, even though that might mean we lose
+        # track of the true board state.
+        self.mht = MultiHypothesisTracker(move_prior=static_move_prior)
         # We use Stockfish (though this could be any UCI-compliant engine) to analyze the possible
         # boards. After handling boards that are not valid in regular chess (i.e. the opponent king
         # can be captured, or we are in checkmate) we ask stockfish to suggest a few moves, which we
-        # aggregate using a variation of ranked-choice-voting. (More on that below.)
-        self.engine = create_engine()
+        # aggregate using a variation of ranked-choice-voting. (More on that below.) When many
+        # games are hosted in one process, they can share a pool of engines instead (see the host
+        # module), in which case we leave closing it to the host.
+        self.owns_engine = engine is None
+        self.engine = create_engine() if engine is None else engine
+        # How many boards we can afford to keep and to vote over, and how deep the engine can
+        # search, depends on how much time we have left. The controller splits our clock across
+        # the turns we expect to have left and plans each turn's work to fit its share.
+        self.budget = TimeBudgetController()
 
         self.color = None
         self.turn_num = None
@@ -42,23 +60,29 @@ class MhtBot(Player):
         # Initializing this to -1 makes handling the first turn easier
         self.turn_num = -1
         self.mht.reset()
+        self.budget.start_game()
 
     def handle_opponent_move_result(
         self, captured_my_piece: bool, capture_square: Optional[chess.Square]
     ):
         self.turn_num += 1
-        # This is called even before the first action. In that case, do nothing.
+        # Our turn starts here, so this is when we plan it. The controller predicts the cost of
+        # the expansion below from how many moves are possible on the boards we have.
+        max_boards = self.budget.start_turn(self.mht.boards)
+        # This is called even before the first action. In that case, do nothing more.
         if self.turn_num == 0 and self.color == chess.WHITE:
             return
-        # Though we risk losing track of the true board, to avoid the number of possible boards
-        # growing too large we limit its size here. Expanding the possible boards to account for all
-        # possible opponent moves is the most demanding step in the MHT processing so it is critical
-        # that we ensure this next step is tractable.
-        self.mht.boards = self.mht.boards[:3_000]
+        # Though we risk losing track of the true board, to keep the next step within our budget
+        # we keep only the most likely boards here.
+        self.mht.keep_most_likely(max_boards)
         # The true board could be the board that results from any possible move on each board that
         # was tracked before the move. That results in a growth factor of roughly 30, and higher
-        # still in the late game when the board is more open.
+        # still in the late game when the board is more open. Expanding the possible boards is the
+        # most demanding step in the MHT processing.
+        parent_boards = len(self.mht.boards)
+        start = perf_counter()
         self.mht.op_move(capture_square)
+        self.budget.record_op_move(perf_counter() - start, parent_boards)
 
     def choose_sense(
         self,
@@ -66,6 +90,7 @@ class MhtBot(Player):
         move_actions: List[chess.Move],
         seconds_left: float,
     ) -> Optional[chess.Square]:
+        self.budget.update_clock(seconds_left)
         if not self.mht.boards:
             return None
         # You can think of the choice of a sense square as a partition of the possible boards,
@@ -76,7 +101,14 @@ class MhtBot(Player):
         # a sense choice based on the partitions. For example, the following function recommends
         # the square whose biggest partition is smallest (the minimax remaining number of boards
         # after the hypothetical sense step).
-        self.mht.speculate_sense(non_dominated_sense_by_own_pieces(self.mht.boards[0]))
+        sense_squares = non_dominated_sense_by_own_pieces(self.mht.boards[0])
+        if len(self.mht.boards) > SAMPLED_SENSE_BOARDS:
+            # With this many boards, the same minimax choice can usually be made with confidence
+            # from a small random sample of them.
+            return sampled_sense(
+                self.mht.boards, sense_squares, seconds=self.budget.sense_seconds()
+            ).square
+        self.mht.speculate_sense(sense_squares)
         minimax_square = minimax_sense(self.mht.sense_speculation)
         return minimax_square
 
@@ -98,6 +130,7 @@ class MhtBot(Player):
     def choose_move(
         self, move_actions: List[chess.Move], seconds_left: float
     ) -> Optional[chess.Move]:
+        self.budget.update_clock(seconds_left)
         # Since we limit the size of the MHT board list, it is possible for that list to become
         # empty. In that case we fall back to requesting moves randomly.
         if not self.mht.boards:
@@ -106,8 +139,14 @@ class MhtBot(Player):
         winning_move = certain_win(self.mht.boards)
         if winning_move:
             return winning_move
-        # Otherwise, let stockfish evaluate over all possible boards and tally a vote.
-        move = vote(move_actions, self.mht.boards, self.engine)
+        # Otherwise, let stockfish evaluate over as many possible boards as we have time for and
+        # tally a vote.
+        plan = self.budget.plan_vote(len(self.mht.boards))
+        start = perf_counter()
+        move, analyses = vote(move_actions, self.mht.boards, self.engine, plan)
+        # Boards on which the king can be captured are voted on without the engine, so only the
+        # analyses it ran calibrate its cost
+        self.budget.record_vote(perf_counter() - start, analyses)
         # The reconchess library encodes passing (null) moves as None so we convert
         # chess.Move.null() to None here using the fact that it evaluates to truthy false.
         return move or None
@@ -126,6 +165,7 @@ class MhtBot(Player):
             taken_move or chess.Move.null(),
             capture_square,
         )
+        self.budget.end_turn()
 
     def handle_game_end(
         self,
@@ -133,10 +173,11 @@ class MhtBot(Player):
         win_reason: Optional[WinReason],
         game_history: GameHistory,
     ):
-        self.engine.close()
+        if self.owns_engine:
+            self.engine.close()
 
 
-def vote(possible_requested_moves, boards, engine):
+def vote(possible_requested_moves, boards, engine, plan: VotePlan):
     # This is just one of the many ways to aggregate the perfect-information recommendations over
     # each possible board into a move decision. Additionally, the general approach of aggregating
     # recommendations over MHT hypotheses is not necessarily the best strategy.
@@ -147,17 +188,22 @@ def vote(possible_requested_moves, boards, engine):
     # identifying dominated actions.)
     #
     # In this function, we choose a move to request by letting stockfish place votes over a random
-    # subset of the MHT boards and selecting a winner by ranked-choice-voting. We must separately
-    # handle unusual board configurations (i.e. the opponent king can be captured, or we are in
-    # checkmate when it is our turn to move) and we let stockfish rank move options on the rest.
+    # subset of the MHT boards (as many, and searched as deeply, as the plan allows) and selecting
+    # a winner by ranked-choice-voting. We must separately handle unusual board configurations
+    # (i.e. the opponent king can be captured, or we are in checkmate when it is our turn to move)
+    # and we let stockfish rank move options on the rest.
     # Because sometimes multiple move requests would be amended to the same taken move, we allow
     # choices to have a tied rank and nominate all such move requests with the same rank as the
     # taken move suggested by stockfish. In the unusual case where we have multiple options for
     # capturing the opponent king, this also gives us a way to nominate all those options as equal
     # first choices.
+    #
+    # Returns the chosen move and the number of boards stockfish analysed.
     votes = []
+    analyses = 0
     random.shuffle(boards)
-    for board in tqdm(boards[:1200]):
+    sample = boards[: plan.boards]
+    for board, attackers in zip(tqdm(sample), king_attackers(sample)):
         my_ranked_votes = []
         votes.append(my_ranked_votes)
         # All requested moves that result in the voted-for taken moves are counted equally.
@@ -167,18 +213,18 @@ def vote(possible_requested_moves, boards, engine):
             move_lookup[taken_move].append(requested_move)
         # Boards where the king can be captured cannot be scored by stockfish.
         # Instead, vote equally for all possible king capture moves.
-        op_king_square = board.king(not board.turn)
-        king_attackers = board.attackers(board.turn, op_king_square)
-        if king_attackers:
+        if attackers:
+            op_king_square = board.king(not board.turn)
             my_ranked_votes.append([])
-            for attacker in king_attackers:
+            for attacker in chess.scan_forward(attackers):
                 taken_move = chess.Move(attacker, op_king_square)
                 requested_moves = move_lookup[taken_move]
                 my_ranked_votes[0] += requested_moves
         else:
             board.clear_stack()
+            analyses += 1
             results = engine.analyse(
-                board, limit=chess.engine.Limit(depth=8), multipv=4
+                board, limit=chess.engine.Limit(depth=plan.depth), multipv=plan.multipv
             )
             for result in results:
                 try:
@@ -186,29 +232,4 @@ def vote(possible_requested_moves, boards, engine):
                     my_ranked_votes.append(move_lookup[taken_move])
                 except KeyError:
                     pass  # No moves were suggested because we are in checkmate on this board.
-    # Ranked-choice-voting is an iterative algorithm that scores candidates by the number of
-    # first-choice votes they receive. If a candidate receives a majority, it is selected.
-    # Otherwise, the lowest-scoring candidate is eliminated and the process repeats. Because this
-    # version allows tied ranking, the total number of votes can exceed the number of voters.
-    while True:
-        if not votes:
-            return chess.Move.null()
-        threshold = len(votes) // 2
-        first_choice_votes = defaultdict(int)
-        for vote in votes:
-            for move in vote[0]:
-                first_choice_votes[move] += 1
-        max_move, max_num_votes = max(first_choice_votes.items(), key=lambda x: x[1])
-        if max_num_votes >= threshold:
-            return max_move
-        min_move, min_num_votes = min(first_choice_votes.items(), key=lambda x: x[1])
-        revised_votes = []
-        for vote in votes:
-            revised_vote = []
-            for group in vote:
-                revised_group = [move for move in group if move != min_move]
-                if revised_group:
-                    revised_vote.append(revised_group)
-            if revised_vote:
-                revised_votes.append(revised_vote)
-        votes = revised_votes
+    return ranked_choice_vote(votes), analyses
@@ -0,0 +1,1004 @@
+"""Factored (sum of products) hypothesis sets
+
+A flat hypothesis set stores every combination of independent uncertainties: if the opponent's
+queenside knight may be on any of 10 squares and, independently, their kingside pawns may be in
+any of 20 configurations, it holds 200 boards. A FactoredHypotheses stores the same set as terms,
+each a product of components. The pieces of the tracking player (and the side to move, castling
+rights, and en passant square they own) are known and shared as the term's base, and each
+component holds the alternative placements of the opponent's pieces on a set of squares
+independent of the rest of the term. The example above is one term with a 10-alternative and a
+20-alternative component: 30 records rather than 200 boards.
+
+Each opponent move changes exactly one component, so it replaces a term by a sum of terms, one per
+group of components a move could come from (plus the unchanged term, for a move that captured
+nothing). The terms are kept disjoint: a term in which some component moved only holds the
+alternatives that are not already alternatives of the unchanged term. Components are merged only
+when an update couples them: a sense or move of ours reading squares from several components, or an
+opponent piece whose moves depend on squares of another component whose contents vary. After every
+update, each changed component is split again into factors wherever its alternatives are the
+product of alternatives on disjoint squares, and terms that differ in a single component are
+merged into one.
+
+Past MAX_TERMS terms, all the terms with the same base are merged into one (see _coarsen). The
+union of many terms is rarely a product, so from then on the set is stored about as flat as a list
+of boards, and stays so as the opponent's moves add uncertainty. Where the opponent's moves are
+not observed at all, that happens within a few moves. Tracking white's unseen Nc3, h4, Nb5, and
+Nf3 from black, who plays e6, d6, and Nf6 and senses e7 each turn, the set after white's third
+move is 4,776 boards stored as 1,638 records in 618 terms, but after the fourth it is 46,160
+boards in a single term of 46,160 records. Factoring saves the most while the uncertainty is in
+few pieces, as it is after senses or captures that pin down the rest.
+
+The updates below are cooperative generators, like the MultiHypothesisTracker's own: each yields
+after a unit of work and returns the updated set as its value. Boards are only built on access, so
+len() is cheap but iterating builds a chess.Board per hypothesis.
+"""
+
+from bisect import bisect_right
+from collections import defaultdict
+from itertools import accumulate, product
+from math import prod
+from random import Random
+from typing import Dict, Iterator, List, NamedTuple, Optional, Sequence, Tuple
+
+import chess
+
+from reconchess_tools.utilities import (
+    board_from_fingerprint,
+    requestable_moves,
+    simulate_move,
+    simulate_sense,
+)
+
+# An alternative is a tuple of the opponent's kings, queens, bishops, knights, rooks, and pawns
+# bitboards (in the order of board_fingerprint) followed by their castling rights and en passant
+# square as bitboards
+Alternative = Tuple[int, int, int, int, int, int, int, int]
+_PIECE_LAYERS = range(6)
+_LAYER_OF_PIECE_TYPE = {
+    chess.KING: 0,
+    chess.QUEEN: 1,
+    chess.BISHOP: 2,
+    chess.KNIGHT: 3,
+    chess.ROOK: 4,
+    chess.PAWN: 5,
+}
+_CASTLING, _EP = 6, 7
+_EMPTY = (0,) * 8
+
+# Terms past which all terms with the same base are merged into one (see _coarsen)
+MAX_TERMS = 2_000
+# The most square pairs times alternatives that _factor checks for independence
+_FACTOR_BUDGET = 500_000
+
+
+class Component:
+    """Alternative placements of the opponent's pieces on squares independent of the rest"""
+
+    __slots__ = ("alternatives", "mask", "_hash", "_packed_bounds")
+
+    def __init__(self, alternatives):
+        self.alternatives: Tuple[Alternative, ...] = tuple(sorted(set(alternatives)))
+        mask = 0
+        for alternative in self.alternatives:
+            for layer in alternative:
+                mask |= layer
+        # The squares on which any alternative has a piece, castling right, or en passant square
+        self.mask = mask
+        self._hash = hash(self.alternatives)
+        self._packed_bounds = None
+
+    def __len__(self):
+        return len(self.alternatives)
+
+    def __eq__(self, other):
+        return (
+            isinstance(other, Component)
+            and self._hash == other._hash
+            and self.alternatives == other.alternatives
+        )
+
+    def __hash__(self):
+        return self._hash
+
+    def __repr__(self):
+        return f"Component({len(self.alternatives)} alternatives on {chess.SquareSet(self.mask)!r})"
+
+    def packed_bounds(self) -> Tuple[int, int]:
+        """The bits set in every alternative and in any, with the layers packed into one integer"""
+        if self._packed_bounds is None:
+            always, anywhere = -1, 0
+            for alternative in self.alternatives:
+                packed = _pack(alternative)
+                always &= packed
+                anywhere |= packed
+            self._packed_bounds = always, anywhere
+        return self._packed_bounds
+
+    def constant_occupancy(self) -> chess.Bitboard:
+        """Squares occupied by an opponent piece in every alternative"""
+        occupied = chess.BB_ALL
+        for alternative in self.alternatives:
+            occupied &= _occupancy(alternative)
+        return occupied
+
+
+class Term(NamedTuple):
+    # board_fingerprint of the known part of the boards: the opponent's pieces, castling rights,
+    # and en passant square are left out
+    base: tuple
+    # Components on disjoint squares, ordered by their masks
+    components: Tuple[Component, ...]
+
+    def size(self) -> int:
+        return prod(len(component) for component in self.components)
+
+
+class FactoredHypotheses(Sequence):
+    """A hypothesis set stored as a sum of products of independent components
+
+    color is the opponent's color, whose pieces are uncertain, or None while every piece is known
+    (before the opponent's first move). Indexing and iteration build the boards on the fly, and
+    slicing returns a list. Boards have an empty move stack and default move counters, as with
+    board_from_fingerprint.
+
+    Given a dict of built boards, indexing and iteration store each board they build there and
+    return the stored board for a hypothesis built before. The sets of a speculation share one,
+    so that equal boards are identical objects across its groups, as strategy.non_dominated_sense
+    expects.
+    """
+
+    def __init__(
+        self,
+        terms: Sequence[Term],
+        color: Optional[chess.Color],
+        built: Optional[Dict[tuple, chess.Board]] = None,
+    ):
+        self.terms = list(terms)
+        self.color = color
+        self.built = built
+        self._ends = list(accumulate(term.size() for term in self.terms))
+
+    @classmethod
+    def from_boards(
+        cls, boards: Sequence[chess.Board], color: Optional[chess.Color]
+    ) -> "FactoredHypotheses":
+        """Factor a flat hypothesis set, in which the pieces not of color must not vary"""
+        groups = defaultdict(set)
+        for board in boards:
+            base, alternative = _split_board(board, color)
+            groups[base].add(alternative)
+        terms = [
+            Term(base, _sorted(_factor(Component(alternatives))))
+            for base, alternatives in groups.items()
+        ]
+        return cls(_merge_terms(terms), color)
+
+    def __len__(self):
+        return self._ends[-1] if self._ends else 0
+
+    def __iter__(self) -> Iterator[chess.Board]:
+        for base, components in self.terms:
+            for alternatives in product(*(c.alternatives for c in components)):
+                yield self._build(base, alternatives)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(len(self))[index]]
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("hypothesis index out of range")
+        term_index = bisect_right(self._ends, index)
+        base, components = self.terms[term_index]
+        index -= self._ends[term_index - 1] if term_index else 0
+        alternatives = []
+        for component in reversed(components):
+            index, alternative_index = divmod(index, len(component))
+            alternatives.append(component.alternatives[alternative_index])
+        return self._build(base, alternatives)
+
+    @property
+    def records(self) -> int:
+        """The number of alternatives stored, counting components shared by terms once"""
+        components = {c for term in self.terms for c in term.components}
+        return sum(len(component) for component in components)
+
+    def _build(self, base: tuple, alternatives) -> chess.Board:
+        if self.built is None:
+            return _board(base, alternatives, self.color)
+        # Components are on disjoint squares, so their union identifies the hypothesis however
+        # its term is factored
+        key = base, tuple(map(_or, _EMPTY, *alternatives))
+        board = self.built.get(key)
+        if board is None:
+            board = self.built[key] = _board(base, alternatives, self.color)
+        return board
+
+
+def hidden_color(boards: Sequence[chess.Board]) -> Optional[chess.Color]:
+    """The color whose pieces differ between the boards, or None if all of them agree
+
+    Raises a ValueError if both colors' pieces differ, which no tracked hypothesis set does.
+    """
+    varying = []
+    for color in chess.COLORS:
+        corners = _hidden_corners(color)
+        placements = {
+            (
+                tuple(
+                    board.pieces_mask(piece_type, color)
+                    for piece_type in chess.PIECE_TYPES
+                ),
+                board.castling_rights & corners,
+                board.ep_square if board.turn != color else None,
+            )
+            for board in boards
+        }
+        if len(placements) > 1:
+            varying.append(color)
+    if len(varying) > 1:
+        raise ValueError("the pieces of both colors differ between the boards")
+    return varying[0] if varying else None
+
+
+def sense(
+    hypotheses: FactoredHypotheses,
+    square: Optional[chess.Square],
+    sorted_result: List[Tuple[int, chess.Piece]],
+) -> Iterator[None]:
+    """Keep the hypotheses with the given sense result, yielding after each term"""
+    if square is None:
+        return hypotheses
+    window = _sense_window(square)
+    pieces, colors = _expected_contents(sorted_result)
+    terms = []
+    for term in hypotheses.terms:
+        term = _filter_term(term, window, pieces, colors, hypotheses.color)
+        if term is not None:
+            terms.append(term)
+        yield
+    return FactoredHypotheses(_merge_terms(terms), hypotheses.color)
+
+
+def speculate_sense(
+    hypotheses: FactoredHypotheses, sense_squares: Sequence[chess.Square]
+) -> Iterator[None]:
+    """Group the hypotheses by their sense result on each square, yielding after each term
+
+    Returns a map from sense square to sense result (as a tuple) to the FactoredHypotheses with
+    that result, as MultiHypothesisTracker.sense_speculation. The sets share a dict of built
+    boards (see FactoredHypotheses).
+    """
+    color = hypotheses.color
+    built = {}
+    speculation = {}
+    for square in sense_squares:
+        window = _sense_window(square)
+        results = defaultdict(list)
+        for base, components in hypotheses.terms:
+            sensed = [c for c in components if c.mask & window]
+            others = tuple(c for c in components if not c.mask & window)
+            # The alternatives of each sensed component, grouped by what they show in the window
+            projections = []
+            for component in sensed:
+                groups = defaultdict(list)
+                for alternative in component.alternatives:
+                    groups[_restrict(alternative, window)].append(alternative)
+                projections.append(list(groups.items()))
+            for combination in product(*projections):
+                board = _board(base, [seen for seen, _ in combination], color)
+                result = tuple(simulate_sense(board, square))
+                filtered = [
+                    factor
+                    for _, alternatives in combination
+                    for factor in _factor(Component(alternatives))
+                ]
+                results[result].append(Term(base, _sorted(others + tuple(filtered))))
+            yield
+        # Like the flat speculation, results no hypothesis gives map to an empty set
+        speculation[square] = defaultdict(lambda: FactoredHypotheses([], color))
+        for result, terms in results.items():
+            speculation[square][result] = FactoredHypotheses(
+                _merge_terms(terms), color, built
+            )
+    return speculation
+
+
+def move(
+    hypotheses: FactoredHypotheses,
+    requested_move: chess.Move,
+    taken_move: chess.Move,
+    capture_square: Optional[chess.Square],
+) -> Iterator[None]:
+    """Keep the hypotheses with the given move result and make the move, yielding per alternative
+
+    Components holding squares the move depends on are merged first, since the result may depend
+    on all of them together.
+    """
+    color = hypotheses.color
+    results = {}
+    terms = []
+    for base, components in hypotheses.terms:
+        squares = _move_squares(base, requested_move)
+        merged = _combine([c for c in components if c.mask & squares])
+        others = [c for c in components if not c.mask & squares]
+        if (base, merged) not in results:
+            new_base = None
+            alternatives = []
+            # The other components do not change the result, but the opponent's king and rooks
+            # must stay on the board for python-chess to keep their castling rights
+            representatives = [c.alternatives[0] for c in others]
+            for alternative in merged.alternatives:
+                board = _board(base, [alternative] + representatives, color)
+                if simulate_move(board, requested_move) == (taken_move, capture_square):
+                    board.push(taken_move)
+                    new_base, new_alternative = _split_board(board, color)
+                    alternatives.append(_restrict(new_alternative, merged.mask))
+                yield
+            results[base, merged] = new_base, alternatives
+        new_base, alternatives = results[base, merged]
+        if new_base is None:
+            continue
+        # Only the player who just moved may capture en passant
+        new_components = [_without_ep(c) for c in others]
+        new_components += _factor(Component(alternatives))
+        terms.append(Term(new_base, _sorted(new_components)))
+    # Hypotheses that differed only in the opponent's en passant square are now the same
+    return FactoredHypotheses(_without_duplicates(terms), color)
+
+
+def op_move(
+    hypotheses: FactoredHypotheses, capture_square: Optional[chess.Square]
+) -> Iterator[None]:
+    """Expand the hypotheses into the results of every opponent move with the given capture square
+
+    Yields after the moves from each alternative of each group of coupled components.
+    """
+    color = hypotheses.color
+    if color is None:
+        color = _side_to_move(hypotheses)
+        hypotheses = FactoredHypotheses(
+            [_hide_pieces(term, color) for term in hypotheses.terms], color
+        )
+    # The children of a group depend only on the base and on the other opponent pieces on the
+    # squares the group reaches, which many terms share, so they are found once per context
+    results = {}
+    terms = []
+    for term in hypotheses.terms:
+        base, components = term
+        coupled = _coupled_groups(term)
+        groups = [_combine(group) for group, _ in coupled]
+        stripped = tuple(_without_ep(group) for group in groups)
+        if capture_square is None:
+            # Moves that fail, or the opponent passing, leave the pieces as they were
+            terms.append(Term(_passed(base), _sorted(stripped)))
+        for i, (group, (_, reach)) in enumerate(zip(groups, coupled)):
+            others = stripped[:i] + stripped[i + 1 :]
+            context = _EMPTY
+            for other in others:
+                if other.mask & reach:
+                    context = tuple(
+                        map(
+                            _or,
+                            context,
+                            _restrict(
+                                other.alternatives[0],
+                                other.constant_occupancy() & reach,
+                            ),
+                        )
+                    )
+            key = base, group, context
+            if key not in results:
+                results[key] = yield from _children(
+                    base, group, others, capture_square, color
+                )
+            for child_base, alternatives in results[key].items():
+                terms.append(
+                    Term(child_base, _sorted(others + (Component(alternatives),)))
+                )
+        yield
+    # The children of different terms may coincide, e.g. when two moves are made in either order
+    return FactoredHypotheses(_without_duplicates(terms), color)
+
+
+def _without_duplicates(terms: List[Term]) -> List[Term]:
+    """Merge and refactor terms that may share hypotheses into disjoint terms"""
+    terms = [
+        Term(base, _sorted(f for c in components for f in _factor(c)))
+        for base, components in _disjoint(_merge_terms(terms))
+    ]
+    return _merge_terms(terms)
+
+
+def _children(
+    base: tuple,
+    group: Component,
+    others: Sequence[Component],
+    capture_square: Optional[chess.Square],
+    color: chess.Color,
+) -> Iterator[None]:
+    """Find the alternatives of a group after each of its moves, yielding after each alternative
+
+    Returns the new alternatives by the base they leave, except those that are alternatives of the
+    group already (as the same hypotheses remain in the term where the opponent's move failed).
+    """
+    unchanged = set(_without_ep(group).alternatives)
+    representatives = [other.alternatives[0] for other in others]
+    not_others = ~_or(*(other.mask for other in others))
+    children = defaultdict(set)
+    for alternative in group.alternatives:
+        board = _board(base, [alternative] + representatives, color)
+        for requested_move in requestable_moves(board, _occupancy(alternative)):
+            taken_move, simulated_capture_square = simulate_move(board, requested_move)
+            if not taken_move or simulated_capture_square != capture_square:
+                continue
+            child = board.copy(stack=False)
+            child.push(taken_move)
+            child_base, child_alternative = _split_board(child, color)
+            child_alternative = _restrict(child_alternative, not_others)
+            if child_alternative not in unchanged:
+                children[child_base].add(child_alternative)
+        yield
+    return children
+
+
+def _occupancy(alternative: Alternative) -> chess.Bitboard:
+    kings, queens, bishops, knights, rooks, pawns, _, _ = alternative
+    return kings | queens | bishops | knights | rooks | pawns
+
+
+def _pack(alternative: Alternative) -> int:
+    packed = 0
+    for layer in alternative:
+        packed = packed << 64 | layer
+    return packed
+
+
+def _restrict(alternative: Alternative, mask: chess.Bitboard) -> Alternative:
+    return tuple(layer & mask for layer in alternative)
+
+
+def _without_ep(component: Component) -> Component:
+    if not any(alternative[_EP] for alternative in component.alternatives):
+        return component
+    return Component(alternative[:_EP] + (0,) for alternative in component.alternatives)
+
+
+def _sorted(components) -> Tuple[Component, ...]:
+    return tuple(sorted((c for c in components if c.mask), key=lambda c: c.mask))
+
+
+def _hidden_corners(color: Optional[chess.Color]) -> chess.Bitboard:
+    if color is None:
+        return 0
+    return chess.BB_CORNERS & (chess.BB_RANK_1 if color else chess.BB_RANK_8)
+
+
+def _split_board(board: chess.Board, color: Optional[chess.Color]):
+    """Split a board into the base of its term and the alternative of the opponent's pieces"""
+    hidden = board.occupied_co[color] if color is not None else 0
+    hidden_castling = board.castling_rights & _hidden_corners(color)
+    # The en passant square belongs to the player who just moved
+    hidden_ep = (
+        board.ep_square is not None and color is not None and color != board.turn
+    )
+    known = ~hidden
+    occupied_co = list(board.occupied_co)
+    if color is not None:
+        occupied_co[color] = 0
+    base = (
+        board.turn,
+        *occupied_co,
+        board.kings & known,
+        board.queens & known,
+        board.bishops & known,
+        board.knights & known,
+        board.rooks & known,
+        board.pawns & known,
+        board.castling_rights & ~hidden_castling,
+        None if hidden_ep else board.ep_square,
+    )
+    alternative = (
+        board.kings & hidden,
+        board.queens & hidden,
+        board.bishops & hidden,
+        board.knights & hidden,
+        board.rooks & hidden,
+        board.pawns & hidden,
+        hidden_castling,
+        chess.BB_SQUARES[board.ep_square] if hidden_ep else 0,
+    )
+    return base, alternative
+
+
+def _board(base: tuple, alternatives, color: Optional[chess.Color]) -> chess.Board:
+    """Build the board made of a base and one alternative of each of its term's components"""
+    turn, black, white, *layers, ep_square = base
+    layers.append(0 if ep_square is None else chess.BB_SQUARES[ep_square])
+    for alternative in alternatives:
+        for i, layer in enumerate(alternative):
+            layers[i] |= layer
+    if color is not None:
+        hidden = 0
+        for alternative in alternatives:
+            hidden |= _occupancy(alternative)
+        if color:
+            white |= hidden
+        else:
+            black |= hidden
+    *pieces, castling_rights, ep = layers
+    return board_from_fingerprint(
+        (turn, black, white, *pieces, castling_rights, chess.lsb(ep) if ep else None)
+    )
+
+
+def _sense_window(square: chess.Square) -> chess.Bitboard:
+    return chess.BB_KING_ATTACKS[square] | chess.BB_SQUARES[square]
+
+
+def _expected_contents(sorted_result):
+    """The piece layers (as in an alternative) and colors of the pieces in a sense result"""
+    pieces = [0] * 6
+    colors = [0, 0]
+    for square, piece in sorted_result:
+        if piece is not None:
+            pieces[_LAYER_OF_PIECE_TYPE[piece.piece_type]] |= chess.BB_SQUARES[square]
+            colors[piece.color] |= chess.BB_SQUARES[square]
+    return pieces, colors
+
+
+def _filter_term(
+    term: Term, window: chess.Bitboard, pieces, colors, color: Optional[chess.Color]
+) -> Optional[Term]:
+    base, components = term
+    uncertain = 0
+    for component in components:
+        uncertain |= component.mask
+    certain = window & ~uncertain
+    # Squares outside every component are known, so must match the base exactly
+    if (
+        any(
+            layer & certain != expected & certain
+            for layer, expected in zip(base[3:9], pieces)
+        )
+        or base[1] & certain != colors[chess.BLACK] & certain
+        or base[2] & certain != colors[chess.WHITE] & certain
+    ):
+        return None
+    filtered = []
+    for component in components:
+        sensed = component.mask & window
+        if not sensed:
+            filtered.append(component)
+            continue
+        if color is None or colors[not color] & sensed:
+            return None
+        expected = [layer & colors[color] & sensed for layer in pieces]
+        alternatives = [
+            alternative
+            for alternative in component.alternatives
+            if all(alternative[i] & sensed == expected[i] for i in _PIECE_LAYERS)
+        ]
+        if not alternatives:
+            return None
+        filtered += _factor(Component(alternatives))
+    return Term(base, _sorted(filtered))
+
+
+def _move_squares(base: tuple, move: chess.Move) -> chess.Bitboard:
+    """Squares whose contents may change the result of a requested move of the known player"""
+    if not move:
+        return 0
+    from_square, to_square = move.from_square, move.to_square
+    squares = chess.BB_SQUARES[to_square] | chess.between(from_square, to_square)
+    mask = chess.BB_SQUARES[from_square]
+    if base[8] & mask and chess.square_file(from_square) != chess.square_file(
+        to_square
+    ):
+        # The pawn captured by en passant is behind the en passant square
+        squares |= chess.BB_SQUARES[to_square ^ 8]
+    if base[3] & mask and chess.square_distance(from_square, to_square) > 1:
+        # Castling depends on every square between the king and the rook
+        squares |= chess.BB_RANKS[chess.square_rank(from_square)]
+    return squares
+
+
+def _combine(components: Sequence[Component]) -> Component:
+    """Merge components into one holding every combination of their alternatives"""
+    if len(components) == 1:
+        return components[0]
+    return Component(
+        tuple(map(_or, *alternatives)) if alternatives else _EMPTY
+        for alternatives in product(*(c.alternatives for c in components))
+    )
+
+
+def _or(*layers):
+    combined = 0
+    for layer in layers:
+        combined |= layer
+    return combined
+
+
+def _factor(component: Component) -> List[Component]:
+    """Split a component into factors whose product has the same alternatives
+
+    Squares with the same contents in every alternative become components of their own, one per
+    square. The remaining squares are grouped by pairwise dependence and split into those groups
+    if the alternatives are indeed their product. Checking every pair of squares on every
+    alternative costs squares squared times alternatives, so past _FACTOR_BUDGET the pairs are
+    checked on a random sample of the alternatives instead (see _content_counts).
+    """
+    alternatives = component.alternatives
+    if not component.mask:
+        return []
+    first = alternatives[0]
+    varying = 0
+    for alternative in alternatives[1:]:
+        for layer, first_layer in zip(alternative, first):
+            varying |= layer ^ first_layer
+    constant = component.mask & ~varying
+    factors = [
+        Component([_restrict(first, chess.BB_SQUARES[square])])
+        for square in chess.scan_forward(constant)
+    ]
+    if not varying:
+        return factors
+    if constant:
+        alternatives = [_restrict(alternative, varying) for alternative in alternatives]
+    squares = list(chess.scan_forward(varying))
+    sample = alternatives
+    if len(squares) ** 2 * len(alternatives) > _FACTOR_BUDGET:
+        # Seeded, so that the same component is always factored the same way
+        sample = Random(0).sample(alternatives, _FACTOR_BUDGET // len(squares) ** 2)
+    contents = [
+        [_square_content(alternative, square) for square in squares]
+        for alternative in sample
+    ]
+    if sample is alternatives:
+        counts = [len({row[i] for row in contents}) for i in range(len(squares))]
+    else:
+        counts = _content_counts(alternatives, squares)
+    parent = list(range(len(squares)))
+
+    def find(i):
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    for i in range(len(squares)):
+        for j in range(i + 1, len(squares)):
+            if find(i) == find(j):
+                continue
+            pairs = {(row[i], row[j]) for row in contents}
+            if len(pairs) < counts[i] * counts[j]:
+                parent[find(j)] = find(i)
+    blocks = defaultdict(int)
+    for i, square in enumerate(squares):
+        blocks[find(i)] |= chess.BB_SQUARES[square]
+    if len(blocks) > 1:
+        split = [
+            Component(_restrict(alternative, block) for alternative in alternatives)
+            for block in blocks.values()
+        ]
+        if prod(len(c) for c in split) == len(alternatives):
+            return factors + split
+    return factors + [Component(alternatives)]
+
+
+def _content_counts(
+    alternatives: Sequence[Alternative], squares: Sequence[chess.Square]
+) -> List[int]:
+    """Upper bounds on the number of different contents of each square among the alternatives
+
+    Every pair of contents in a sample of the alternatives is one of theirs, so two squares whose
+    pairs in the sample number the product of these bounds are independent. Pairs short of it are
+    taken as dependent, which may only leave blocks coarser than they could be.
+    """
+    always, anywhere = [chess.BB_ALL] * 8, [0] * 8
+    occupied = chess.BB_ALL
+    for alternative in alternatives:
+        occupied &= _occupancy(alternative)
+        for i, layer in enumerate(alternative):
+            always[i] &= layer
+            anywhere[i] |= layer
+    counts = []
+    for square in squares:
+        mask = chess.BB_SQUARES[square]
+        # At most one piece, or none unless the square is always occupied
+        count = sum(1 for i in _PIECE_LAYERS if anywhere[i] & mask)
+        count += not occupied & mask
+        for i in [_CASTLING, _EP]:
+            if anywhere[i] & ~always[i] & mask:
+                count *= 2
+        counts.append(count)
+    return counts
+
+
+def _square_content(alternative: Alternative, square: chess.Square) -> int:
+    content = 0
+    for layer in alternative:
+        content = content << 1 | (layer >> square & 1)
+    return content
+
+
+def _merge_terms(terms: List[Term]) -> List[Term]:
+    """Merge terms with the same base that differ in one component, then cap the term count
+
+    Terms are disjoint, so the union of the differing components' alternatives is exactly the
+    union of the two terms.
+    """
+    merged = True
+    while merged:
+        merged = False
+        index: Dict[tuple, int] = {}
+        result: List[Optional[Term]] = []
+        for term in terms:
+            for key in _merge_keys(term):
+                position = index.get(key)
+                if position is None:
+                    continue
+                other = result[position]
+                for other_key in _merge_keys(other):
+                    index.pop(other_key, None)
+                base, common = key
+                (mine,) = set(term.components) - set(common)
+                (theirs,) = set(other.components) - set(common)
+                if mine == theirs:
+                    combined = other
+                else:
+                    combined = Term(
+                        base,
+                        _sorted(
+                            common
+                            + (Component(mine.alternatives + theirs.alternatives),)
+                        ),
+                    )
+                result[position] = combined
+                for combined_key in _merge_keys(combined):
+                    index[combined_key] = position
+                merged = True
+                break
+            else:
+                for key in _merge_keys(term):
+                    index[key] = len(result)
+                result.append(term)
+        terms = result
+    if len(terms) > MAX_TERMS:
+        terms = _coarsen(terms)
+    return terms
+
+
+def _disjoint(terms: List[Term]) -> List[Term]:
+    """Remove from each term the hypotheses already in an earlier term"""
+    kept: List[Term] = []
+    kept_bounds: List[Tuple[tuple, int, int]] = []
+    for term in terms:
+        pieces = [(term, _bounds(term))]
+        for other, other_bounds in zip(kept, kept_bounds):
+            remaining = []
+            for piece, bounds in pieces:
+                if _may_overlap(bounds, other_bounds):
+                    remaining += [(p, _bounds(p)) for p in _subtract(piece, other)]
+                else:
+                    remaining.append((piece, bounds))
+            pieces = remaining
+            if not pieces:
+                break
+        for piece, bounds in pieces:
+            kept.append(piece)
+            kept_bounds.append(bounds)
+    return kept
+
+
+def _bounds(term: Term) -> Tuple[tuple, int, int]:
+    """A term's base with the bits set in all, and in any, of its hypotheses
+
+    The bits of all the layers of an alternative are packed into one integer, so that comparing
+    bounds takes a couple of operations.
+    """
+    always = anywhere = 0
+    for component in term.components:
+        component_always, component_anywhere = component.packed_bounds()
+        always |= component_always
+        anywhere |= component_anywhere
+    return term.base, always, anywhere
+
+
+def _may_overlap(bounds, other_bounds) -> bool:
+    base, always, anywhere = bounds
+    other_base, other_always, other_anywhere = other_bounds
+    return (
+        base == other_base
+        and not always & ~other_anywhere
+        and not other_always & ~anywhere
+    )
+
+
+def _subtract(term: Term, other: Term) -> List[Term]:
+    """Split the hypotheses of term that are not in other (with the same base) into terms
+
+    The components of both terms are grouped into blocks of overlapping squares, so that each term
+    is a product over the same blocks. Then term minus other is the disjoint union over blocks k of
+    the terms agreeing with other on the blocks before k and not on block k.
+    """
+    components = term.components + other.components
+    parent = list(range(len(components)))
+
+    def find(i):
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    for i, component in enumerate(components):
+        for j in range(i + 1, len(components)):
+            if component.mask & components[j].mask:
+                parent[find(j)] = find(i)
+    blocks = defaultdict(lambda: ([], []))
+    for i, component in enumerate(components):
+        blocks[find(i)][i >= len(term.components)].append(component)
+    blocks = list(blocks.values())
+    result = []
+    agreed = []
+    for k, (mine, theirs) in enumerate(blocks):
+        if mine == theirs:
+            agreed.append(mine[0])
+            continue
+        theirs = set(_combine(theirs).alternatives)
+        same, different = [], []
+        for alternative in _combine(mine).alternatives:
+            (same if alternative in theirs else different).append(alternative)
+        if not same:
+            return [term]
+        if different:
+            later = tuple(c for block, _ in blocks[k + 1 :] for c in block)
+            result.append((agreed + [Component(different)], later))
+        agreed.append(Component(same))
+    return [Term(term.base, _sorted(tuple(before) + later)) for before, later in result]
+
+
+def _merge_keys(term: Term):
+    base, components = term
+    for i in range(len(components)):
+        yield base, components[:i] + components[i + 1 :]
+
+
+def _coarsen(terms: List[Term]) -> List[Term]:
+    """Merge all terms with the same base into one, merging the components they do not share
+
+    This is exact but may leave a large component, so it is only a fallback for when the number of
+    terms grows too large to merge pairwise. The terms' union rarely factors much, so the result
+    is often a single component as large as the set (see the module docstring).
+    """
+    groups = defaultdict(list)
+    for term in terms:
+        groups[term.base].append(term.components)
+    coarse = []
+    for base, group in groups.items():
+        shared = set(group[0]).intersection(*group[1:])
+        alternatives = []
+        for components in group:
+            alternatives += _combine(
+                [c for c in components if c not in shared]
+            ).alternatives
+        factors = _factor(Component(alternatives))
+        coarse.append(Term(base, _sorted(tuple(shared) + tuple(factors))))
+    return coarse
+
+
+def _side_to_move(hypotheses: FactoredHypotheses) -> chess.Color:
+    turns = {term.base[0] for term in hypotheses.terms}
+    if len(turns) != 1:
+        raise ValueError("the hypotheses disagree on the side to move")
+    return turns.pop()
+
+
+def _hide_pieces(term: Term, color: chess.Color) -> Term:
+    """Move the pieces of color out of a term's base, each into a component of its own"""
+    base, components = term
+    board = _board(base, [c.alternatives[0] for c in components], None)
+    new_base, alternative = _split_board(board, color)
+    return Term(
+        new_base, _sorted(components + tuple(_factor(Component([alternative]))))
+    )
+
+
+def _passed(base: tuple) -> tuple:
+    """The base after an opponent move that left the known pieces untouched"""
+    turn, *rest, _ = base
+    return (not turn, *rest, None)
+
+
+def _coupled_groups(term: Term) -> List[Tuple[List[Component], chess.Bitboard]]:
+    """Group a term's components so that each group's moves depend only on its own alternatives
+
+    A component is grouped with every component whose contents, where they vary, may change the
+    moves of its pieces, and with every component its moves may change (castling moves a rook and
+    any king move gives up castling rights). Returns each group with the squares its moves depend
+    on.
+    """
+    base, components = term
+    known = base[1] | base[2]
+    constant = [c.constant_occupancy() for c in components]
+    all_constant = _or(*constant)
+    parent = list(range(len(components)))
+
+    def find(i):
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    castling = 0
+    for component in components:
+        for alternative in component.alternatives:
+            castling |= alternative[_CASTLING]
+    reaches = []
+    for i, component in enumerate(components):
+        blockers = all_constant & ~constant[i]
+        reach = corners = 0
+        for alternative in component.alternatives:
+            alternative_reach, alternative_corners = _reach(
+                alternative, base, blockers, known, castling
+            )
+            reach |= alternative_reach
+            corners |= alternative_corners
+        reaches.append(reach)
+        for j, other in enumerate(components):
+            if i != j and (reach & other.mask & ~constant[j] or corners & other.mask):
+                parent[find(j)] = find(i)
+    groups = defaultdict(lambda: ([], 0))
+    for i, component in enumerate(components):
+        group, reach = groups[find(i)]
+        group.append(component)
+        groups[find(i)] = group, reach | reaches[i]
+    return list(groups.values())
+
+
+def _reach(
+    alternative: Alternative,
+    base: tuple,
+    blockers: chess.Bitboard,
+    known: chess.Bitboard,
+    castling: chess.Bitboard,
+) -> Tuple[chess.Bitboard, chess.Bitboard]:
+    """Squares whose contents may change the moves of an alternative's pieces, and corners they
+    may change
+
+    blockers are squares always occupied by other opponent pieces, which stop sliding moves, as do
+    known pieces (which are captured). Castling moves a rook, and any king move gives up the
+    castling rights, so the king changes the corners it may castle with even when their rooks never
+    move.
+    """
+    kings, queens, bishops, knights, rooks, pawns, _, _ = alternative
+    occupied = _occupancy(alternative) | blockers | known
+    reach = corners = 0
+    for square in chess.scan_forward(knights):
+        reach |= chess.BB_KNIGHT_ATTACKS[square]
+    for square in chess.scan_forward(kings):
+        reach |= chess.BB_KING_ATTACKS[square]
+        backrank = chess.BB_RANKS[chess.square_rank(square)]
+        for corner in chess.scan_forward(castling & backrank):
+            reach |= chess.between(square, corner)
+            corners |= chess.BB_SQUARES[corner]
+    for square in chess.scan_forward(bishops | queens):
+        reach |= chess.BB_DIAG_ATTACKS[square][chess.BB_DIAG_MASKS[square] & occupied]
+    for square in chess.scan_forward(rooks | queens):
+        reach |= (
+            chess.BB_RANK_ATTACKS[square][chess.BB_RANK_MASKS[square] & occupied]
+            | chess.BB_FILE_ATTACKS[square][chess.BB_FILE_MASKS[square] & occupied]
+        )
+    ep = 0 if base[-1] is None else chess.BB_SQUARES[base[-1]]
+    turn = base[0]
+    for square in chess.scan_forward(pawns):
+        push = chess.BB_SQUARES[square + (8 if turn else -8)]
+        reach |= push
+        if push & ~occupied and chess.BB_SQUARES[square] & (
+            chess.BB_RANK_2 if turn else chess.BB_RANK_7
+        ):
+            reach |= chess.BB_SQUARES[square + (16 if turn else -16)]
+        # Captures onto empty squares fail, so only known pieces matter
+        reach |= chess.BB_PAWN_ATTACKS[turn][square] & (known | ep)
+    return reach, corners
@@ -0,0 +1,145 @@
+"""Download game histories from the reconchess server, keeping them in a local cache
+
+fetch_histories downloads many games at once over one pooled HTTP session, with at most a fixed
+number of requests in flight, and fetch_history downloads one. Both check the cache first, so each
+game is only downloaded once.
+
+The cache is content-addressed: each downloaded history is stored under the SHA-256 of its bytes in
+an objects directory, and a small ref file named by a hash of the server URL and game ID records
+which object holds that game. Games that are downloaded again (for example after a lost ref) are
+stored once, and objects are written to a temporary path and moved into place, so concurrent or
+interrupted downloads never leave a partial history behind.
+"""
+
+import hashlib
+import json
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterable, Optional, Union
+
+import reconchess
+import requests
+from requests.adapters import HTTPAdapter
+
+
+def default_cache_dir() -> str:
+    cache_home = os.environ.get("XDG_CACHE_HOME") or os.path.join(
+        os.path.expanduser("~"), ".cache"
+    )
+    return os.path.join(cache_home, "reconchess-tools", "histories")
+
+
+class HistoryCache:
+    """Downloaded game histories, stored by the hash of their contents"""
+
+    def __init__(self, cache_dir: Optional[str] = None):
+        self.cache_dir = cache_dir or default_cache_dir()
+
+    def _ref_path(self, server_url: str, game_id: int) -> str:
+        name = hashlib.sha256(f"{server_url.rstrip('/')} {game_id}".encode())
+        return os.path.join(self.cache_dir, "refs", name.hexdigest())
+
+    def object_path(self, digest: str) -> str:
+        return os.path.join(self.cache_dir, "objects", digest[:2], f"{digest}.json")
+
+    def get(self, server_url: str, game_id: int) -> Optional[bytes]:
+        """The cached history of a game, or None if it has not been downloaded"""
+        try:
+            with open(self._ref_path(server_url, game_id)) as f:
+                digest = f.read().strip()
+            with open(self.object_path(digest), "rb") as f:
+                content = f.read()
+        except OSError:
+            return None
+        if hashlib.sha256(content).hexdigest() != digest:  # corrupt object
+            return None
+        return content
+
+    def put(self, server_url: str, game_id: int, content: bytes) -> str:
+        """Store the downloaded history of a game, returning the hash it is stored under"""
+        digest = hashlib.sha256(content).hexdigest()
+        # Rewritten even if present, in case it is the corrupt object get just skipped
+        _write_atomically(self.object_path(digest), content)
+        _write_atomically(self._ref_path(server_url, game_id), digest.encode())
+        return digest
+
+
+def _write_atomically(path: str, content: bytes):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(content)
+    os.replace(tmp_path, path)
+
+
+def decode_history(content: bytes) -> reconchess.GameHistory:
+    """Decode the server's response to a game history request"""
+    return json.loads(content, cls=reconchess.GameHistoryDecoder)["game_history"]
+
+
+def create_session(auth, max_concurrency: int = 8) -> requests.Session:
+    """An HTTP session that keeps a connection open for each concurrent request"""
+    session = requests.Session()
+    session.auth = auth
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=max_concurrency)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
+def _download(session: requests.Session, server_url: str, game_id: int) -> bytes:
+    response = session.get(
+        server_url.rstrip("/") + f"/api/games/{game_id}/game_history"
+    )
+    if response.status_code != 200:
+        raise requests.HTTPError(response.text)
+    return response.content
+
+
+def fetch_history(
+    server_url: str,
+    game_id: int,
+    auth,
+    cache: Optional[HistoryCache] = None,
+    session: Optional[requests.Session] = None,
+) -> reconchess.GameHistory:
+    """Fetch the history of one game, from the cache if it has been downloaded before"""
+    content = cache.get(server_url, game_id) if cache is not None else None
+    if content is None:
+        if session is None:
+            with create_session(auth, 1) as session:
+                content = _download(session, server_url, game_id)
+        else:
+            content = _download(session, server_url, game_id)
+        if cache is not None:
+            cache.put(server_url, game_id, content)
+    return decode_history(content)
+
+
+def fetch_histories(
+    server_url: str,
+    game_ids: Iterable[int],
+    auth,
+    cache: Optional[HistoryCache] = None,
+    max_concurrency: int = 8,
+) -> Dict[int, Union[reconchess.GameHistory, Exception]]:
+    """Fetch the histories of many games, at most max_concurrency at a time
+
+    Returns the history of each game, or the error that fetching it raised.
+    """
+    game_ids = list(dict.fromkeys(game_ids))
+    results = {}
+
+    def fetch(game_id):
+        try:
+            return fetch_history(server_url, game_id, auth, cache, session)
+        except Exception as e:
+            return e
+
+    with create_session(auth, max_concurrency) as session, ThreadPoolExecutor(
+        max_concurrency
+    ) as executor:
+        for game_id, result in zip(game_ids, executor.map(fetch, game_ids)):
+            results[game_id] = result
+    return results
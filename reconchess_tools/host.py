@@ -0,0 +1,304 @@
+"""Host many reconchess games in one process, sharing engines, caches, and workers between them
+
+A GameHost plays any number of games concurrently on an asyncio event loop. Calls to the game
+(which are blocking HTTP requests for server games) run on a thread pool for I/O, and player
+callbacks run on a shared pool of worker threads, so the loop only orchestrates. There are fewer
+workers than games, and when more callbacks are waiting than there are free workers, the worker
+goes to the game with the least time left on its clock. A callback that is a coroutine function
+runs on the event loop itself instead, and should yield regularly (as the MultiHypothesisTracker's
+*_async methods do) so the other games keep running.
+
+The workers are threads, so the global interpreter lock still runs the Python code of callbacks,
+such as MHT updates, one at a time: more workers overlap waiting on engines (which run in their own
+processes) and on the network, not CPU-bound work. The players stay in this process because they
+are stateful objects called back throughout a game. To use more cores, run a host per core.
+
+An EnginePool holds a fixed number of UCI engines shared by all the hosted players, checked out
+for one analysis at a time, and caches the results of depth- or node-limited analyses across
+games. Players that take an engine keyword argument (like the example MhtBot) are given the pool,
+which they can use in place of their own engine.
+
+listen_for_invitations plays every game the reconchess server invites the bot to, up to a limit
+at once, in the same process.
+"""
+
+import asyncio
+import heapq
+import inspect
+import itertools
+import queue
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Callable, List, Optional
+
+import chess
+import chess.engine
+from reconchess import Game, LocalGame, Player, RemoteGame
+
+from reconchess_tools.utilities import board_fingerprint
+
+
+class EnginePool:
+    """UCI engines shared between players, with a shared cache of analysis results
+
+    analyse has the signature of chess.engine.SimpleEngine.analyse, and blocks until one of the
+    engines is free. Only analyses limited by depth or nodes alone are cached, since the results of
+    time-limited analyses depend on the load on the machine.
+    """
+
+    def __init__(
+        self,
+        size: int = 2,
+        engine_factory: Optional[Callable[[], chess.engine.SimpleEngine]] = None,
+        cache_size: int = 100_000,
+    ):
+        if engine_factory is None:
+            # Imported here because the stockfish module requires STOCKFISH_EXECUTABLE to be set
+            from reconchess_tools.stockfish import create_engine
+
+            engine_factory = create_engine
+        self.engines = [engine_factory() for _ in range(size)]
+        self._free = queue.Queue()
+        for engine in self.engines:
+            self._free.put(engine)
+        self.cache_size = cache_size
+        self._cache = OrderedDict()
+        self._cache_lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def analyse(self, board: chess.Board, limit: chess.engine.Limit, **kwargs):
+        key = None
+        if limit.time is None and (limit.depth is not None or limit.nodes is not None):
+            key = (
+                board_fingerprint(board),
+                limit.depth,
+                limit.nodes,
+                tuple(sorted(kwargs.items())),
+            )
+            with self._cache_lock:
+                if key in self._cache:
+                    self._cache.move_to_end(key)
+                    self.hits += 1
+                    return self._cache[key]
+                self.misses += 1
+        engine = self._free.get()
+        try:
+            result = engine.analyse(board, limit, **kwargs)
+        finally:
+            self._free.put(engine)
+        if key is not None:
+            with self._cache_lock:
+                self._cache[key] = result
+                if len(self._cache) > self.cache_size:
+                    self._cache.popitem(last=False)
+        return result
+
+    def close(self):
+        for engine in self.engines:
+            engine.quit()
+
+
+class ClockScheduler:
+    """Grant a fixed number of slots, first to the waiting game with the least time left"""
+
+    def __init__(self, slots: int):
+        self.free = slots
+        self._waiting = []
+        self._order = itertools.count()
+
+    async def acquire(self, seconds_left: float):
+        if self.free and not self._waiting:
+            self.free -= 1
+            return
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiting, (seconds_left, next(self._order), future))
+        try:
+            await future
+        except asyncio.CancelledError:
+            # The slot may have been granted just before the wait was cancelled
+            if future.done() and not future.cancelled():
+                self.release()
+            raise
+
+    def release(self):
+        while self._waiting:
+            _, _, future = heapq.heappop(self._waiting)
+            if not future.done():
+                future.set_result(None)
+                return
+        self.free += 1
+
+
+class GameHost:
+    """Play many games concurrently in one process (see the module docstring)"""
+
+    def __init__(
+        self,
+        workers: int = 4,
+        engine_pool: Optional[EnginePool] = None,
+        io_threads: int = 32,
+    ):
+        self.engine_pool = engine_pool
+        self.scheduler = ClockScheduler(workers)
+        self._workers = ThreadPoolExecutor(workers, thread_name_prefix="player")
+        self._io = ThreadPoolExecutor(io_threads, thread_name_prefix="game-io")
+
+    def create_player(self, player_cls: Callable[..., Player]) -> Player:
+        """Instantiate a player, giving it the engine pool if it takes an engine"""
+        if self.engine_pool is not None:
+            try:
+                parameters = inspect.signature(player_cls).parameters
+            except (TypeError, ValueError):
+                parameters = {}
+            if "engine" in parameters:
+                return player_cls(engine=self.engine_pool)
+        return player_cls()
+
+    async def run_io(self, function, *args):
+        return await asyncio.get_running_loop().run_in_executor(
+            self._io, function, *args
+        )
+
+    async def _player(self, seconds_left: float, callback, *args):
+        if inspect.iscoroutinefunction(callback):
+            return await callback(*args)
+        await self.scheduler.acquire(seconds_left)
+        try:
+            return await asyncio.get_running_loop().run_in_executor(
+                self._workers, callback, *args
+            )
+        finally:
+            self.scheduler.release()
+
+    async def _play_turn(self, game: Game, player: Player, end_turn_last: bool):
+        """Play one turn as reconchess.play_turn does"""
+        sense_actions = await self.run_io(game.sense_actions)
+        move_actions = await self.run_io(game.move_actions)
+        seconds_left = await self.run_io(game.get_seconds_left)
+
+        capture_square = await self.run_io(game.opponent_move_results)
+        await self._player(
+            seconds_left,
+            player.handle_opponent_move_result,
+            capture_square is not None,
+            capture_square,
+        )
+
+        seconds_left = await self.run_io(game.get_seconds_left)
+        sense = await self._player(
+            seconds_left, player.choose_sense, sense_actions, move_actions, seconds_left
+        )
+        sense_result = await self.run_io(game.sense, sense)
+        await self._player(seconds_left, player.handle_sense_result, sense_result)
+
+        seconds_left = await self.run_io(game.get_seconds_left)
+        move = await self._player(
+            seconds_left, player.choose_move, move_actions, seconds_left
+        )
+        requested_move, taken_move, capture_square = await self.run_io(game.move, move)
+        if not end_turn_last:
+            await self.run_io(game.end_turn)
+        await self._player(
+            seconds_left,
+            player.handle_move_result,
+            requested_move,
+            taken_move,
+            capture_square is not None,
+            capture_square,
+        )
+        if end_turn_last:
+            await self.run_io(game.end_turn)
+
+    async def play_remote_game(self, server_url: str, game_id, auth, player: Player):
+        """Play a server game, as reconchess.play_remote_game does"""
+        game = await self.run_io(RemoteGame, server_url, game_id, auth)
+        color = await self.run_io(game.get_player_color)
+        board = await self.run_io(game.get_starting_board)
+        opponent_name = await self.run_io(game.get_opponent_name)
+        await self._player(0.0, player.handle_game_start, color, board, opponent_name)
+        await self.run_io(game.start)
+        while not await self.run_io(game.is_over):
+            await self._play_turn(game, player, end_turn_last=False)
+        winner_color = await self.run_io(game.get_winner_color)
+        win_reason = await self.run_io(game.get_win_reason)
+        history = await self.run_io(game.get_game_history)
+        await self._player(
+            0.0, player.handle_game_end, winner_color, win_reason, history
+        )
+        return winner_color, win_reason, history
+
+    async def play_local_game(
+        self, white: Player, black: Player, game: Optional[LocalGame] = None
+    ):
+        """Play a local game, as reconchess.play_local_game does"""
+        if game is None:
+            game = LocalGame()
+        white_name, black_name = white.__class__.__name__, black.__class__.__name__
+        game.store_players(white_name, black_name)
+        await self._player(
+            0.0, white.handle_game_start, chess.WHITE, game.board.copy(), black_name
+        )
+        await self._player(
+            0.0, black.handle_game_start, chess.BLACK, game.board.copy(), white_name
+        )
+        game.start()
+        players = [black, white]
+        while not game.is_over():
+            await self._play_turn(game, players[game.turn], end_turn_last=True)
+        game.end()
+        winner_color = game.get_winner_color()
+        win_reason = game.get_win_reason()
+        history = game.get_game_history()
+        for player in (white, black):
+            await self._player(
+                0.0, player.handle_game_end, winner_color, win_reason, history
+            )
+        return winner_color, win_reason, history
+
+    def close(self):
+        self._workers.shutdown()
+        self._io.shutdown()
+        if self.engine_pool is not None:
+            self.engine_pool.close()
+
+
+async def listen_for_invitations(
+    host: GameHost,
+    server_url: str,
+    auth,
+    player_cls: Callable[..., Player],
+    max_games: int,
+    poll_seconds: float = 5.0,
+):
+    """Accept and play the server's invitations, up to max_games at once, until cancelled"""
+    from reconchess.scripts.rc_connect import RBCServer
+
+    server = RBCServer(server_url, auth)
+    await host.run_io(server.set_max_games, max_games)
+    games = {}
+
+    async def play(invitation):
+        game_id = await host.run_io(server.accept_invitation, invitation)
+        print(f"[{datetime.now()}] Playing game {game_id}")
+        try:
+            await host.play_remote_game(
+                server_url, game_id, auth, host.create_player(player_cls)
+            )
+            print(f"[{datetime.now()}] Finished game {game_id}")
+        except Exception as e:
+            print(f"[{datetime.now()}] Fatal error in game {game_id}: {e!r}")
+            await host.run_io(server.error_resign, game_id)
+        finally:
+            await host.run_io(server.finish_invitation, invitation)
+
+    while True:
+        for invitation in [i for i, task in games.items() if task.done()]:
+            del games[invitation]
+        invitations: List = await host.run_io(server.get_invitations)
+        for invitation in invitations:
+            if invitation not in games and len(games) < max_games:
+                games[invitation] = asyncio.create_task(play(invitation))
+        await asyncio.sleep(poll_seconds)
@@ -0,0 +1,128 @@
+"""Structured events from MultiHypothesisTracker updates, and sinks to send them to
+
+A MultiHypothesisTracker with sinks attached emits an MhtEvent after each sense, move, op_move, and
+speculate_sense update, describing how the number of hypotheses changed and what the update cost.
+With no sinks attached (the default), the tracker skips all of this bookkeeping.
+
+A sink is any object with an emit(event) method. Three are provided: RingBufferSink keeps the most
+recent events in memory, JsonlSink appends each event to a JSON Lines file, and PrometheusSink
+aggregates events into counters rendered in the Prometheus text exposition format (for example for
+the node exporter's textfile collector).
+"""
+
+import json
+import os
+from collections import defaultdict, deque
+from typing import IO, Dict, List, NamedTuple, Union
+
+# Approximate memory held by one hypothesis: a board copied without its move stack and then pushed
+# one move, as op_move creates them
+BOARD_BYTES_ESTIMATE = 1_000
+
+
+class MhtEvent(NamedTuple):
+    step: str
+    # Unix time at which the update finished
+    timestamp: float
+    boards_in: int
+    boards_out: int
+    # Hypotheses produced per input hypothesis: the fraction kept by sense and move, the children
+    # per board (before deduplication) of op_move, and the average number of distinct sense
+    # results per square of speculate_sense
+    branching_factor: float
+    # Children of op_move discarded as duplicates of another hypothesis
+    dedup_collisions: int
+    # Wall-clock time, including time yielded to the event loop by the async methods
+    duration_seconds: float
+    # Estimate of the memory held by the hypotheses alive at once during the update
+    peak_bytes_estimate: int
+
+    def to_dict(self) -> Dict:
+        return self._asdict()
+
+
+class RingBufferSink:
+    """Keep the most recent events in memory"""
+
+    def __init__(self, capacity: int = 1_000):
+        self.buffer = deque(maxlen=capacity)
+
+    def emit(self, event: MhtEvent):
+        self.buffer.append(event)
+
+    @property
+    def events(self) -> List[MhtEvent]:
+        return list(self.buffer)
+
+
+class JsonlSink:
+    """Append each event as one line of JSON to a file or an open text stream"""
+
+    def __init__(self, file: Union[str, IO[str]]):
+        if isinstance(file, str):
+            self.file = open(file, "a")
+            self.owns_file = True
+        else:
+            self.file = file
+            self.owns_file = False
+
+    def emit(self, event: MhtEvent):
+        self.file.write(json.dumps(event.to_dict()) + "\n")
+        self.file.flush()
+
+    def close(self):
+        if self.owns_file:
+            self.file.close()
+
+
+class PrometheusSink:
+    """Aggregate events into per-step counters and gauges in the Prometheus text format"""
+
+    def __init__(self, prefix: str = "reconchess_mht"):
+        self.prefix = prefix
+        self.totals: Dict[str, Dict[str, float]] = defaultdict(
+            lambda: defaultdict(float)
+        )
+        self.last: Dict[str, MhtEvent] = {}
+
+    def emit(self, event: MhtEvent):
+        totals = self.totals[event.step]
+        totals["updates_total"] += 1
+        totals["seconds_total"] += event.duration_seconds
+        totals["boards_in_total"] += event.boards_in
+        totals["boards_out_total"] += event.boards_out
+        totals["dedup_collisions_total"] += event.dedup_collisions
+        totals["seconds_max"] = max(totals["seconds_max"], event.duration_seconds)
+        self.last[event.step] = event
+
+    def render(self) -> str:
+        metrics = [
+            ("updates_total", "counter", "Number of updates"),
+            ("seconds_total", "counter", "Time spent in updates"),
+            ("seconds_max", "gauge", "Slowest update"),
+            ("boards_in_total", "counter", "Hypotheses input to updates"),
+            ("boards_out_total", "counter", "Hypotheses output by updates"),
+            ("dedup_collisions_total", "counter", "Duplicate hypotheses discarded"),
+        ]
+        lines = []
+        for name, metric_type, description in metrics:
+            lines += [
+                f"# HELP {self.prefix}_{name} {description}",
+                f"# TYPE {self.prefix}_{name} {metric_type}",
+            ]
+            for step, totals in sorted(self.totals.items()):
+                lines.append(f'{self.prefix}_{name}{{step="{step}"}} {totals[name]:g}')
+        lines += [
+            f"# HELP {self.prefix}_boards Hypotheses after the latest update",
+            f"# TYPE {self.prefix}_boards gauge",
+        ]
+        for step, event in sorted(self.last.items()):
+            lines.append(f'{self.prefix}_boards{{step="{step}"}} {event.boards_out}')
+        return "\n".join(lines) + "\n"
+
+    def write(self, path: str):
+        """Write the metrics to a file, replacing it atomically as textfile collectors expect"""
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w") as f:
+            f.write(self.render())
+        os.replace(tmp_path, path)
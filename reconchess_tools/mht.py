@@ -1,39 +1,36 @@
-from collections import defaultdict
-from typing import List, Optional, Tuple
+import asyncio
+import heapq
+from collections import Counter, defaultdict, deque
+from time import perf_counter, time
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
 
 import chess
 
+from reconchess_tools import factored, move_tree
+from reconchess_tools.factored import FactoredHypotheses, hidden_color
+from reconchess_tools.instrumentation import BOARD_BYTES_ESTIMATE, MhtEvent
+from reconchess_tools.move_tree import MoveTreeHypotheses
+from reconchess_tools.openings import (
+    OpeningTable,
+    extend_key,
+    move_observation,
+    op_move_observation,
+    sense_observation,
+)
+from reconchess_tools.parallel_sense import speculate_sense_parallel
+from reconchess_tools.priors import MovePrior
+from reconchess_tools.snapshot import load_snapshot, save_snapshot
+from reconchess_tools.spill import HypothesisCollector, remove_spilled
+from reconchess_tools.square_index import SquareIndex, changed_squares
 from reconchess_tools.strategy import SENSE_SQUARES
 from reconchess_tools.utilities import (
+    board_fingerprint,
     possible_requested_moves,
     simulate_move,
     simulate_sense,
 )
 
 
-def board_fingerprint(board: chess.Board):
-    """Compute a fingerprint for fast board comparisons
-
-    This fingerprint is a tuple of integers and booleans that contains the same information as the
-    extended position description (EPD). It does not contain all of the information in the FEN, e.g.
-    half-move counter, because those are not significant in reconchess. Two boards have the same
-    fingerprint, they are identical as far as reconchess is concerned, including allowing the same
-    requested moves, and having the same results for any sense or move action.
-    """
-    return (
-        board.turn,
-        *board.occupied_co,
-        board.kings,
-        board.queens,
-        board.bishops,
-        board.knights,
-        board.rooks,
-        board.pawns,
-        board.castling_rights,
-        board.ep_square,
-    )
-
-
 class MultiHypothesisTracker:
     """An object to keep track of the possible true board states in a reconchess game
 
@@ -63,39 +60,224 @@ class MultiHypothesisTracker:
     property. If present, this is used in the sense step rather than recomputing simulated sense
     results. The sense_speculation property can be input to various functions in the strategy module
     to aid sense decision making. It is reset to None after it is used in the sense step.
+
+    Each update method has an asynchronous counterpart (e.g. op_move_async) for use inside an
+    asyncio event loop, as in the replay UI. Those process hypotheses for up to time_slice seconds
+    at a time before yielding control, so the loop stays responsive without paying the cost of a
+    trip through the scheduler for every board.
+
+    Each update emits an instrumentation event (see the instrumentation module) to every sink in
+    the sinks list. When that list is empty, as it is by default, no events are built at all.
+
+    To keep tracking exactly when there are more hypotheses than fit in memory, give a
+    spill_threshold. Any update producing more boards than that writes them to a file on disk
+    instead (see the spill module), and the boards property becomes a read-only sequence that
+    decodes boards from that file on access. The following updates stream over the file, so they
+    are slower but hold at most about spill_threshold boards in memory at a time, and the set
+    returns to memory once an update leaves no more than spill_threshold boards. Spill files are
+    deleted as they are replaced by updates or by reset, but not if you assign the boards property
+    yourself. Note that speculate_sense still holds all the boards it groups in memory.
+
+    Alternatively, pass factored=True to store the hypotheses as a FactoredHypotheses (see the
+    factored module), which keeps the opponent's pieces in independent parts of the board as
+    separate components rather than storing every combination of them. The boards property is
+    then a read-only sequence that builds boards on access, speculate_sense maps each result to a
+    FactoredHypotheses as well, and slicing the boards returns a list, which the following updates
+    track flat. Once the opponent's unobserved moves leave more than factored.MAX_TERMS terms, the
+    set is stored about flat (see the factored module). Factoring and spilling cannot be combined.
+
+    Or pass move_tree=True to store the hypotheses as a MoveTreeHypotheses (see the move_tree
+    module), which keeps positions as a tree of moves from shared ancestors, so that op_move and
+    move add a node per child rather than copying or pushing onto a board per hypothesis. The
+    boards property is then a read-only sequence that builds boards on access, and speculate_sense
+    and slicing return MoveTreeHypotheses as well. A move tree cannot be combined with spilling,
+    factoring, an index, or a move_prior.
+
+    Pass indexed=True to keep a SquareIndex of the boards (see the square_index module), which
+    sense reads instead of simulating the sense on every board, and which sense_group_sizes counts
+    sense result groups from. Assigning the boards property rebuilds the index, as does any update
+    after boards were added to, removed from, or reordered in the list in place. An index cannot be
+    combined with spilling or factoring.
+
+    By default every move the opponent could request is considered equally likely. Given a
+    move_prior (see the priors module), op_move instead weighs each child by the prior probability
+    of the request producing it, and the likelihoods property maps the fingerprint of each board to
+    its posterior probability (boards without an entry, e.g. ones you assigned, count as 1 before
+    normalizing). Sense, move, keep_most_likely, and assigning the boards drop the likelihoods of
+    the boards they remove and renormalize the rest. With a prune_threshold, op_move drops children
+    less likely than that, and with top_k it keeps only the k most likely, so the set stays
+    tractable without slicing it. Either may discard the true board. Pruning needs every child in
+    memory, so a move_prior cannot be combined with spilling or factoring.
+
+    Given an opening_table (see the openings module), the tracker looks the hypothesis set after
+    each update up in the table by the observations since the last reset, and computes updates
+    itself from the first one whose observation history is not in the table. The boards of a table
+    carry no likelihoods, so with a move_prior they start out equally likely.
     """
 
-    def __init__(self):
-        self.boards = [chess.Board()]
+    def __init__(
+        self,
+        time_slice: float = 0.005,
+        sinks: Sequence = (),
+        spill_threshold: Optional[int] = None,
+        spill_dir: Optional[str] = None,
+        factored: bool = False,
+        move_prior: Optional[MovePrior] = None,
+        prune_threshold: Optional[float] = None,
+        top_k: Optional[int] = None,
+        opening_table: Optional[OpeningTable] = None,
+        indexed: bool = False,
+        move_tree: bool = False,
+    ):
+        if factored and spill_threshold is not None:
+            raise ValueError("factored hypotheses cannot be spilled to disk")
+        if indexed and (factored or spill_threshold is not None):
+            raise ValueError(
+                "a square index cannot be combined with spilling or factoring"
+            )
+        if move_tree and (
+            factored or spill_threshold is not None or indexed or move_prior is not None
+        ):
+            raise ValueError(
+                "a move tree cannot be combined with spilling, factoring, an index, or a "
+                "move_prior"
+            )
+        if move_prior is None and (prune_threshold is not None or top_k is not None):
+            raise ValueError("pruning requires a move_prior")
+        if move_prior is not None and (factored or spill_threshold is not None):
+            raise ValueError(
+                "a move_prior cannot be combined with spilling or factoring"
+            )
+        # Whether reset and load store the hypotheses as a FactoredHypotheses or a
+        # MoveTreeHypotheses
+        self.factored = factored
+        self.move_tree = move_tree
+        # An inverted index of the boards by square contents, kept only if indexed (see the
+        # square_index module)
+        self.indexed = indexed
+        self._boards = self._initial_boards()
+        self.index: Optional[SquareIndex] = (
+            SquareIndex(self._boards) if indexed else None
+        )
 
         # An optional nested map of subsequent boards given a sense square and sense result
         self.sense_speculation = None
 
+        # The longest the cooperative (async) update methods run before yielding to the event loop
+        self.time_slice = time_slice
+
+        # Instrumentation sinks, each an object with an emit(event) method (see instrumentation)
+        self.sinks = list(sinks)
+
+        # Past this many boards, updates write their output to disk (in spill_dir, or the system
+        # temporary directory) instead of memory. None disables spilling.
+        self.spill_threshold = spill_threshold
+        self.spill_dir = spill_dir
+        # The number of boards op_move generated before removing duplicates, for instrumentation
+        self._op_move_children = 0
+
+        # The prior over opponent requests weighing op_move's children, and the pruning applied
+        # to them, if any
+        self.move_prior = move_prior
+        self.prune_threshold = prune_threshold
+        self.top_k = top_k
+        # The posterior probability of each board by fingerprint, kept only with a move_prior
+        self.likelihoods: Dict[tuple, float] = {}
+
+        # Precomputed hypothesis sets by observation history, and the history since the last
+        # reset, or None once the game has left the table (or without a table)
+        self.opening_table = opening_table
+        self.opening_key: Optional[str] = "" if opening_table is not None else None
+
         # TODO speculation
         #  - For each of my move and opponent move, add a method to calculate all possible outcomes
         #    without the prior information.
         #  - Have existing methods do a lookup on speculation results if present, then delete them.
 
+    @property
+    def boards(self) -> Sequence[chess.Board]:
+        return self._boards
+
+    @boards.setter
+    def boards(self, boards: Sequence[chess.Board]):
+        # Assigning the boards yourself, e.g. a slice of them, rebuilds the index and drops the
+        # likelihoods of the boards left out
+        self._boards = boards
+        if self.indexed:
+            self.index = SquareIndex(boards)
+        self._restrict_likelihoods()
+
     def reset(self):
-        self.boards = [chess.Board()]
+        self._replace_boards(self._initial_boards())
+        self.likelihoods = {}
+        self.opening_key = "" if self.opening_table is not None else None
 
-    def speculate_sense(self, sense_squares=SENSE_SQUARES):
-        self.sense_speculation = {}
-        for square in sense_squares:
-            self.sense_speculation[square] = sense_results = defaultdict(list)
-            for board in self.boards:
-                sense_results[tuple(simulate_sense(board, square))].append(board)
+    def save(self, path: str):
+        """Save the hypothesis set to a snapshot file (see the snapshot module)"""
+        save_snapshot(path, self.boards)
+
+    def load(self, path: str):
+        """Replace the hypothesis set with the boards of a snapshot file"""
+
+        boards = list(load_snapshot(path))
+        if self.factored:
+            boards = FactoredHypotheses.from_boards(boards, hidden_color(boards))
+        elif self.move_tree:
+            boards = MoveTreeHypotheses.from_boards(boards)
+        self._replace_boards(boards)
+        self.sense_speculation = None
+        self.likelihoods = {}
+        self.opening_key = None
+
+    def _initial_boards(self) -> Sequence[chess.Board]:
+        if self.factored:
+            return FactoredHypotheses.from_boards([chess.Board()], None)
+        if self.move_tree:
+            return MoveTreeHypotheses.from_boards([chess.Board()])
+        return [chess.Board()]
+
+    def keep_most_likely(self, count: int):
+        """Discard all but the count most likely boards (or the first count, without a prior)"""
+        if len(self.boards) <= count:
+            return
+        boards = self.boards
+        if self.likelihoods:
+            boards = sorted(
+                boards,
+                key=lambda board: self.likelihoods.get(board_fingerprint(board), 1.0),
+                reverse=True,
+            )
+        self._replace_boards(boards[:count])
+        self._restrict_likelihoods()
+
+    # Each update is written once, as a generator that yields after every hypothesis it processes,
+    # and driven either synchronously or cooperatively. Cancelling a cooperative update part way
+    # through leaves the tracker in an unspecified state.
+
+    def sense_group_sizes(
+        self, sense_squares=SENSE_SQUARES
+    ) -> Dict[chess.Square, Dict[tuple, int]]:
+        """The number of boards with each sense result on each square, read from the index if any"""
+        if self.index is not None:
+            index = self._current_index()
+            return {square: index.group_sizes(square) for square in sense_squares}
+        return {
+            square: Counter(
+                tuple(simulate_sense(board, square)) for board in self.boards
+            )
+            for square in sense_squares
+        }
+
+    def speculate_sense(self, sense_squares=SENSE_SQUARES, pool=None):
+        """Group the boards by sense result on each square, on a multiprocessing pool if given
+
+        See the parallel_sense module for the parallel path, which does not yield to the event loop
+        when run cooperatively.
+        """
+        self._update("speculate_sense", self._speculate_sense(sense_squares, pool))
 
     def sense(self, square: chess.Square, sorted_result: List[Tuple[int, chess.Piece]]):
-        if self.sense_speculation is not None:
-            self.boards = self.sense_speculation[square][tuple(sorted_result)]
-            self.sense_speculation = None
-        else:
-            self.boards = [
-                board
-                for board in self.boards
-                if simulate_sense(board, square) == sorted_result
-            ]
+        self._update("sense", self._sense(square, sorted_result))
 
     def move(
         self,
@@ -103,16 +285,224 @@ class MultiHypothesisTracker:
         taken_move: chess.Move,
         capture_square: Optional[chess.Square],
     ):
-        self.boards = [
-            board
-            for board in self.boards
-            if simulate_move(board, requested_move) == (taken_move, capture_square)
-        ]
-        for board in self.boards:
-            board.push(taken_move)
+        self._update("move", self._move(requested_move, taken_move, capture_square))
 
     def op_move(self, capture_square: Optional[chess.Square]):
-        new_boards = {}
+        self._update("op_move", self._op_move(capture_square))
+
+    async def speculate_sense_async(self, sense_squares=SENSE_SQUARES, pool=None):
+        await self._update_async(
+            "speculate_sense", self._speculate_sense(sense_squares, pool)
+        )
+
+    async def sense_async(
+        self, square: chess.Square, sorted_result: List[Tuple[int, chess.Piece]]
+    ):
+        await self._update_async("sense", self._sense(square, sorted_result))
+
+    async def move_async(
+        self,
+        requested_move: chess.Move,
+        taken_move: chess.Move,
+        capture_square: Optional[chess.Square],
+    ):
+        await self._update_async(
+            "move", self._move(requested_move, taken_move, capture_square)
+        )
+
+    async def op_move_async(self, capture_square: Optional[chess.Square]):
+        await self._update_async("op_move", self._op_move(capture_square))
+
+    def _update(self, step: str, steps: Iterator[None]):
+        if not self.sinks:
+            _run(steps)
+            return
+        boards_in, start = len(self.boards), perf_counter()
+        _run(steps)
+        self._emit(step, boards_in, start)
+
+    async def _update_async(self, step: str, steps: Iterator[None]):
+        if not self.sinks:
+            await _run_async(steps, self.time_slice)
+            return
+        boards_in, start = len(self.boards), perf_counter()
+        await _run_async(steps, self.time_slice)
+        self._emit(step, boards_in, start)
+
+    def _emit(self, step: str, boards_in: int, start: float):
+        duration_seconds = perf_counter() - start
+        boards_out = len(self.boards)
+        dedup_collisions = 0
+        peak_boards = boards_in
+        if step == "op_move":
+            branching_factor = self._op_move_children / max(1, boards_in)
+            dedup_collisions = self._op_move_children - boards_out
+            peak_boards += boards_out
+        elif step == "speculate_sense":
+            groups = [len(results) for results in self.sense_speculation.values()]
+            branching_factor = sum(groups) / max(1, len(groups))
+        else:
+            branching_factor = boards_out / max(1, boards_in)
+        event = MhtEvent(
+            step,
+            time(),
+            boards_in,
+            boards_out,
+            branching_factor,
+            dedup_collisions,
+            duration_seconds,
+            peak_boards * BOARD_BYTES_ESTIMATE,
+        )
+        for sink in self.sinks:
+            sink.emit(event)
+
+    def _speculate_sense(self, sense_squares, pool=None) -> Iterator[None]:
+        if isinstance(self.boards, FactoredHypotheses):
+            self.sense_speculation = yield from factored.speculate_sense(
+                self.boards, sense_squares
+            )
+            return
+        if isinstance(self.boards, MoveTreeHypotheses):
+            self.sense_speculation = yield from move_tree.speculate_sense(
+                self.boards, sense_squares
+            )
+            return
+        if pool is not None:
+            self.sense_speculation = speculate_sense_parallel(
+                self.boards, list(sense_squares), pool
+            )
+            return
+        # Decode spilled boards once, so that every group holds the same board objects
+        boards = list(self.boards)
+        sense_speculation = {}
+        for square in sense_squares:
+            sense_speculation[square] = sense_results = defaultdict(list)
+            for board in boards:
+                sense_results[tuple(simulate_sense(board, square))].append(board)
+                yield
+        self.sense_speculation = sense_speculation
+
+    def _sense(
+        self, square: chess.Square, sorted_result: List[Tuple[int, chess.Piece]]
+    ) -> Iterator[None]:
+        yield from self._filter_by_sense(square, sorted_result)
+        self._restrict_likelihoods()
+
+    def _filter_by_sense(
+        self, square: chess.Square, sorted_result: List[Tuple[int, chess.Piece]]
+    ) -> Iterator[None]:
+        # Not sensing observes nothing, so it does not extend the observation history
+        if square is not None and self._from_opening_table(
+            sense_observation(square, sorted_result)
+        ):
+            self.sense_speculation = None
+            return
+        if self.index is not None and square is not None:
+            index = self._current_index()
+            index.keep(index.matching(sorted_result))
+            self._replace_boards(index.boards(), index)
+            self.sense_speculation = None
+            return
+        if self.sense_speculation is not None:
+            self._replace_boards(self.sense_speculation[square][tuple(sorted_result)])
+            self.sense_speculation = None
+            return
+        if isinstance(self.boards, FactoredHypotheses):
+            self._replace_boards(
+                (yield from factored.sense(self.boards, square, sorted_result))
+            )
+            return
+        if isinstance(self.boards, MoveTreeHypotheses):
+            self._replace_boards(
+                (yield from move_tree.sense(self.boards, square, sorted_result))
+            )
+            return
+        boards = self._collector(dedup=False)
+        for board in self.boards:
+            if simulate_sense(board, square) == sorted_result:
+                boards.add(board)
+            yield
+        self._replace_boards(boards.finish())
+
+    def _move(
+        self,
+        requested_move: chess.Move,
+        taken_move: chess.Move,
+        capture_square: Optional[chess.Square],
+    ) -> Iterator[None]:
+        if self._from_opening_table(
+            move_observation(requested_move, taken_move, capture_square)
+        ):
+            return
+        if isinstance(self.boards, FactoredHypotheses):
+            self._replace_boards(
+                (
+                    yield from factored.move(
+                        self.boards, requested_move, taken_move, capture_square
+                    )
+                )
+            )
+            return
+        if isinstance(self.boards, MoveTreeHypotheses):
+            self._replace_boards(
+                (
+                    yield from move_tree.move(
+                        self.boards, requested_move, taken_move, capture_square
+                    )
+                )
+            )
+            return
+        boards = self._collector(dedup=False)
+        likelihoods = defaultdict(float)
+        slots = self._current_index().live_slots() if self.index is not None else ()
+        kept_slots = []
+        changed = None
+        for position, board in enumerate(self.boards):
+            if simulate_move(board, requested_move) == (taken_move, capture_square):
+                if self.move_prior is not None:
+                    likelihood = self.likelihoods.get(board_fingerprint(board), 1.0)
+                if self.index is not None:
+                    kept_slots.append(slots[position])
+                    if changed is None:
+                        before = board.copy(stack=False)
+                board.push(taken_move)
+                boards.add(board)
+                if self.index is not None and changed is None:
+                    # Our move changes the same squares in the same way on every board
+                    changed = changed_squares(before, board, taken_move)
+                if self.move_prior is not None:
+                    # Boards that differed only in the opponent's en passant square now coincide
+                    likelihoods[board_fingerprint(board)] += likelihood
+            yield
+        if self.index is not None:
+            self.index.keep_slots(kept_slots)
+            self.index.set_squares(changed or {})
+        self._replace_boards(boards.finish(), self.index)
+        if self.move_prior is not None:
+            self.likelihoods = _normalized(likelihoods)
+
+    def _op_move(self, capture_square: Optional[chess.Square]) -> Iterator[None]:
+        if self._from_opening_table(op_move_observation(capture_square)):
+            self._op_move_children = len(self.boards)
+            return
+        if self.move_prior is not None:
+            yield from self._weighted_op_move(capture_square)
+            return
+        if isinstance(self.boards, FactoredHypotheses):
+            self._replace_boards(
+                (yield from factored.op_move(self.boards, capture_square))
+            )
+            # Duplicates are never generated as boards, so none are counted
+            self._op_move_children = len(self.boards)
+            return
+        if isinstance(self.boards, MoveTreeHypotheses):
+            boards, self._op_move_children = yield from move_tree.op_move(
+                self.boards, capture_square
+            )
+            self._replace_boards(boards)
+            return
+        new_boards = self._collector(dedup=True)
+        children = 0
         for board in self.boards:
             for requested_move in possible_requested_moves(board):
                 taken_move, simulated_capture_square = simulate_move(
@@ -121,8 +511,138 @@ class MultiHypothesisTracker:
                 if simulated_capture_square == capture_square:
                     new_board = board.copy(stack=False)
                     new_board.push(taken_move)
-                    new_boards[board_fingerprint(new_board)] = new_board
-        self.boards = list(new_boards.values())
+                    new_boards.add(new_board)
+                    children += 1
+            yield
+        self._replace_boards(new_boards.finish())
+        self._op_move_children = children
+
+    def _weighted_op_move(self, capture_square: Optional[chess.Square]):
+        children = {}
+        likelihoods = defaultdict(float)
+        generated = 0
+        for board in self.boards:
+            likelihood = self.likelihoods.get(board_fingerprint(board), 1.0)
+            requested_moves = list(possible_requested_moves(board))
+            taken_moves = []
+            capture_squares = []
+            for requested_move in requested_moves:
+                taken_move, simulated_capture_square = simulate_move(
+                    board, requested_move
+                )
+                taken_moves.append(taken_move)
+                capture_squares.append(simulated_capture_square)
+            weights = self.move_prior(board, requested_moves, taken_moves)
+            total = sum(weights)
+            for taken_move, simulated_capture_square, weight in zip(
+                taken_moves, capture_squares, weights
+            ):
+                if simulated_capture_square == capture_square and weight > 0:
+                    new_board = board.copy(stack=False)
+                    new_board.push(taken_move)
+                    fingerprint = board_fingerprint(new_board)
+                    children.setdefault(fingerprint, new_board)
+                    likelihoods[fingerprint] += likelihood * weight / total
+                    generated += 1
+            yield
+        distinct = len(likelihoods)
+        likelihoods = _normalized(likelihoods)
+        if self.prune_threshold is not None:
+            likelihoods = {
+                fingerprint: likelihood
+                for fingerprint, likelihood in likelihoods.items()
+                if likelihood >= self.prune_threshold
+            }
+        if self.top_k is not None and len(likelihoods) > self.top_k:
+            likelihoods = dict(
+                heapq.nlargest(
+                    self.top_k, likelihoods.items(), key=lambda item: item[1]
+                )
+            )
+        self.likelihoods = _normalized(likelihoods)
+        self._replace_boards(
+            [children[fingerprint] for fingerprint in self.likelihoods]
+        )
+        # Children that were pruned are not counted, so only duplicates count as collisions
+        self._op_move_children = generated - (distinct - len(self.likelihoods))
+
+    def _from_opening_table(self, observation: str) -> bool:
+        """Replace the hypothesis set with the table's set after the observation, if it has one"""
+        if self.opening_key is None:
+            return False
+        self.opening_key = extend_key(self.opening_key, observation)
+        boards = self.opening_table.get(self.opening_key)
+        if boards is None:
+            self.opening_key = None
+            return False
+        if self.factored:
+            boards = FactoredHypotheses.from_boards(boards, hidden_color(boards))
+        elif self.move_tree:
+            boards = MoveTreeHypotheses.from_boards(boards)
+        self._replace_boards(boards)
+        self.likelihoods = {}
+        return True
+
+    def _collector(self, dedup: bool) -> HypothesisCollector:
+        return HypothesisCollector(dedup, self.spill_threshold, self.spill_dir)
+
+    def _replace_boards(
+        self, boards: Sequence[chess.Board], index: Optional[SquareIndex] = None
+    ):
+        """Set the hypothesis set, deleting the previous set's spill file, if any
+
+        With a square index, the index is rebuilt unless an index already updated to match the new
+        boards is given.
+        """
+        previous, self._boards = self._boards, boards
+        if previous is not boards:
+            remove_spilled(previous)
+        if self.indexed:
+            self.index = index if index is not None else SquareIndex(boards)
+
+    def _restrict_likelihoods(self):
+        """Keep the likelihoods of the remaining boards only, normalized to sum to 1"""
+        if not self.likelihoods:
+            return
+        self.likelihoods = _normalized(
+            {
+                fingerprint: self.likelihoods[fingerprint]
+                for fingerprint in map(board_fingerprint, self._boards)
+                if fingerprint in self.likelihoods
+            }
+        )
+
+    def _current_index(self) -> SquareIndex:
+        """The square index, rebuilt unless its live boards are the boards, in order
+
+        Boards added, removed, or reordered in place (as MhtBot shuffles them) leave the index
+        stale even when their number is the same, so they are compared by identity.
+        """
+        live = self.index.boards()
+        if len(live) != len(self._boards) or any(
+            indexed is not board for indexed, board in zip(live, self._boards)
+        ):
+            self.index = SquareIndex(self._boards)
+        return self.index
+
+
+def _normalized(likelihoods: Dict[tuple, float]) -> Dict[tuple, float]:
+    total = sum(likelihoods.values())
+    return {key: likelihood / total for key, likelihood in likelihoods.items()}
+
+
+def _run(steps: Iterator[None]):
+    """Run a cooperative update to completion without yielding to an event loop"""
+    deque(steps, maxlen=0)
+
+
+async def _run_async(steps: Iterator[None], time_slice: float):
+    """Run a cooperative update, yielding to the event loop once per elapsed time slice"""
+    deadline = perf_counter() + time_slice
+    for _ in steps:
+        if perf_counter() >= deadline:
+            await asyncio.sleep(0)
+            deadline = perf_counter() + time_slice
 
 
 if __name__ == "__main__":
@@ -0,0 +1,278 @@
+"""Hypothesis sets stored as trees of moves from shared ancestor positions
+
+A flat hypothesis set holds a full chess.Board per hypothesis, and op_move copies every surviving
+board once per child, although each child differs from its parent by a single move. A
+MoveTreeHypotheses stores only its root positions as boards. Every other position is a node holding
+its parent node and the move from there, packed into arrays, and each hypothesis is a node of the
+tree (a leaf). Updates walk the leaves with one board per root, pushing the moves down to each leaf
+and popping back up only as far as the next leaf's ancestors, so each edge of the tree is pushed
+once per update rather than each board copied once per child.
+
+Nodes are only appended, and sets derived from a set (by an update, speculate_sense, or slicing)
+start from its arrays. Each update and slice compacts its result, keeping only the ancestors of its
+leaves, so the tree holds at most the positions of the current game's surviving lines. The groups
+of speculate_sense instead share the arrays of the set they split, along with the boards built from
+them, so that equal boards are identical objects across groups as strategy.non_dominated_sense
+expects.
+
+The updates below are cooperative generators, like the MultiHypothesisTracker's own: each yields
+after a leaf and returns the updated set as its value. Leaves are always kept in the order of the
+walk, which is also the order of the sequence.
+"""
+
+from array import array
+from collections import defaultdict
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+
+import chess
+
+from reconchess_tools.utilities import (
+    board_fingerprint,
+    possible_requested_moves,
+    simulate_move,
+    simulate_sense,
+)
+
+
+def _encode(move: Optional[chess.Move]) -> int:
+    if not move:
+        # The null move, whose from and to squares are both a1
+        return 0
+    return move.from_square | move.to_square << 6 | (move.promotion or 0) << 12
+
+
+def _decode(code: int) -> chess.Move:
+    return chess.Move(code & 63, code >> 6 & 63, code >> 12 or None)
+
+
+class MoveTreeHypotheses(Sequence):
+    """A hypothesis set stored as a tree of moves from root boards (see the module docstring)
+
+    Indexing replays the moves from the root and iteration walks the tree, both returning new
+    boards with an empty move stack, and slicing returns a MoveTreeHypotheses of the slice.
+    Given a dict of built boards, they store each board they build there by its leaf and return
+    the stored board for a leaf built before.
+    """
+
+    def __init__(
+        self,
+        roots: List[chess.Board],
+        parents: array,
+        moves: array,
+        leaves: array,
+        built: Optional[Dict[int, chess.Board]] = None,
+    ):
+        self.roots = roots
+        # The parent of each node, or for a root node -1 - the index of its board in roots, and
+        # the move from the parent (0 for roots)
+        self.parents = parents
+        self.moves = moves
+        # The node of each hypothesis
+        self.leaves = leaves
+        self.built = built
+
+    @classmethod
+    def from_boards(cls, boards: Sequence[chess.Board]) -> "MoveTreeHypotheses":
+        roots = [board.copy(stack=False) for board in boards]
+        return cls(
+            roots,
+            array("l", range(-1, -1 - len(roots), -1)),
+            array("H", [0] * len(roots)),
+            array("l", range(len(roots))),
+        )
+
+    def __len__(self):
+        return len(self.leaves)
+
+    def __iter__(self) -> Iterator[chess.Board]:
+        for leaf, board in walk(self):
+            if self.built is None:
+                yield board.copy(stack=False)
+                continue
+            if leaf not in self.built:
+                self.built[leaf] = board.copy(stack=False)
+            yield self.built[leaf]
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return self._with_leaves(self.leaves[index])
+        leaf = self.leaves[index]
+        if self.built is None:
+            return self._replay(leaf)
+        if leaf not in self.built:
+            self.built[leaf] = self._replay(leaf)
+        return self.built[leaf]
+
+    def _replay(self, node: int) -> chess.Board:
+        codes = []
+        while self.parents[node] >= 0:
+            codes.append(self.moves[node])
+            node = self.parents[node]
+        board = self.roots[-1 - self.parents[node]].copy(stack=False)
+        for code in reversed(codes):
+            board.push(_decode(code))
+        return board.copy(stack=False)
+
+    @property
+    def nodes(self) -> int:
+        """The number of positions stored, including the roots and the leaves"""
+        return len(self.parents)
+
+    def _with_leaves(self, leaves: array) -> "MoveTreeHypotheses":
+        """The set of the given leaves, in a tree compacted to their ancestors"""
+        keep = bytearray(len(self.parents))
+        for node in leaves:
+            while not keep[node]:
+                keep[node] = 1
+                if self.parents[node] < 0:
+                    break
+                node = self.parents[node]
+        renumbered = array("l", [-1] * len(self.parents))
+        roots, parents, moves = [], array("l"), array("H")
+        # Parents precede their children, so one pass renumbers both
+        for node in range(len(self.parents)):
+            if not keep[node]:
+                continue
+            renumbered[node] = len(parents)
+            parent = self.parents[node]
+            if parent < 0:
+                roots.append(self.roots[-1 - parent])
+                parents.append(-len(roots))
+            else:
+                parents.append(renumbered[parent])
+            moves.append(self.moves[node])
+        return MoveTreeHypotheses(
+            roots, parents, moves, array("l", (renumbered[node] for node in leaves))
+        )
+
+
+def walk(hypotheses: MoveTreeHypotheses) -> Iterator[Tuple[int, chess.Board]]:
+    """Yield the node and position of each leaf, in order, on a board shared between leaves
+
+    The board is only valid until the next leaf. Callers may push moves onto it but must pop them
+    before moving on. The root boards themselves are never changed.
+    """
+    parents, moves, roots = hypotheses.parents, hypotheses.moves, hypotheses.roots
+    board = None
+    # The nodes whose moves are on the board's stack, from its root down
+    path: List[int] = []
+    on_path = set()
+    for leaf in hypotheses.leaves:
+        pending = []
+        node = leaf
+        while node not in on_path and parents[node] >= 0:
+            pending.append(node)
+            node = parents[node]
+        if node in on_path:
+            while path[-1] != node:
+                on_path.discard(path.pop())
+                board.pop()
+        else:
+            board = roots[-1 - parents[node]].copy(stack=False)
+            path, on_path = [node], {node}
+        for node in reversed(pending):
+            board.push(_decode(moves[node]))
+            path.append(node)
+            on_path.add(node)
+        yield leaf, board
+
+
+def sense(
+    hypotheses: MoveTreeHypotheses,
+    square: Optional[chess.Square],
+    sorted_result: List[Tuple[int, chess.Piece]],
+) -> Iterator[None]:
+    """Keep the hypotheses with the given sense result, yielding after each leaf"""
+    if square is None:
+        return hypotheses
+    leaves = array("l")
+    for leaf, board in walk(hypotheses):
+        if simulate_sense(board, square) == sorted_result:
+            leaves.append(leaf)
+        yield
+    return hypotheses._with_leaves(leaves)
+
+
+def speculate_sense(
+    hypotheses: MoveTreeHypotheses, sense_squares: Sequence[chess.Square]
+) -> Iterator[None]:
+    """Group the hypotheses by their sense result on each square, yielding after each leaf
+
+    Returns a map from sense square to sense result (as a tuple) to the MoveTreeHypotheses with
+    that result, as MultiHypothesisTracker.sense_speculation. The sets share the tree of the
+    hypotheses and a dict of built boards.
+    """
+    grouped = {square: defaultdict(lambda: array("l")) for square in sense_squares}
+    for leaf, board in walk(hypotheses):
+        for square in sense_squares:
+            grouped[square][tuple(simulate_sense(board, square))].append(leaf)
+        yield
+    empty = hypotheses._with_leaves(array("l"))
+    built = {}
+    speculation = {}
+    for square, results in grouped.items():
+        # Like the flat speculation, results no hypothesis gives map to an empty set
+        speculation[square] = defaultdict(lambda: empty)
+        for result, leaves in results.items():
+            speculation[square][result] = MoveTreeHypotheses(
+                hypotheses.roots, hypotheses.parents, hypotheses.moves, leaves, built
+            )
+    return speculation
+
+
+def move(
+    hypotheses: MoveTreeHypotheses,
+    requested_move: chess.Move,
+    taken_move: chess.Move,
+    capture_square: Optional[chess.Square],
+) -> Iterator[None]:
+    """Keep the hypotheses with the given move result and make the move, yielding per leaf"""
+    parents, moves = array("l", hypotheses.parents), array("H", hypotheses.moves)
+    code = _encode(taken_move)
+    leaves = array("l")
+    seen = set()
+    for leaf, board in walk(hypotheses):
+        if simulate_move(board, requested_move) == (taken_move, capture_square):
+            board.push(_decode(code))
+            fingerprint = board_fingerprint(board)
+            board.pop()
+            # Hypotheses that differed only in the opponent's en passant square are now the same
+            if fingerprint not in seen:
+                seen.add(fingerprint)
+                leaves.append(len(parents))
+                parents.append(leaf)
+                moves.append(code)
+        yield
+    tree = MoveTreeHypotheses(hypotheses.roots, parents, moves, leaves)
+    return tree._with_leaves(leaves)
+
+
+def op_move(
+    hypotheses: MoveTreeHypotheses, capture_square: Optional[chess.Square]
+) -> Iterator[None]:
+    """Expand the hypotheses into the results of every opponent move with the given capture square
+
+    Yields after the moves from each leaf. Returns the new set and the number of children
+    generated, counting duplicates.
+    """
+    parents, moves = array("l", hypotheses.parents), array("H", hypotheses.moves)
+    leaves = array("l")
+    seen = set()
+    children = 0
+    for leaf, board in walk(hypotheses):
+        for requested_move in possible_requested_moves(board):
+            taken_move, simulated_capture_square = simulate_move(board, requested_move)
+            if simulated_capture_square != capture_square:
+                continue
+            children += 1
+            board.push(taken_move)
+            fingerprint = board_fingerprint(board)
+            board.pop()
+            if fingerprint not in seen:
+                seen.add(fingerprint)
+                leaves.append(len(parents))
+                parents.append(leaf)
+                moves.append(_encode(taken_move))
+        yield
+    tree = MoveTreeHypotheses(hypotheses.roots, parents, moves, leaves)
+    return tree._with_leaves(leaves), children
@@ -0,0 +1,228 @@
+"""Precomputed hypothesis sets for common opening observation sequences
+
+Every game starts from the same position, so the hypothesis sets of the first few turns depend only
+on what the tracking player observed: its own sense results and move results, and the capture
+squares of the opponent's moves. An opening table maps each such observation history, written as a
+key of space-separated observations (see the *_observation functions), to the deduplicated
+hypothesis set it leads to. A MultiHypothesisTracker given an opening table looks each update up in
+the table and only computes it once the game leaves the table.
+
+build_opening_table replays recorded games (in the action notation of the analysis module) through
+both players' MHTs and stores the sets of the first few turns of the histories that occurred in at
+least min_games of them. Tables are saved as a single binary file: a header, a JSON index from key
+to a range of records, and the boards in the record format of the snapshot module, memory-mapped
+on load so only the sets that are looked up get decoded.
+"""
+
+import json
+import mmap
+import struct
+import zlib
+from array import array
+from collections import Counter
+from itertools import chain
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+import chess
+
+from reconchess_tools.snapshot import RECORD_SIZE, board_record, record_board
+from reconchess_tools.utilities import simulate_move, simulate_sense
+
+MAGIC = b"RCOT"
+VERSION = 1
+# magic, format version, length of the JSON index, CRC-32 of the records
+_HEADER = struct.Struct("<4sIII")
+
+
+class OpeningTableError(ValueError):
+    pass
+
+
+def _square_name(square: Optional[chess.Square]) -> str:
+    return "-" if square is None else chess.SQUARE_NAMES[square]
+
+
+def op_move_observation(capture_square: Optional[chess.Square]) -> str:
+    return f"o:{_square_name(capture_square)}"
+
+
+def sense_observation(
+    square: Optional[chess.Square], sorted_result: List[Tuple[int, chess.Piece]]
+) -> str:
+    contents = "".join(
+        "." if piece is None else piece.symbol() for _, piece in sorted_result
+    )
+    return f"s:{_square_name(square)}:{contents}"
+
+
+def _move_name(move: Optional[chess.Move]) -> str:
+    # A pass may be given as None or as the null move, which recorded games use
+    return move.uci() if move else chess.Move.null().uci()
+
+
+def move_observation(
+    requested_move: Optional[chess.Move],
+    taken_move: Optional[chess.Move],
+    capture_square: Optional[chess.Square],
+) -> str:
+    return (
+        f"m:{_move_name(requested_move)}:{_move_name(taken_move)}:"
+        f"{_square_name(capture_square)}"
+    )
+
+
+def extend_key(key: str, observation: str) -> str:
+    return f"{key} {observation}" if key else observation
+
+
+class OpeningTable:
+    """The hypothesis sets of a memory-mapped opening table file, decoded when looked up"""
+
+    def __init__(self, path: str):
+        self.path = path
+        with open(path, "rb") as f:
+            try:
+                self._mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            except ValueError as e:  # empty file
+                raise OpeningTableError(f"{path} is not an opening table") from e
+        try:
+            magic, version, index_size, crc = _HEADER.unpack_from(self._mapped)
+        except struct.error as e:
+            raise OpeningTableError(f"{path} is not an opening table") from e
+        if magic != MAGIC:
+            raise OpeningTableError(f"{path} is not an opening table")
+        if version != VERSION:
+            raise OpeningTableError(
+                f"{path} has unsupported opening table version {version}"
+            )
+        index_end = _HEADER.size + index_size
+        records = memoryview(self._mapped)[_records_offset(index_size) :]
+        if len(records) % (RECORD_SIZE * 8) or zlib.crc32(records) != crc:
+            raise OpeningTableError(f"{path} is truncated or corrupt")
+        self._index: Dict[str, List[int]] = json.loads(
+            bytes(self._mapped[_HEADER.size : index_end])
+        )
+        self._records = records.cast("Q")
+
+    def __len__(self) -> int:
+        return len(self._index)
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._index
+
+    def keys(self) -> Iterable[str]:
+        return self._index.keys()
+
+    def get(self, key: str) -> Optional[List[chess.Board]]:
+        """Decode the hypothesis set of an observation history, or None if it is not stored"""
+        if key not in self._index:
+            return None
+        start, count = self._index[key]
+        values = self._records[start * RECORD_SIZE : (start + count) * RECORD_SIZE]
+        return [record_board(record) for record in zip(*[iter(values)] * RECORD_SIZE)]
+
+
+def _records_offset(index_size: int) -> int:
+    # The records start at the next multiple of 8 bytes after the index
+    return -(-(_HEADER.size + index_size) // 8) * 8
+
+
+def save_opening_table(path: str, table: Dict[str, Sequence[chess.Board]]) -> None:
+    """Write hypothesis sets by observation history key to an opening table file"""
+    index = {}
+    start = 0
+    for key, boards in table.items():
+        index[key] = [start, len(boards)]
+        start += len(boards)
+    packed_index = json.dumps(index, sort_keys=True).encode()
+    packed = array(
+        "Q",
+        chain.from_iterable(
+            board_record(board) for boards in table.values() for board in boards
+        ),
+    )
+    padding = _records_offset(len(packed_index)) - _HEADER.size - len(packed_index)
+    with open(path, "wb") as f:
+        f.write(_HEADER.pack(MAGIC, VERSION, len(packed_index), zlib.crc32(packed)))
+        f.write(packed_index)
+        f.write(b"\0" * padding)
+        packed.tofile(f)
+
+
+def load_opening_table(path: str) -> OpeningTable:
+    """Open an opening table, raising OpeningTableError if it is invalid or corrupt"""
+    return OpeningTable(path)
+
+
+def _replay_observations(actions: Sequence[str], max_turns: int):
+    """Replay a game's first turns, yielding each player's history key and hypothesis set"""
+    # Imported here because the mht module imports this one
+    from reconchess_tools.mht import MultiHypothesisTracker
+
+    board = chess.Board()
+    trackers = {
+        chess.WHITE: MultiHypothesisTracker(),
+        chess.BLACK: MultiHypothesisTracker(),
+    }
+    keys = {chess.WHITE: "", chess.BLACK: ""}
+    turns = list(zip(actions[::2], actions[1::2]))[:max_turns]
+    for sense, requested_move in turns:
+        color = board.turn
+        active, waiting = trackers[color], trackers[not color]
+
+        if sense != "00":
+            square = chess.parse_square(sense)
+            sorted_result = simulate_sense(board, square)
+            active.sense(square, sorted_result)
+            keys[color] = extend_key(
+                keys[color], sense_observation(square, sorted_result)
+            )
+            yield keys[color], active.boards
+
+        requested_move = chess.Move.from_uci(requested_move)
+        taken_move, capture_square = simulate_move(board, requested_move)
+        active.move(requested_move, taken_move, capture_square)
+        keys[color] = extend_key(
+            keys[color], move_observation(requested_move, taken_move, capture_square)
+        )
+        yield keys[color], active.boards
+
+        waiting.op_move(capture_square)
+        keys[not color] = extend_key(
+            keys[not color], op_move_observation(capture_square)
+        )
+        yield keys[not color], waiting.boards
+        board.push(taken_move)
+
+
+def build_opening_table(
+    games: Iterable[Sequence[str]],
+    max_turns: int = 6,
+    min_games: int = 2,
+    max_boards: Optional[int] = None,
+) -> Dict[str, List[chess.Board]]:
+    """Compute the hypothesis sets of the observation histories common to recorded games
+
+    Each game is given as its actions in the analysis module's notation. Only the first max_turns
+    turns (of both players) are replayed, only histories occurring in at least min_games games are
+    kept, and sets larger than max_boards, if given, are left out. Histories extending a left-out
+    history are not looked up, since the tracker computes every update after its first miss.
+    """
+    counts = Counter()
+    table = {}
+    for actions in games:
+        for key, boards in _replay_observations(actions, max_turns):
+            counts[key] += 1
+            if key not in table:
+                table[key] = [board.copy(stack=False) for board in boards]
+    kept = {}
+    # Prefixes are shorter than the histories extending them, so they are decided first
+    for key in sorted(table, key=len):
+        prefix = key.rpartition(" ")[0]
+        if (
+            (not prefix or prefix in kept)
+            and counts[key] >= min_games
+            and (max_boards is None or len(table[key]) <= max_boards)
+        ):
+            kept[key] = table[key]
+    return kept
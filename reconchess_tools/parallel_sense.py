@@ -0,0 +1,157 @@
+"""Speculate sense results on a process pool, sharing the hypotheses' bitboards between processes
+
+speculate_sense_parallel computes the same nested map as MultiHypothesisTracker.speculate_sense,
+from sense square to sense result to the boards with that result, with the sense squares split
+between the workers of a multiprocessing pool. The boards are never pickled: their piece bitboards
+are published once into a multiprocessing.shared_memory block that every worker reads, and each
+worker sends back only the partition of the board indices by sense result for its squares. The
+groups of the returned map hold the original board objects, so equal boards are identical objects
+as non_dominated_sense expects.
+
+The pool's start-up cost is paid once if it is reused across turns, and the work is only split
+when there are enough boards to make up for sending the partitions back.
+"""
+
+from array import array
+from collections import defaultdict
+from itertools import chain
+from multiprocessing import resource_tracker, shared_memory
+from typing import Dict, List, Sequence, Tuple
+
+import chess
+
+# The bitboards stored per board: white's pieces, then each piece type
+_LAYERS = 7
+# Below this many boards, partitioning in this process is faster than using the pool
+MIN_PARALLEL_BOARDS = 2_000
+
+
+def _layers(board: chess.Board) -> Tuple[int, ...]:
+    return (
+        board.occupied_co[chess.WHITE],
+        board.pawns,
+        board.knights,
+        board.bishops,
+        board.rooks,
+        board.queens,
+        board.kings,
+    )
+
+
+def _window(square: chess.Square) -> List[chess.Square]:
+    """The squares of a sense result, in the order of simulate_sense"""
+    rank, file = chess.square_rank(square), chess.square_file(square)
+    return [
+        chess.square(file + delta_file, rank + delta_rank)
+        for delta_rank in [-1, 0, 1]
+        for delta_file in [-1, 0, 1]
+        if 0 <= rank + delta_rank <= 7 and 0 <= file + delta_file <= 7
+    ]
+
+
+def _sense_result(layers: Tuple[int, ...], window: List[chess.Square]) -> tuple:
+    """Decode the sense result on a window from its masked bitboards"""
+    white, *pieces = layers
+    result = []
+    for square in window:
+        mask = chess.BB_SQUARES[square]
+        piece = None
+        for piece_type, layer in enumerate(pieces, chess.PAWN):
+            if layer & mask:
+                piece = chess.Piece(piece_type, bool(white & mask))
+                break
+        result.append((square, piece))
+    return tuple(result)
+
+
+def partition_records(
+    records: Sequence[int], num_boards: int, squares: Sequence[chess.Square]
+) -> List[Tuple[chess.Square, List[Tuple[tuple, bytes]]]]:
+    """Partition board indices by sense result on each square
+
+    records holds the _LAYERS bitboards of each board in turn. Returns, per square, each sense
+    result with the indices of its boards packed as an array of unsigned ints.
+    """
+    partitions = []
+    for square in squares:
+        window = _window(square)
+        mask = 0
+        for window_square in window:
+            mask |= chess.BB_SQUARES[window_square]
+        groups = defaultdict(lambda: array("I"))
+        for index in range(num_boards):
+            start = index * _LAYERS
+            key = tuple(layer & mask for layer in records[start : start + _LAYERS])
+            groups[key].append(index)
+        partitions.append(
+            (
+                square,
+                [
+                    (_sense_result(key, window), indices.tobytes())
+                    for key, indices in groups.items()
+                ],
+            )
+        )
+    return partitions
+
+
+def _attach(name: str) -> shared_memory.SharedMemory:
+    """Attach to a block created by another process without registering it as ours
+
+    Attaching registers the block with this process's resource tracker, which unlinks it (warning
+    of a leak) when the worker exits, possibly while the parent still uses it (bpo-39959).
+    Unregistering it afterwards is no better: a forked worker may share the parent's tracker, which
+    would then forget the parent's own registration. So the registration is skipped instead.
+    """
+    try:
+        return shared_memory.SharedMemory(name=name, track=False)
+    except TypeError:
+        # Before Python 3.13, SharedMemory always registers the blocks it opens
+        pass
+    register = resource_tracker.register
+    resource_tracker.register = lambda name, rtype: None
+    try:
+        return shared_memory.SharedMemory(name=name)
+    finally:
+        resource_tracker.register = register
+
+
+def _partition_shared(args):
+    name, num_boards, squares = args
+    block = _attach(name)
+    try:
+        records = block.buf[: num_boards * _LAYERS * 8].cast("Q")
+        try:
+            return partition_records(records, num_boards, squares)
+        finally:
+            records.release()
+    finally:
+        block.close()
+
+
+def speculate_sense_parallel(
+    boards: Sequence[chess.Board], sense_squares: Sequence[chess.Square], pool
+) -> Dict[chess.Square, Dict[tuple, List[chess.Board]]]:
+    """Group the boards by their sense result on each square using a multiprocessing pool"""
+    boards = list(boards)
+    packed = array("Q", chain.from_iterable(map(_layers, boards)))
+    if len(boards) < MIN_PARALLEL_BOARDS or not sense_squares:
+        partitions = partition_records(packed, len(boards), sense_squares)
+    else:
+        block = shared_memory.SharedMemory(create=True, size=max(1, len(packed) * 8))
+        try:
+            block.buf[: len(packed) * 8] = packed.tobytes()
+            tasks = [(block.name, len(boards), [square]) for square in sense_squares]
+            partitions = list(chain.from_iterable(pool.map(_partition_shared, tasks)))
+        finally:
+            block.close()
+            block.unlink()
+    speculation = {}
+    for square, groups in partitions:
+        speculation[square] = sense_results = defaultdict(list)
+        for result, packed_indices in groups:
+            indices = array("I")
+            indices.frombytes(packed_indices)
+            sense_results[result] = [boards[index] for index in indices]
+    # Keep the order of the squares given, as the sequential speculation does
+    return {square: speculation[square] for square in sense_squares}
@@ -0,0 +1,100 @@
+"""Priors over the moves an opponent requests, for weighting MultiHypothesisTracker hypotheses
+
+A move prior is any callable taking a board and two parallel lists, the moves the player to move
+could request and the moves those requests would result in on that board, and returning a
+non-negative weight for each request. The weights only need to be relative: the tracker
+normalizes them per board. Returning the same weight for every request gives the uniform prior the
+tracker uses without one.
+
+static_move_prior is a cheap hand-written heuristic that favors what a reasonable player would
+do: capture (especially the king), develop minor pieces, castle, and push centre pawns, and
+disfavors passing, requests that would be revised or fail on the board (such as pawn captures of
+nothing), wandering with the king, and stepping onto squares attacked by pawns. A learned model
+fits the same signature.
+"""
+
+from typing import Callable, List, Sequence
+
+import chess
+
+MovePrior = Callable[[chess.Board, List[chess.Move], List[chess.Move]], Sequence[float]]
+
+# Bonus weight for capturing each piece type, on top of the weight of 1 every move starts with
+CAPTURE_BONUS = {
+    chess.PAWN: 1.0,
+    chess.KNIGHT: 3.0,
+    chess.BISHOP: 3.0,
+    chess.ROOK: 5.0,
+    chess.QUEEN: 9.0,
+    chess.KING: 100.0,
+}
+CHECK_BONUS = 1.0
+DEVELOPMENT_BONUS = 1.0
+CASTLING_BONUS = 2.0
+CENTER_PAWN_BONUS = 1.0
+PASS_WEIGHT = 0.1
+# Factors applied to moves that rarely make sense
+REVISED_FACTOR = 0.3
+KING_MOVE_FACTOR = 0.3
+PAWN_ATTACKED_FACTOR = 0.3
+
+_CENTER_FILES = chess.BB_FILE_D | chess.BB_FILE_E
+
+
+def uniform_move_prior(
+    board: chess.Board,
+    requested_moves: List[chess.Move],
+    taken_moves: List[chess.Move],
+) -> List[float]:
+    return [1.0] * len(requested_moves)
+
+
+def static_move_prior(
+    board: chess.Board,
+    requested_moves: List[chess.Move],
+    taken_moves: List[chess.Move],
+) -> List[float]:
+    """Weigh requests by simple features of the move they result in on the board"""
+    color = board.turn
+    back_rank = chess.BB_RANK_1 if color else chess.BB_RANK_8
+    # Squares the other player's pawns attack
+    pawns = board.pawns & board.occupied_co[not color]
+    if color:
+        pawn_attacks = chess.shift_down_left(pawns) | chess.shift_down_right(pawns)
+    else:
+        pawn_attacks = chess.shift_up_left(pawns) | chess.shift_up_right(pawns)
+    weights = []
+    for requested_move, taken_move in zip(requested_moves, taken_moves):
+        if not requested_move:
+            weights.append(PASS_WEIGHT)
+            continue
+        weight = 1.0
+        piece_type = board.piece_type_at(requested_move.from_square)
+        if taken_move:
+            captured = board.piece_type_at(taken_move.to_square)
+            if captured is not None:
+                weight += CAPTURE_BONUS[captured]
+            elif board.is_en_passant(taken_move):
+                weight += CAPTURE_BONUS[chess.PAWN]
+            if board.is_castling(taken_move):
+                weight += CASTLING_BONUS
+            elif board.gives_check(taken_move):
+                weight += CHECK_BONUS
+        if taken_move != requested_move:
+            weight *= REVISED_FACTOR
+        if piece_type in (chess.KNIGHT, chess.BISHOP) and (
+            chess.BB_SQUARES[requested_move.from_square] & back_rank
+        ):
+            weight += DEVELOPMENT_BONUS
+        elif piece_type == chess.PAWN and (
+            chess.BB_SQUARES[requested_move.from_square] & _CENTER_FILES
+        ):
+            weight += CENTER_PAWN_BONUS
+        elif piece_type == chess.KING and not board.is_castling(requested_move):
+            weight *= KING_MOVE_FACTOR
+        if piece_type != chess.PAWN and (
+            chess.BB_SQUARES[requested_move.to_square] & pawn_attacks
+        ):
+            weight *= PAWN_ATTACKED_FACTOR
+        weights.append(weight)
+    return weights
@@ -0,0 +1,285 @@
+"""Per-callback profiling of reconchess players
+
+ProfiledPlayer wraps any Player and times each of its callbacks, recording the wall-clock time and
+the memory allocated (net and peak, via tracemalloc) by every call along with the turn it was made
+on. It can also collect a cProfile or pyinstrument profile of each callback, accumulated over the
+game, to see where a slow callback spends its time.
+
+play_profiled_game plays a local game this way and writes both players' per-call records as CSV
+(plus any profiles), and summarize_timings aggregates such records per player and callback, e.g. to
+find which callback used up a bot's clock.
+"""
+
+import csv
+import os
+import tracemalloc
+from collections import defaultdict
+from time import perf_counter
+from typing import Dict, List, NamedTuple, Optional, Sequence, Tuple
+
+import chess
+from reconchess import LocalGame, Player, play_turn
+
+PLAYER_CALLBACKS = [
+    "handle_game_start",
+    "handle_opponent_move_result",
+    "choose_sense",
+    "handle_sense_result",
+    "choose_move",
+    "handle_move_result",
+    "handle_game_end",
+]
+PROFILERS = ["cprofile", "pyinstrument"]
+
+
+class CallbackTiming(NamedTuple):
+    color: str
+    turn: int
+    callback: str
+    seconds: float
+    # Memory allocated by the call and not freed by the time it returned
+    allocated_bytes: int
+    # The most memory allocated at once during the call
+    peak_bytes: int
+
+
+TIMING_FIELDS = list(CallbackTiming._fields)
+
+
+class _CallbackProfiler:
+    """Accumulate a cProfile or pyinstrument profile of one callback over many calls"""
+
+    def __init__(self, profiler: str):
+        if profiler == "cprofile":
+            import cProfile
+
+            self.profile = cProfile.Profile()
+            self.start, self.stop = self.profile.enable, self.profile.disable
+        elif profiler == "pyinstrument":
+            try:
+                from pyinstrument import Profiler
+            except ImportError as e:
+                raise ImportError("pyinstrument profiles require pyinstrument") from e
+            self.profile = Profiler()
+            self.start, self.stop = self.profile.start, self.profile.stop
+        else:
+            raise ValueError(f"Unknown profiler {profiler!r}")
+        self.profiler = profiler
+
+    def save(self, path: str) -> str:
+        """Save the profile, returning the path written (with the extension added)"""
+        if self.profiler == "cprofile":
+            path += ".prof"
+            self.profile.dump_stats(path)
+        else:
+            path += ".html"
+            with open(path, "w") as f:
+                f.write(self.profile.output_html())
+        return path
+
+
+class ProfiledPlayer(Player):
+    """A Player that times every callback of the player it wraps
+
+    Turns are counted from 0 at each of the player's handle_opponent_move_result calls, which
+    start every turn (including white's first), and callbacks before then are on turn -1.
+    Allocation tracking starts tracemalloc if it is not already tracing, which slows the player
+    down; pass track_allocations=False to record timing only.
+    """
+
+    def __init__(
+        self,
+        player: Player,
+        track_allocations: bool = True,
+        profiler: Optional[str] = None,
+    ):
+        self.player = player
+        self.track_allocations = track_allocations
+        self.profilers: Dict[str, _CallbackProfiler] = {}
+        if profiler is not None:
+            self.profilers = {
+                callback: _CallbackProfiler(profiler) for callback in PLAYER_CALLBACKS
+            }
+        self.color_name = "unknown"
+        self.turn = -1
+        self.timings: List[CallbackTiming] = []
+
+    def _call(self, callback: str, *args):
+        if self.track_allocations:
+            if not tracemalloc.is_tracing():
+                tracemalloc.start()
+            if hasattr(tracemalloc, "reset_peak"):  # Python 3.9+
+                tracemalloc.reset_peak()
+            memory_before, _ = tracemalloc.get_traced_memory()
+        profiler = self.profilers.get(callback)
+        if profiler is not None:
+            profiler.start()
+        start = perf_counter()
+        try:
+            return getattr(self.player, callback)(*args)
+        finally:
+            seconds = perf_counter() - start
+            if profiler is not None:
+                profiler.stop()
+            allocated_bytes = peak_bytes = 0
+            if self.track_allocations:
+                memory_after, memory_peak = tracemalloc.get_traced_memory()
+                allocated_bytes = memory_after - memory_before
+                peak_bytes = max(0, memory_peak - memory_before)
+            self.timings.append(
+                CallbackTiming(
+                    self.color_name,
+                    self.turn,
+                    callback,
+                    seconds,
+                    allocated_bytes,
+                    peak_bytes,
+                )
+            )
+
+    def handle_game_start(self, color, board, opponent_name):
+        self.color_name = chess.COLOR_NAMES[color]
+        self.turn = -1
+        return self._call("handle_game_start", color, board, opponent_name)
+
+    def handle_opponent_move_result(self, captured_my_piece, capture_square):
+        self.turn += 1
+        return self._call(
+            "handle_opponent_move_result", captured_my_piece, capture_square
+        )
+
+    def choose_sense(self, sense_actions, move_actions, seconds_left):
+        return self._call("choose_sense", sense_actions, move_actions, seconds_left)
+
+    def handle_sense_result(self, sense_result):
+        return self._call("handle_sense_result", sense_result)
+
+    def choose_move(self, move_actions, seconds_left):
+        return self._call("choose_move", move_actions, seconds_left)
+
+    def handle_move_result(
+        self, requested_move, taken_move, captured_opponent_piece, capture_square
+    ):
+        return self._call(
+            "handle_move_result",
+            requested_move,
+            taken_move,
+            captured_opponent_piece,
+            capture_square,
+        )
+
+    def handle_game_end(self, winner_color, win_reason, game_history):
+        return self._call("handle_game_end", winner_color, win_reason, game_history)
+
+    def save_profiles(self, profile_dir: str) -> List[str]:
+        """Save the profile of each callback that was called, returning the paths written"""
+        os.makedirs(profile_dir, exist_ok=True)
+        called = {timing.callback for timing in self.timings}
+        return [
+            profiler.save(os.path.join(profile_dir, f"{self.color_name}_{callback}"))
+            for callback, profiler in self.profilers.items()
+            if callback in called
+        ]
+
+
+def play_profiled_game(
+    white: Player,
+    black: Player,
+    output_dir: str,
+    game: Optional[LocalGame] = None,
+    track_allocations: bool = True,
+    profiler: Optional[str] = None,
+):
+    """Play a local game with both players profiled, writing the timings and profiles to output_dir
+
+    This follows reconchess.play_local_game, and returns the same, except that the game records
+    the names of the wrapped players.
+    """
+    if game is None:
+        game = LocalGame()
+    white_name, black_name = white.__class__.__name__, black.__class__.__name__
+    white = ProfiledPlayer(white, track_allocations, profiler)
+    black = ProfiledPlayer(black, track_allocations, profiler)
+    game.store_players(white_name, black_name)
+
+    white.handle_game_start(chess.WHITE, game.board.copy(), black_name)
+    black.handle_game_start(chess.BLACK, game.board.copy(), white_name)
+    game.start()
+    players = [black, white]
+    while not game.is_over():
+        play_turn(game, players[game.turn], end_turn_last=True)
+    game.end()
+    winner_color = game.get_winner_color()
+    win_reason = game.get_win_reason()
+    history = game.get_game_history()
+    white.handle_game_end(winner_color, win_reason, history)
+    black.handle_game_end(winner_color, win_reason, history)
+
+    os.makedirs(output_dir, exist_ok=True)
+    write_timings(
+        os.path.join(output_dir, "timings.csv"), white.timings + black.timings
+    )
+    if profiler is not None:
+        for player in (white, black):
+            player.save_profiles(os.path.join(output_dir, "profiles"))
+    return winner_color, win_reason, history
+
+
+def write_timings(path: str, timings: Sequence[CallbackTiming]) -> None:
+    with open(path, "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(TIMING_FIELDS)
+        writer.writerows(timings)
+
+
+def read_timings(path: str) -> List[CallbackTiming]:
+    with open(path, newline="") as f:
+        return [
+            CallbackTiming(
+                row["color"],
+                int(row["turn"]),
+                row["callback"],
+                float(row["seconds"]),
+                int(row["allocated_bytes"]),
+                int(row["peak_bytes"]),
+            )
+            for row in csv.DictReader(f)
+        ]
+
+
+def summarize_timings(
+    timings: Sequence[CallbackTiming],
+) -> Dict[Tuple[str, str], Dict[str, float]]:
+    """Aggregate call count, total and slowest time, and peak allocation per color and callback"""
+    summary = defaultdict(
+        lambda: {
+            "calls": 0,
+            "seconds": 0.0,
+            "max_seconds": 0.0,
+            "max_turn": -1,
+            "peak_bytes": 0,
+        }
+    )
+    for timing in timings:
+        stats = summary[timing.color, timing.callback]
+        stats["calls"] += 1
+        stats["seconds"] += timing.seconds
+        if timing.seconds >= stats["max_seconds"]:
+            stats["max_seconds"] = timing.seconds
+            stats["max_turn"] = timing.turn
+        stats["peak_bytes"] = max(stats["peak_bytes"], timing.peak_bytes)
+    return dict(summary)
+
+
+def format_timing_summary(summary: Dict[Tuple[str, str], Dict[str, float]]) -> str:
+    lines = []
+    for (color, callback), stats in sorted(
+        summary.items(), key=lambda item: (item[0][0], -item[1]["seconds"])
+    ):
+        lines.append(
+            f"{color:5} {callback:28} {stats['calls']:5,.0f} calls "
+            f"{stats['seconds']:9.3f} s total "
+            f"{stats['max_seconds']:8.3f} s max (turn {stats['max_turn']:.0f}) "
+            f"{stats['peak_bytes'] / 2 ** 20:9.1f} MiB peak"
+        )
+    return "\n".join(lines)
@@ -0,0 +1,173 @@
+"""Anytime choice of a sense square from random samples of the hypotheses
+
+speculate_sense partitions every board for every square before minimax_sense can choose, which
+is too slow when there are hundreds of thousands of boards. sampled_sense instead scores the squares
+on a growing random sample of the boards, with a confidence interval on each score, and stops as
+soon as the best square's interval is clear of every other square's, when the time budget runs
+out, or when the sample holds every board (which makes the scores exact). Squares that are clearly
+worse than the best are dropped from the sampling early. Hypothesis sets up to exact_threshold
+boards are scored exactly from the start.
+
+The criteria score a square by the boards that would remain after sensing there, lower being
+better:
+
+- "worst_case": the boards in its largest sense result group, as minimax_sense does
+- "expected": the expected number of boards remaining if the true board is any of the boards
+- "entropy": the information the sense result is expected to give, in bits, negated
+
+The confidence intervals are normal approximations corrected for sampling without replacement.
+"""
+
+import math
+import random
+from collections import Counter
+from time import perf_counter
+from typing import Callable, Dict, List, NamedTuple, Optional, Sequence, Tuple
+
+import chess
+
+from reconchess_tools.strategy import SENSE_SQUARES
+
+
+class SenseEstimate(NamedTuple):
+    square: chess.Square
+    score: float
+    low: float
+    high: float
+
+
+class SampledSense(NamedTuple):
+    square: chess.Square
+    # One per square, in the order the squares were given
+    estimates: List[SenseEstimate]
+    sample_size: int
+    exact: bool
+
+
+def _sense_mask(square: chess.Square) -> int:
+    rank, file = chess.square_rank(square), chess.square_file(square)
+    mask = 0
+    for delta_rank in [-1, 0, 1]:
+        for delta_file in [-1, 0, 1]:
+            if 0 <= rank + delta_rank <= 7 and 0 <= file + delta_file <= 7:
+                mask |= chess.BB_SQUARES[
+                    chess.square(file + delta_file, rank + delta_rank)
+                ]
+    return mask
+
+
+def _worst_case(counts: Counter, n: int, total: int, z: float, correction: float):
+    # The largest group is at least as large as the estimate of the largest sampled group, and at
+    # most as large as the largest upper bound of any group
+    low, high = 0.0, 0.0
+    for count in counts.values():
+        p = count / n
+        margin = z * math.sqrt(p * (1 - p) / n) * correction
+        low = max(low, p - margin)
+        high = max(high, p + margin)
+    p = max(counts.values()) / n
+    return p * total, max(0.0, low) * total, min(1.0, high) * total
+
+
+def _expected(counts: Counter, n: int, total: int, z: float, correction: float):
+    # The probability that two boards have the same sense result (estimated without bias from a
+    # sample), times the number of boards
+    p2 = sum(count * count for count in counts.values()) / (n * n)
+    p3 = sum(count**3 for count in counts.values()) / (n**3)
+    if n == total:
+        estimate = p2
+    elif n > 1:
+        estimate = sum(count * (count - 1) for count in counts.values()) / (n * (n - 1))
+    else:
+        estimate = 1.0
+    margin = z * math.sqrt(max(0.0, 4 * (p3 - p2 * p2)) / n) * correction
+    return (
+        estimate * total,
+        max(0.0, estimate - margin) * total,
+        min(1.0, estimate + margin) * total,
+    )
+
+
+def _entropy(counts: Counter, n: int, total: int, z: float, correction: float):
+    ps = [count / n for count in counts.values()]
+    entropy = -sum(p * math.log2(p) for p in ps)
+    second_moment = sum(p * math.log2(p) ** 2 for p in ps)
+    if n < total:
+        # Miller-Madow correction of the plug-in estimate, which is biased low
+        entropy += (len(ps) - 1) / (2 * n * math.log(2))
+    margin = z * math.sqrt(max(0.0, second_moment - entropy**2) / n) * correction
+    return -entropy, -entropy - margin, -entropy + margin
+
+
+CRITERIA: Dict[str, Callable[..., Tuple[float, float, float]]] = {
+    "worst_case": _worst_case,
+    "expected": _expected,
+    "entropy": _entropy,
+}
+
+
+def sampled_sense(
+    boards: Sequence[chess.Board],
+    sense_squares: Sequence[chess.Square] = SENSE_SQUARES,
+    criterion: str = "worst_case",
+    seconds: Optional[float] = None,
+    initial_sample: int = 1_000,
+    exact_threshold: int = 5_000,
+    z: float = 2.58,
+) -> SampledSense:
+    """Choose the sense square with the lowest score, on as few boards as it takes
+
+    The sample doubles in size each round until the best square is separated from the rest, the
+    given number of seconds has passed (checked between rounds), or every board is sampled.
+    """
+    if criterion not in CRITERIA:
+        raise ValueError(
+            f"Unknown criterion {criterion!r}, expected one of {', '.join(CRITERIA)}"
+        )
+    if not boards:
+        raise ValueError("Cannot choose a sense square without any boards")
+    score = CRITERIA[criterion]
+    start = perf_counter()
+    total = len(boards)
+    order = list(range(total))
+    random.shuffle(order)
+    masks = {square: _sense_mask(square) for square in sense_squares}
+    counts = {square: Counter() for square in sense_squares}
+    active = list(sense_squares)
+    estimates = {}
+    n = 0
+    next_size = total if total <= exact_threshold else min(total, initial_sample)
+    while True:
+        for index in order[n:next_size]:
+            board = boards[index]
+            layers = (
+                board.occupied_co[chess.WHITE],
+                board.pawns,
+                board.knights,
+                board.bishops,
+                board.rooks,
+                board.queens,
+                board.kings,
+            )
+            for square in active:
+                mask = masks[square]
+                counts[square][tuple(layer & mask for layer in layers)] += 1
+        n = next_size
+        # The finite population correction, which makes the intervals exact once every board is
+        # in the sample
+        correction = math.sqrt((total - n) / (total - 1)) if total > 1 else 0.0
+        for square in active:
+            estimates[square] = SenseEstimate(
+                square, *score(counts[square], n, total, z, correction)
+            )
+        best = min(active, key=lambda s: estimates[s].score)
+        best_high = estimates[best].high
+        active = [s for s in active if s == best or estimates[s].low <= best_high]
+        separated = len(active) == 1
+        out_of_time = seconds is not None and perf_counter() - start >= seconds
+        if separated or out_of_time or n == total:
+            break
+        next_size = min(total, 2 * n)
+    return SampledSense(
+        best, [estimates[square] for square in sense_squares], n, n == total
+    )
@@ -0,0 +1,167 @@
+"""Lean self-play for generating many games quickly
+
+reconchess.play_local_game runs every ply through game clocks, history recording, and the full
+Player callback interface. Generating training data or MHT statistics only needs the raw state
+transitions, so simulate_games steps the true boards directly with simulate_sense and
+simulate_move, plays many games in lockstep, and records each game compactly.
+
+Policies are called once per step with every game still in progress, so a policy that batches its
+work (such as evaluating a network on all positions at once) is called with the whole batch. A
+policy sees each game's true board and is trusted to only use what the player would know.
+"""
+
+import random
+from array import array
+from typing import Callable, List, NamedTuple, Optional, Sequence, Tuple
+
+import chess
+from reconchess import WinReason
+from reconchess.utilities import add_pawn_queen_promotion
+
+from reconchess_tools.utilities import (
+    random_requestable_move,
+    simulate_move,
+    simulate_sense,
+)
+
+NO_SQUARE = 64
+
+
+def encode_move(move: Optional[chess.Move]) -> int:
+    """Pack a move into 16 bits, with None and the null move both encoded as 0"""
+    if not move:
+        return 0
+    return move.from_square | move.to_square << 6 | (move.promotion or 0) << 12
+
+
+def decode_move(code: int) -> chess.Move:
+    if code == 0:
+        return chess.Move.null()
+    return chess.Move(code & 63, code >> 6 & 63, code >> 12 or None)
+
+
+class GameRecord(NamedTuple):
+    """A finished game, with one byte per sense and one 16-bit code per move"""
+
+    senses: bytes
+    requested_moves: array
+    taken_moves: array
+    capture_squares: bytes
+    winner: Optional[chess.Color]
+    win_reason: Optional[WinReason]
+    white_name: Optional[str] = None
+    black_name: Optional[str] = None
+
+    def actions(self) -> List[str]:
+        """The game's sense squares and requested moves in the replay's action notation"""
+        actions = []
+        for sense, move in zip(self.senses, self.requested_moves):
+            actions.append("00" if sense == NO_SQUARE else chess.SQUARE_NAMES[sense])
+            actions.append(decode_move(move).uci())
+        return actions
+
+
+class SimulatedGame:
+    """The state of one game in progress, as seen by the policies"""
+
+    def __init__(self, index: int):
+        self.index = index
+        self.board = chess.Board()
+        # The square where the active player lost a piece to the opponent's last move
+        self.capture_square: Optional[chess.Square] = None
+        self.sense_square: Optional[chess.Square] = None
+        self.senses = bytearray()
+        self.requested_moves = array("H")
+        self.taken_moves = array("H")
+        self.capture_squares = bytearray()
+
+    @property
+    def sense_result(self) -> List[Tuple[chess.Square, Optional[chess.Piece]]]:
+        """The result of the active player's sense this turn, computed only if asked for"""
+        return simulate_sense(self.board, self.sense_square)
+
+    def sense(self, square: Optional[chess.Square]):
+        self.sense_square = square
+        self.senses.append(NO_SQUARE if square is None else square)
+
+    def move(self, requested_move: Optional[chess.Move]):
+        if requested_move:
+            requested_move = add_pawn_queen_promotion(self.board, requested_move)
+        else:
+            requested_move = chess.Move.null()
+        taken_move, capture_square = simulate_move(self.board, requested_move)
+        self.requested_moves.append(encode_move(requested_move))
+        self.taken_moves.append(encode_move(taken_move))
+        self.capture_squares.append(
+            NO_SQUARE if capture_square is None else capture_square
+        )
+        self.board.push(taken_move)
+        self.capture_square = capture_square
+        self.sense_square = None
+
+    def result(self, reversible_moves_limit: int, max_turns: Optional[int]):
+        """The winner and win reason if the game is over, otherwise None"""
+        board = self.board
+        if not board.kings & board.occupied_co[chess.WHITE]:
+            return chess.BLACK, WinReason.KING_CAPTURE
+        if not board.kings & board.occupied_co[chess.BLACK]:
+            return chess.WHITE, WinReason.KING_CAPTURE
+        if max_turns is not None and len(self.senses) >= max_turns:
+            return None, WinReason.TURN_LIMIT
+        if board.halfmove_clock >= reversible_moves_limit:
+            return None, WinReason.MOVE_LIMIT
+        return None
+
+    def record(self, winner, win_reason) -> GameRecord:
+        return GameRecord(
+            bytes(self.senses),
+            self.requested_moves,
+            self.taken_moves,
+            bytes(self.capture_squares),
+            winner,
+            win_reason,
+        )
+
+
+SensePolicy = Callable[[Sequence[SimulatedGame]], Sequence[Optional[chess.Square]]]
+MovePolicy = Callable[[Sequence[SimulatedGame]], Sequence[Optional[chess.Move]]]
+
+
+def random_sense_policy(games: Sequence[SimulatedGame]) -> List[chess.Square]:
+    return [random.choice(chess.SQUARES) for _ in games]
+
+
+def random_move_policy(games: Sequence[SimulatedGame]) -> List[chess.Move]:
+    return [random_requestable_move(game.board) for game in games]
+
+
+def simulate_games(
+    num_games: int,
+    sense_policy: SensePolicy = random_sense_policy,
+    move_policy: MovePolicy = random_move_policy,
+    reversible_moves_limit: int = 100,
+    max_turns: Optional[int] = None,
+) -> List[GameRecord]:
+    """Play num_games games in lockstep, returning their records in order
+
+    Each step asks sense_policy for a sense square (or None) and then move_policy for a requested
+    move (or None to pass) in every game still in progress. Games end by king capture, by
+    reaching reversible_moves_limit plies without a capture or pawn move as in LocalGame, or after
+    max_turns turns (counting both players' turns) if given.
+    """
+    games = [SimulatedGame(i) for i in range(num_games)]
+    records: List[Optional[GameRecord]] = [None] * num_games
+    while games:
+        for game, square in zip(games, sense_policy(games)):
+            game.sense(square)
+        for game, requested_move in zip(games, move_policy(games)):
+            game.move(requested_move)
+        in_progress = []
+        for game in games:
+            result = game.result(reversible_moves_limit, max_turns)
+            if result is None:
+                in_progress.append(game)
+            else:
+                records[game.index] = game.record(*result)
+        games = in_progress
+    return records
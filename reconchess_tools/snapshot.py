@@ -0,0 +1,173 @@
+"""Compact binary snapshots of a hypothesis set
+
+A snapshot stores each board as its fingerprint (see utilities.board_fingerprint) packed into ten
+unsigned 64-bit integers: the black and white occupancy, the six piece-type bitboards, the castling
+rights, and the side to move together with the en passant square. A short header holds a format
+version, the number of boards, and a CRC-32 of the packed boards, which is checked on load.
+
+SnapshotWriter writes a snapshot incrementally, which the MHT uses to spill hypothesis sets that
+are too large to keep in memory (see the spill module).
+
+Snapshots are memory-mapped when loaded and boards are decoded on demand, so a single board of a
+large snapshot (for example, to debug the hypothesis set at a specific turn) can be inspected
+without decoding the rest.
+"""
+
+import mmap
+import os
+import struct
+import zlib
+from array import array
+from itertools import chain
+from typing import Iterable, Iterator, Sequence, Tuple
+
+import chess
+
+from reconchess_tools.utilities import board_from_fingerprint
+
+MAGIC = b"RCMH"
+VERSION = 1
+# magic, format version, number of boards, CRC-32 of the records, reserved (keeps records aligned)
+_HEADER = struct.Struct("<4sIQII")
+RECORD_SIZE = 10
+_NO_EP_SQUARE = 64
+
+
+class SnapshotError(ValueError):
+    pass
+
+
+def board_record(board: chess.Board) -> Tuple[int, ...]:
+    """Pack a board's fingerprint into the RECORD_SIZE integers stored for it in a snapshot"""
+    ep_square = _NO_EP_SQUARE if board.ep_square is None else board.ep_square
+    return (
+        board.occupied_co[chess.BLACK],
+        board.occupied_co[chess.WHITE],
+        board.kings,
+        board.queens,
+        board.bishops,
+        board.knights,
+        board.rooks,
+        board.pawns,
+        board.castling_rights,
+        ep_square << 1 | board.turn,
+    )
+
+
+def record_board(record: Sequence[int]) -> chess.Board:
+    """Unpack a snapshot record into a board"""
+    (
+        black,
+        white,
+        kings,
+        queens,
+        bishops,
+        knights,
+        rooks,
+        pawns,
+        castling,
+        flags,
+    ) = record
+    ep_square = flags >> 1
+    return board_from_fingerprint(
+        (
+            bool(flags & 1),
+            black,
+            white,
+            kings,
+            queens,
+            bishops,
+            knights,
+            rooks,
+            pawns,
+            castling,
+            None if ep_square == _NO_EP_SQUARE else ep_square,
+        )
+    )
+
+
+class SnapshotWriter:
+    """Write a snapshot incrementally, for hypothesis sets too large to hold in memory at once
+
+    The file is written to a temporary path and moved into place by close, so a crash while
+    writing leaves any previous snapshot at the path intact.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.tmp_path = f"{path}.{os.getpid()}.tmp"
+        self.file = open(self.tmp_path, "wb")
+        self.file.write(b"\0" * _HEADER.size)
+        self.count = 0
+        self.crc = 0
+
+    def write(self, records: Iterable[int]):
+        """Append boards, given as their records concatenated into one iterable of integers"""
+        packed = array("Q", records)
+        self.crc = zlib.crc32(packed, self.crc)
+        self.count += len(packed) // RECORD_SIZE
+        packed.tofile(self.file)
+
+    def close(self):
+        self.file.seek(0)
+        self.file.write(_HEADER.pack(MAGIC, VERSION, self.count, self.crc, 0))
+        self.file.close()
+        os.replace(self.tmp_path, self.path)
+
+
+def save_snapshot(path: str, boards: Iterable[chess.Board]) -> None:
+    """Write boards to a snapshot file"""
+    writer = SnapshotWriter(path)
+    writer.write(chain.from_iterable(map(board_record, boards)))
+    writer.close()
+
+
+class Snapshot(Sequence[chess.Board]):
+    """The boards of a memory-mapped snapshot file, each decoded when accessed"""
+
+    def __init__(self, path: str):
+        self.path = path
+        with open(path, "rb") as f:
+            try:
+                self._mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            except ValueError as e:  # empty file
+                raise SnapshotError(f"{path} is not an MHT snapshot") from e
+        try:
+            magic, version, count, crc, _ = _HEADER.unpack_from(self._mapped)
+        except struct.error as e:
+            raise SnapshotError(f"{path} is not an MHT snapshot") from e
+        if magic != MAGIC:
+            raise SnapshotError(f"{path} is not an MHT snapshot")
+        if version != VERSION:
+            raise SnapshotError(f"{path} has unsupported snapshot version {version}")
+        records = memoryview(self._mapped)[_HEADER.size :]
+        if len(records) != count * RECORD_SIZE * 8 or zlib.crc32(records) != crc:
+            raise SnapshotError(f"{path} is truncated or corrupt")
+        self._records = records.cast("Q")
+        self._count = count
+
+    def __len__(self) -> int:
+        return self._count
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(self._count))]
+        if index < 0:
+            index += self._count
+        if not 0 <= index < self._count:
+            raise IndexError("snapshot index out of range")
+        start = index * RECORD_SIZE
+        return record_board(self._records[start : start + RECORD_SIZE])
+
+    def __iter__(self) -> Iterator[chess.Board]:
+        return map(record_board, self.records())
+
+    def records(self) -> Iterator[Tuple[int, ...]]:
+        """Iterate over the boards' records without decoding them"""
+        values = iter(self._records[: self._count * RECORD_SIZE])
+        return zip(*[values] * RECORD_SIZE)
+
+
+def load_snapshot(path: str) -> Snapshot:
+    """Open a snapshot file, raising SnapshotError if it is invalid or fails its integrity check"""
+    return Snapshot(path)
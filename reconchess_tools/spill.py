@@ -0,0 +1,139 @@
+"""Hypothesis sets that spill to disk when they grow too large for memory
+
+A MultiHypothesisTracker with a spill threshold collects the output of each update with a
+HypothesisCollector. The collector keeps boards in memory until there are more than the threshold,
+after which it writes them to disk as snapshot records (see the snapshot module) and the update's
+result is a memory-mapped Snapshot whose boards are decoded as the next update streams over them.
+
+Deduplication (needed after op_move) can then no longer use an in-memory dictionary. Instead the
+records are sorted in runs of up to the threshold, each written to its own file, and the runs are
+merged in one streaming pass that drops adjacent duplicates: an external merge sort. Memory use
+stays proportional to the threshold while the number of hypotheses is limited only by disk space.
+"""
+
+import heapq
+import os
+import tempfile
+from contextlib import suppress
+from itertools import chain
+from typing import List, Optional, Sequence
+
+import chess
+
+from reconchess_tools.snapshot import (
+    Snapshot,
+    SnapshotWriter,
+    board_record,
+    load_snapshot,
+)
+from reconchess_tools.utilities import board_fingerprint
+
+# Records written to disk at a time while merging sorted runs
+_MERGE_BATCH = 10_000
+
+
+def _spill_path(spill_dir: Optional[str]) -> str:
+    fd, path = tempfile.mkstemp(suffix=".rcmh", prefix="reconchess-mht-", dir=spill_dir)
+    os.close(fd)
+    return path
+
+
+def remove_spilled(boards: Sequence[chess.Board]):
+    """Delete the file behind a hypothesis set returned by HypothesisCollector.finish, if any"""
+    if isinstance(boards, Snapshot):
+        with suppress(OSError):  # e.g. still mapped on Windows
+            os.remove(boards.path)
+
+
+class HypothesisCollector:
+    """Collect the boards output by an MHT update, spilling them to disk past a threshold
+
+    With dedup, boards with the same fingerprint are only kept once. Without, boards are assumed
+    to be unique already, as when filtering a deduplicated set. Without a threshold, the boards are
+    always kept in memory.
+    """
+
+    def __init__(
+        self,
+        dedup: bool,
+        threshold: Optional[int] = None,
+        spill_dir: Optional[str] = None,
+    ):
+        self.dedup = dedup
+        self.threshold = threshold
+        self.spill_dir = spill_dir
+        self.boards = {} if dedup else []
+        # Once spilling, the records not yet written to disk
+        self.records = None
+        # Sorted runs of records when deduplicating, otherwise the output file
+        self.runs: List[str] = []
+        self.writer: Optional[SnapshotWriter] = None
+
+    def add(self, board: chess.Board):
+        if self.records is not None:
+            if self.dedup:
+                self.records.add(board_record(board))
+            else:
+                self.records.append(board_record(board))
+            if len(self.records) >= self.threshold:
+                self._flush()
+        else:
+            if self.dedup:
+                self.boards[board_fingerprint(board)] = board
+            else:
+                self.boards.append(board)
+            if self.threshold is not None and len(self.boards) > self.threshold:
+                self._start_spilling()
+
+    def _start_spilling(self):
+        boards = self.boards.values() if self.dedup else self.boards
+        self.records = list(map(board_record, boards))
+        if self.dedup:
+            self.records = set(self.records)
+        self.boards = None
+        self._flush()
+
+    def _flush(self):
+        if self.dedup:
+            run = SnapshotWriter(_spill_path(self.spill_dir))
+            run.write(chain.from_iterable(sorted(self.records)))
+            run.close()
+            self.runs.append(run.path)
+            self.records = set()
+        else:
+            if self.writer is None:
+                self.writer = SnapshotWriter(_spill_path(self.spill_dir))
+            self.writer.write(chain.from_iterable(self.records))
+            self.records = []
+
+    def finish(self) -> Sequence[chess.Board]:
+        """The collected boards, as a list or, if they were spilled, a Snapshot"""
+        if self.records is None:
+            return list(self.boards.values()) if self.dedup else self.boards
+        if self.records:
+            self._flush()
+        if self.dedup:
+            self.writer = SnapshotWriter(_spill_path(self.spill_dir))
+            runs = [load_snapshot(path).records() for path in self.runs]
+            previous = None
+            batch = []
+            for record in heapq.merge(*runs):
+                if record != previous:
+                    batch.append(record)
+                    previous = record
+                    if len(batch) >= _MERGE_BATCH:
+                        self.writer.write(chain.from_iterable(batch))
+                        batch = []
+            self.writer.write(chain.from_iterable(batch))
+            del runs
+            for path in self.runs:
+                with suppress(OSError):
+                    os.remove(path)
+        self.writer.close()
+        boards = load_snapshot(self.writer.path)
+        if len(boards) <= self.threshold:
+            # Few enough remain (e.g. after a sense) to go back to tracking them in memory
+            in_memory = list(boards)
+            remove_spilled(boards)
+            return in_memory
+        return boards
@@ -0,0 +1,159 @@
+"""An inverted index of a hypothesis set by the contents of each square
+
+SquareIndex keeps, for each square and piece, a bitmap of the boards with that piece on that
+square (and, derived from those, which boards have the square empty). Bitmaps are Python integers,
+with bit i standing for the board in slot i. A sense result fixes the contents of up to nine
+squares, so filtering the boards by one is the intersection of nine bitmaps, and the size of each
+sense result group can be counted without visiting the boards.
+
+The index has a slot for every board it was built from and a bitmap of the slots still alive.
+Filtering only narrows that bitmap. Pushing our own move onto the remaining boards changes the
+same few squares in the same way on each of them, so it only rewrites the bitmaps of those squares.
+After op_move, when every board is new, the index is rebuilt.
+"""
+
+from functools import lru_cache
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+import chess
+
+from reconchess_tools.utilities import simulate_sense
+
+_PIECES = [
+    (piece_type, color, chess.Piece(piece_type, color))
+    for color in chess.COLORS
+    for piece_type in chess.PIECE_TYPES
+]
+
+
+@lru_cache(maxsize=None)
+def _window(square: chess.Square) -> Tuple[chess.Square, ...]:
+    """The squares of a sense result, in the order of simulate_sense"""
+    return tuple(s for s, _ in simulate_sense(chess.Board.empty(), square))
+
+
+def _bit_indices(bitmap: int) -> List[int]:
+    indices = []
+    for offset, byte in enumerate(
+        bitmap.to_bytes((bitmap.bit_length() + 7) // 8, "little")
+    ):
+        while byte:
+            low = byte & -byte
+            indices.append(offset * 8 + low.bit_length() - 1)
+            byte ^= low
+    return indices
+
+
+class SquareIndex:
+    """Bitmaps of the boards of a hypothesis set by square and piece (see the module docstring)"""
+
+    def __init__(self, boards: Iterable[chess.Board]):
+        self.slots: List[chess.Board] = list(boards)
+        size = (len(self.slots) + 7) // 8
+        pieces_at: List[Dict[chess.Piece, bytearray]] = [{} for _ in chess.SQUARES]
+        for slot, board in enumerate(self.slots):
+            byte, bit = slot >> 3, 1 << (slot & 7)
+            for piece_type, color, piece in _PIECES:
+                for square in chess.scan_forward(board.pieces_mask(piece_type, color)):
+                    bitmap = pieces_at[square].get(piece)
+                    if bitmap is None:
+                        bitmap = pieces_at[square][piece] = bytearray(size)
+                    bitmap[byte] |= bit
+        # The boards with each piece on each square, by square
+        self._pieces: List[Dict[chess.Piece, int]] = [
+            {piece: int.from_bytes(bitmap, "little") for piece, bitmap in at.items()}
+            for at in pieces_at
+        ]
+        # The boards with any piece on each square
+        self._occupied: List[int] = [0] * 64
+        for square, at in enumerate(self._pieces):
+            for bitmap in at.values():
+                self._occupied[square] |= bitmap
+        self.alive = (1 << len(self.slots)) - 1
+
+    def __len__(self) -> int:
+        return chess.popcount(self.alive)
+
+    def bitmap(self, square: chess.Square, piece: Optional[chess.Piece]) -> int:
+        """The live boards with the piece (or nothing, for None) on the square"""
+        if piece is None:
+            return self.alive & ~self._occupied[square]
+        return self.alive & self._pieces[square].get(piece, 0)
+
+    def matching(self, sense_result: Iterable[Tuple[chess.Square, chess.Piece]]) -> int:
+        """The live boards consistent with a sense result"""
+        bitmap = self.alive
+        for square, piece in sense_result:
+            bitmap &= self.bitmap(square, piece)
+            if not bitmap:
+                break
+        return bitmap
+
+    def live_slots(self) -> List[int]:
+        """The slots of the live boards, in order"""
+        return _bit_indices(self.alive)
+
+    def boards(self, bitmap: Optional[int] = None) -> List[chess.Board]:
+        """The boards of a bitmap (by default the live boards), in slot order"""
+        return [
+            self.slots[i]
+            for i in _bit_indices(self.alive if bitmap is None else bitmap)
+        ]
+
+    def keep(self, bitmap: int):
+        """Discard the boards not in the bitmap"""
+        self.alive &= bitmap
+
+    def keep_slots(self, slots: Sequence[int]):
+        """Discard the boards not in the given slots"""
+        bitmap = bytearray((len(self.slots) + 7) // 8)
+        for slot in slots:
+            bitmap[slot >> 3] |= 1 << (slot & 7)
+        self.keep(int.from_bytes(bitmap, "little"))
+
+    def set_squares(self, contents: Dict[chess.Square, Optional[chess.Piece]]):
+        """Set the contents of squares to be the same on every live board"""
+        alive = self.alive
+        for square, piece in contents.items():
+            at = self._pieces[square]
+            for other in at:
+                at[other] &= ~alive
+            if piece is None:
+                self._occupied[square] &= ~alive
+            else:
+                at[piece] = at.get(piece, 0) | alive
+                self._occupied[square] |= alive
+
+    def group_sizes(self, square: chess.Square) -> Dict[tuple, int]:
+        """The number of live boards with each sense result on the square
+
+        The keys are sense results as tuples, as MultiHypothesisTracker.speculate_sense uses.
+        """
+        groups = [((), self.alive)]
+        for sensed in _window(square):
+            at = self._pieces[sensed]
+            split = []
+            for result, bitmap in groups:
+                empty = bitmap & ~self._occupied[sensed]
+                if empty:
+                    split.append((result + ((sensed, None),), empty))
+                for piece, piece_bitmap in at.items():
+                    both = bitmap & piece_bitmap
+                    if both:
+                        split.append((result + ((sensed, piece),), both))
+            groups = split
+        return {result: chess.popcount(bitmap) for result, bitmap in groups}
+
+
+def changed_squares(
+    before: chess.Board, after: chess.Board, move: chess.Move
+) -> Dict[chess.Square, Optional[chess.Piece]]:
+    """The squares a move changes on a board, with their contents after it"""
+    changed = {move.from_square, move.to_square} if move else set()
+    changed.update(
+        chess.scan_forward(
+            (before.occupied ^ after.occupied)
+            | (before.occupied_co[chess.WHITE] ^ after.occupied_co[chess.WHITE])
+        )
+    )
+    return {square: after.piece_at(square) for square in changed}
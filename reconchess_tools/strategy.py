@@ -1,4 +1,5 @@
-from typing import Dict, List, Optional, Tuple
+from collections import defaultdict
+from typing import Dict, List, Optional, Sequence, Tuple
 
 import chess
 from reconchess.utilities import move_actions, revise_move
@@ -23,17 +24,95 @@ def non_dominated_moves(boards: List[chess.Board]):
     return move_choices
 
 
+def _king_attackers(board: chess.Board, color: chess.Color) -> int:
+    """The mask of color's pieces that attack the other king, inlined from Board.attackers_mask"""
+    king = board.kings & board.occupied_co[not color]
+    if not king:
+        return 0
+    square = chess.msb(king)
+    occupied = board.occupied
+    queens_and_rooks = board.queens | board.rooks
+    queens_and_bishops = board.queens | board.bishops
+    return board.occupied_co[color] & (
+        chess.BB_KING_ATTACKS[square] & board.kings
+        | chess.BB_KNIGHT_ATTACKS[square] & board.knights
+        | chess.BB_PAWN_ATTACKS[not color][square] & board.pawns
+        | chess.BB_RANK_ATTACKS[square][chess.BB_RANK_MASKS[square] & occupied]
+        & queens_and_rooks
+        | chess.BB_FILE_ATTACKS[square][chess.BB_FILE_MASKS[square] & occupied]
+        & queens_and_rooks
+        | chess.BB_DIAG_ATTACKS[square][chess.BB_DIAG_MASKS[square] & occupied]
+        & queens_and_bishops
+    )
+
+
+def king_attackers(boards: Sequence[chess.Board]) -> List[int]:
+    """The mask of the pieces that can capture the opponent king on each board (0 if none)
+
+    A requested move from one of these squares to the king captures it: sliding moves are only cut
+    short by a piece in between, and such a piece would block the attack too.
+    """
+    return [_king_attackers(board, board.turn) for board in boards]
+
+
 def certain_win(boards: List[chess.Board]) -> Optional[chess.Move]:
+    """A requested move that captures the opponent king on every board, if there is one"""
+    color = boards[0].turn
+    king = boards[0].kings & boards[0].occupied_co[not color]
+    attackers = _king_attackers(boards[0], color)
+    for board in boards:
+        if not attackers:
+            return None
+        if board.kings & board.occupied_co[not color] != king:
+            return None  # the king is not on the same square on every board
+        attackers &= _king_attackers(board, color)
+    if not attackers:
+        return None
+    king_square = chess.msb(king)
+    # Return the first in the order of move_actions, as simulating each requested move did. A
+    # pawn move to the last rank must still name its promotion to be taken.
     for requested_move in move_actions(boards[0]):
-        for board in boards:
-            op_king_square = board.king(not board.turn)
-            if requested_move.to_square != op_king_square:
-                break  # this can't possibly be a king-capture
-            _, capture_square = simulate_move(board, requested_move)
-            if capture_square != op_king_square:
-                break  # this isn't a king-capture
-        else:
+        if (
+            requested_move.to_square == king_square
+            and chess.BB_SQUARES[requested_move.from_square] & attackers
+            and simulate_move(boards[0], requested_move)[1] == king_square
+        ):
             return requested_move
+    return None
+
+
+def ranked_choice_vote(votes: List[List[List[chess.Move]]]) -> chess.Move:
+    """Choose a move by ranked-choice-voting, allowing voters to rank moves equally
+
+    Each vote is a list of groups of moves in order of preference, where all moves in a group are
+    ranked equally. Returns the null move if there are no votes.
+    """
+    # Ranked-choice-voting is an iterative algorithm that scores candidates by the number of
+    # first-choice votes they receive. If a candidate receives a majority, it is selected.
+    # Otherwise, the lowest-scoring candidate is eliminated and the process repeats. Because this
+    # version allows tied ranking, the total number of votes can exceed the number of voters.
+    while True:
+        if not votes:
+            return chess.Move.null()
+        threshold = len(votes) // 2
+        first_choice_votes = defaultdict(int)
+        for vote in votes:
+            for move in vote[0]:
+                first_choice_votes[move] += 1
+        max_move, max_num_votes = max(first_choice_votes.items(), key=lambda x: x[1])
+        if max_num_votes >= threshold:
+            return max_move
+        min_move, min_num_votes = min(first_choice_votes.items(), key=lambda x: x[1])
+        revised_votes = []
+        for vote in votes:
+            revised_vote = []
+            for group in vote:
+                revised_group = [move for move in group if move != min_move]
+                if revised_group:
+                    revised_vote.append(revised_group)
+            if revised_vote:
+                revised_votes.append(revised_vote)
+        votes = revised_votes
 
 
 def minimax_sense(
@@ -0,0 +1,200 @@
+"""Headless multi-process tournaments between two bots
+
+run_tournament plays a number of local games between two bot specs (anything
+reconchess.load_player accepts) on a process pool, alternating which bot plays white. Every game's
+GameHistory is saved, and summarize aggregates the results into per-bot scores with confidence
+intervals, win and loss reasons, and think time.
+"""
+
+import json
+import os
+from collections import Counter
+from math import sqrt
+from multiprocessing import Pool
+from typing import Dict, List, Optional, Tuple
+
+import chess
+import reconchess
+from tqdm import tqdm
+
+from reconchess_tools.profiling import play_profiled_game
+
+
+def wilson_interval(successes: float, n: int, z: float = 1.96) -> Tuple[float, float]:
+    """Confidence interval of a proportion, which behaves well near 0 and 1 and for small n"""
+    if n == 0:
+        return 0.0, 1.0
+    p = successes / n
+    center = (p + z * z / (2 * n)) / (1 + z * z / n)
+    margin = z * sqrt(p * (1 - p) / n + z * z / (4 * n * n)) / (1 + z * z / n)
+    return max(0.0, center - margin), min(1.0, center + margin)
+
+
+def play_game(
+    game_index: int,
+    white_spec: str,
+    black_spec: str,
+    history_dir: str,
+    seconds_per_player: float = 900,
+    profile_dir: Optional[str] = None,
+    profiler: Optional[str] = None,
+) -> Dict:
+    """Play and save one local game, returning its result
+
+    A player's think time is the time taken off their clock, counting increments as used. If
+    profile_dir is given, every player callback is timed and the timings (and profiles, if a
+    profiler is given) are written to a subdirectory of it named after the game.
+    """
+    _, white = reconchess.load_player(white_spec)
+    _, black = reconchess.load_player(black_spec)
+    game = reconchess.LocalGame(seconds_per_player)
+    if profile_dir is None:
+        winner_color, win_reason, history = reconchess.play_local_game(
+            white(), black(), game=game
+        )
+    else:
+        winner_color, win_reason, history = play_profiled_game(
+            white(),
+            black(),
+            os.path.join(profile_dir, f"game_{game_index:05d}"),
+            game=game,
+            profiler=profiler,
+        )
+    history_path = os.path.join(history_dir, f"game_{game_index:05d}.json")
+    history.save(history_path)
+    result = {
+        "game": game_index,
+        "white": white_spec,
+        "black": black_spec,
+        "winner": None if winner_color is None else chess.COLOR_NAMES[winner_color],
+        "win_reason": None if win_reason is None else win_reason.name,
+        "history": history_path,
+    }
+    for color in chess.COLORS:
+        turns = history.num_turns(color)
+        result[f"{chess.COLOR_NAMES[color]}_turns"] = turns
+        result[f"{chess.COLOR_NAMES[color]}_seconds"] = (
+            seconds_per_player
+            + game.seconds_increment * turns
+            - game.seconds_left_by_color[color]
+        )
+    return result
+
+
+def _play_game(args):
+    game_index, white_spec, black_spec, *_ = args
+    try:
+        return play_game(*args)
+    except Exception as e:
+        return {
+            "game": game_index,
+            "white": white_spec,
+            "black": black_spec,
+            "error": repr(e),
+        }
+
+
+def run_tournament(
+    bot_a: str,
+    bot_b: str,
+    num_games: int,
+    output_dir: str,
+    processes: Optional[int] = None,
+    seconds_per_player: float = 900,
+    profile: bool = False,
+    profiler: Optional[str] = None,
+) -> List[Dict]:
+    """Play num_games games between two bots, bot_a playing white in the even-numbered games
+
+    If profile is True, the per-callback timings of each game are written under a profiles
+    directory of output_dir, as by play_profiled_game.
+    """
+    history_dir = os.path.join(output_dir, "histories")
+    os.makedirs(history_dir, exist_ok=True)
+    profile_dir = os.path.join(output_dir, "profiles") if profile else None
+    jobs = [
+        (
+            i,
+            *((bot_a, bot_b) if i % 2 == 0 else (bot_b, bot_a)),
+            history_dir,
+            seconds_per_player,
+            profile_dir,
+            profiler,
+        )
+        for i in range(num_games)
+    ]
+    results = []
+    with Pool(processes) as pool:
+        for result in tqdm(pool.imap_unordered(_play_game, jobs), total=num_games):
+            if "error" in result:
+                tqdm.write(f"Game {result['game']} failed: {result['error']}")
+            results.append(result)
+    results.sort(key=lambda result: result["game"])
+    with open(os.path.join(output_dir, "results.json"), "w") as f:
+        json.dump(results, f, indent=2)
+    return results
+
+
+def summarize(results: List[Dict]) -> Dict[str, Dict]:
+    """Aggregate game results per bot
+
+    A bot's score counts a win as 1 and a draw as 1/2, and its interval is the 95% Wilson interval
+    of that score. Games that failed to complete are counted separately and otherwise ignored.
+    """
+    summary = {}
+    for result in results:
+        for color in chess.COLORS:
+            name = chess.COLOR_NAMES[color]
+            bot = summary.setdefault(
+                result[name],
+                {
+                    "games": 0,
+                    "wins": 0,
+                    "losses": 0,
+                    "draws": 0,
+                    "errors": 0,
+                    "win_reasons": Counter(),
+                    "loss_reasons": Counter(),
+                    "seconds": 0.0,
+                    "turns": 0,
+                },
+            )
+            if "error" in result:
+                bot["errors"] += 1
+                continue
+            bot["games"] += 1
+            if result["winner"] is None:
+                bot["draws"] += 1
+            elif result["winner"] == name:
+                bot["wins"] += 1
+                bot["win_reasons"][result["win_reason"]] += 1
+            else:
+                bot["losses"] += 1
+                bot["loss_reasons"][result["win_reason"]] += 1
+            bot["seconds"] += result[f"{name}_seconds"]
+            bot["turns"] += result[f"{name}_turns"]
+    for bot in summary.values():
+        score = bot["wins"] + bot["draws"] / 2
+        bot["score"] = score / bot["games"] if bot["games"] else 0.0
+        bot["score_interval"] = wilson_interval(score, bot["games"])
+        bot["seconds_per_game"] = bot["seconds"] / max(1, bot["games"])
+        bot["seconds_per_turn"] = bot["seconds"] / max(1, bot["turns"])
+    return summary
+
+
+def format_summary(summary: Dict[str, Dict]) -> str:
+    lines = []
+    for name, bot in summary.items():
+        low, high = bot["score_interval"]
+        lines += [
+            f"{name}",
+            f"    {bot['wins']:,.0f} wins, {bot['losses']:,.0f} losses, "
+            f"{bot['draws']:,.0f} draws in {bot['games']:,.0f} games"
+            + (f" ({bot['errors']:,.0f} failed)" if bot["errors"] else ""),
+            f"    score {bot['score']:.3f} (95% CI {low:.3f} - {high:.3f})",
+            f"    wins by {dict(bot['win_reasons'])}",
+            f"    losses by {dict(bot['loss_reasons'])}",
+            f"    think time {bot['seconds_per_game']:.1f} s per game, "
+            f"{bot['seconds_per_turn']:.2f} s per turn",
+        ]
+    return "\n".join(lines)
@@ -1,24 +1,71 @@
 import random
+from functools import lru_cache
 from math import sqrt
-from typing import List
+from typing import List, NamedTuple, Sequence
 
 import chess
-import pkg_resources
 import pygame
 
 LIGHT_COLOR = (240, 217, 181)
 DARK_COLOR = (181, 136, 99)
 
-PIECE_IMAGES = {}
-for color in chess.COLORS:
-    for piece_type in chess.PIECE_TYPES:
-        piece = chess.Piece(piece_type, color)
 
-        img_path = "res/{}/{}.png".format(chess.COLOR_NAMES[color], piece.symbol())
-        full_path = pkg_resources.resource_filename("reconchess", img_path)
+@lru_cache(maxsize=None)
+def piece_images():
+    """The piece images from the reconchess package, loaded the first time they are needed"""
+    # pkg_resources is slow to import, so it is only imported when drawing starts
+    import pkg_resources
 
-        img = pygame.image.load(full_path)
-        PIECE_IMAGES[piece] = img
+    images = {}
+    for color in chess.COLORS:
+        for piece_type in chess.PIECE_TYPES:
+            piece = chess.Piece(piece_type, color)
+
+            img_path = "res/{}/{}.png".format(chess.COLOR_NAMES[color], piece.symbol())
+            full_path = pkg_resources.resource_filename("reconchess", img_path)
+
+            images[piece] = pygame.image.load(full_path)
+    return images
+
+
+def __getattr__(name):
+    # PIECE_IMAGES was a module constant before the images were loaded lazily
+    if name == "PIECE_IMAGES":
+        return piece_images()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+class Heatmap(NamedTuple):
+    """How often each piece appears on each square across a (sampled) set of boards
+
+    counts is indexed by heatmap_index(square, piece). Heatmaps are small, plain data so they can be
+    stored per turn and rendered to a surface only when needed.
+    """
+
+    num_boards: int
+    counts: Sequence[int]
+
+
+def heatmap_index(square: chess.Square, piece: chess.Piece) -> int:
+    return ((piece.color * 6) + piece.piece_type - 1) * 64 + square
+
+
+def piece_heatmap(boards: List[chess.Board], max_boards=10_000) -> Heatmap:
+    if len(boards) > max_boards:
+        boards = random.sample(boards, max_boards)
+    counts = [0] * (2 * 6 * 64)
+    for board in boards:
+        for color in chess.COLORS:
+            for piece_type in chess.PIECE_TYPES:
+                offset = ((color * 6) + piece_type - 1) * 64
+                for square in chess.scan_forward(board.pieces_mask(piece_type, color)):
+                    counts[offset + square] += 1
+    return Heatmap(len(boards), counts)
+
+
+@lru_cache(maxsize=None)
+def scaled_piece_image(piece: chess.Piece, size: int) -> pygame.Surface:
+    return pygame.transform.scale(piece_images()[piece], (size, size))
 
 
 def draw_empty_board(font: pygame.font.SysFont, w) -> pygame.Surface:
@@ -61,7 +108,7 @@ def draw_pieces(board: chess.Board, w, alpha) -> pygame.Surface:
     for square in chess.SQUARES:
         piece = board.piece_at(square)
         if piece is not None:
-            image = pygame.transform.scale(PIECE_IMAGES[piece], (int(sw), int(sw)))
+            image = scaled_piece_image(piece, int(sw))
             s = pygame.Surface((sw, sw), pygame.SRCALPHA)
             s.fill((255, 255, 255, alpha))
             s.blit(image, (0, 0), special_flags=pygame.BLEND_RGBA_MULT)
@@ -81,3 +128,47 @@ def draw_boards(
     for board in boards:
         surface.blit(draw_pieces(board, w, alpha), (0, 0))
     return surface
+
+
+def draw_heatmap(
+    heatmap: Heatmap, empty_board: pygame.Surface, alpha=None
+) -> pygame.Surface:
+    """Render a heatmap onto a copy of an empty board
+
+    Each piece is drawn once per square with the opacity that stacking it once per board at the
+    given alpha would produce, which is how draw_boards renders the same boards.
+    """
+    surface = empty_board.copy()
+    if not heatmap.num_boards:
+        return surface
+    if alpha is None:
+        alpha = max(1, int(255 / sqrt(heatmap.num_boards)))
+    w = surface.get_width()
+    sw = w / 8
+    transparency = 1 - alpha / 255
+    for color in chess.COLORS:
+        for piece_type in chess.PIECE_TYPES:
+            piece = chess.Piece(piece_type, color)
+            image = scaled_piece_image(piece, int(sw))
+            for square in chess.SQUARES:
+                count = heatmap.counts[heatmap_index(square, piece)]
+                if not count:
+                    continue
+                s = pygame.Surface((sw, sw), pygame.SRCALPHA)
+                s.fill((255, 255, 255, round(255 * (1 - transparency**count))))
+                s.blit(image, (0, 0), special_flags=pygame.BLEND_RGBA_MULT)
+                x = sw * chess.square_file(square)
+                y = w - sw - sw * chess.square_rank(square)
+                surface.blit(s, (x, y))
+    return surface
+
+
+def draw_board(board: chess.Board, empty_board: pygame.Surface) -> pygame.Surface:
+    surface = empty_board.copy()
+    w = surface.get_width()
+    sw = w / 8
+    for square, piece in board.piece_map().items():
+        x = sw * chess.square_file(square)
+        y = w - sw - sw * chess.square_rank(square)
+        surface.blit(scaled_piece_image(piece, int(sw)), (x, y))
+    return surface
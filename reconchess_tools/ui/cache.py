@@ -0,0 +1,108 @@
+"""On-disk cache of the MHT analysis shown in a replay
+
+Computing every turn's MHT views can take minutes for sharp games, so once a replay has finished its
+analysis, the per-turn data (board counts, info text, and piece-frequency heatmaps) is written to a
+cache file named by a hash of the normalized history string. Reopening the same game memory-maps
+that file and shows the full analysis immediately.
+
+The file is a small JSON header followed by the heatmap counts as a flat array of unsigned 32-bit
+integers. Loaded heatmaps are zero-copy views into the mapped file.
+"""
+
+import hashlib
+import json
+import mmap
+import os
+import struct
+from array import array
+from typing import List, Optional
+
+from reconchess_tools.ui import Heatmap
+
+MAGIC = b"RCRA"
+VERSION = 1
+# magic, format version, header length
+_PREAMBLE = struct.Struct("<4sII")
+
+HEATMAP_PANES = ["white", "black", "after_sense"]
+HEATMAP_SIZE = 2 * 6 * 64
+
+
+def default_cache_dir() -> str:
+    cache_home = os.environ.get("XDG_CACHE_HOME") or os.path.join(
+        os.path.expanduser("~"), ".cache"
+    )
+    return os.path.join(cache_home, "reconchess-tools", "replays")
+
+
+def cache_path(cache_dir: str, history_string: str) -> str:
+    digest = hashlib.sha256(history_string.encode()).hexdigest()
+    return os.path.join(cache_dir, f"{digest}.rcra")
+
+
+def save_analysis(path: str, history_string: str, views: List) -> None:
+    """Write the analysis held by a replay's views to a cache file
+
+    The file is written to a temporary path and then moved into place, so a concurrent or
+    interrupted save never leaves a partial cache file behind.
+    """
+    counts = array("I")
+    header = {"history": history_string, "views": []}
+    for view in views:
+        heatmaps = {}
+        for pane in HEATMAP_PANES:
+            heatmap: Optional[Heatmap] = getattr(view, f"heatmap_{pane}")
+            if heatmap is not None:
+                heatmaps[pane] = [len(counts) // HEATMAP_SIZE, heatmap.num_boards]
+                counts.extend(heatmap.counts)
+        header["views"].append(
+            {
+                "sense_square": view.sense_square,
+                "board_counts": view.board_counts,
+                "heatmaps": heatmaps,
+                "info": view.info,
+                "info_after_sense": view.info_after_sense,
+            }
+        )
+    encoded_header = json.dumps(header).encode()
+    # Pad the header so the counts are aligned for a zero-copy cast when loading
+    encoded_header += b" " * (-(_PREAMBLE.size + len(encoded_header)) % counts.itemsize)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(_PREAMBLE.pack(MAGIC, VERSION, len(encoded_header)))
+        f.write(encoded_header)
+        counts.tofile(f)
+    os.replace(tmp_path, path)
+
+
+def load_analysis(path: str, history_string: str, views: List) -> bool:
+    """Populate a replay's views from a cache file
+
+    Returns False, leaving the views untouched, if there is no usable cache file for this history.
+    """
+    try:
+        with open(path, "rb") as f:
+            mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    except (OSError, ValueError):  # missing or empty file
+        return False
+    try:
+        magic, version, header_length = _PREAMBLE.unpack_from(mapped)
+        if magic != MAGIC or version != VERSION:
+            return False
+        start = _PREAMBLE.size + header_length
+        header = json.loads(mapped[_PREAMBLE.size : start])
+        counts = memoryview(mapped)[start:].cast("I")
+    except (struct.error, TypeError, ValueError):  # truncated or corrupt file
+        return False
+    if header["history"] != history_string or len(header["views"]) != len(views):
+        return False
+    for view, cached in zip(views, header["views"]):
+        view.sense_square = cached["sense_square"]
+        view.board_counts = cached["board_counts"]
+        for pane, (index, num_boards) in cached["heatmaps"].items():
+            heatmap_counts = counts[index * HEATMAP_SIZE : (index + 1) * HEATMAP_SIZE]
+            setattr(view, f"heatmap_{pane}", Heatmap(num_boards, heatmap_counts))
+        view.info = cached["info"]
+        view.info_after_sense = cached["info_after_sense"]
+    return True
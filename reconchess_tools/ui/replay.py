@@ -11,15 +11,16 @@ The desired behavior is for the window to appear immediately and for navigation
 appear even before the MHT calculations are complete. To accomplish this, we create a surface to
 store each board view and the status computing and rendering the boards. We also store a message
 to be displayed per turn. Then the animation task has only to render the current surfaces at each
-step (and we could possibly set a timestamp for the last change to avoid blit-ing unchanged
-surfaces). A separate task runs to compute the MHT views, blit the pieces to each surface,
+step, and each view records a timestamp for its last change so that unchanged surfaces are not
+blit-ed again. A separate task runs to compute the MHT views, blit the pieces to each surface,
 and update the status information.
 """
 
 import asyncio
 import contextlib
 import time
-from typing import List, Optional, Tuple
+from collections import OrderedDict
+from typing import Dict, List, Optional
 
 from reconchess import GameHistory
 
@@ -28,24 +29,48 @@ with contextlib.redirect_stdout(None):
 
 import chess
 
-from reconchess_tools.ui import PIECE_IMAGES, draw_boards, draw_empty_board
-from reconchess_tools.utilities import (
-    possible_requested_moves,
-    simulate_move,
-    simulate_sense,
+from reconchess_tools.analysis import actions_from_history
+from reconchess_tools.mht import MultiHypothesisTracker
+from reconchess_tools.simulator import GameRecord
+from reconchess_tools.ui import (
+    Heatmap,
+    draw_board,
+    draw_empty_board,
+    draw_heatmap,
+    piece_heatmap,
+    piece_images,
 )
+from reconchess_tools.ui.cache import (
+    cache_path,
+    default_cache_dir,
+    load_analysis,
+    save_analysis,
+)
+from reconchess_tools.utilities import simulate_move, simulate_sense
 
 SENSE, MOVE = False, True
 
+# Events signalling that the window contents must be redrawn (WINDOWEXPOSED is new in pygame 2)
+_EXPOSE_EVENTS = {
+    pygame.VIDEOEXPOSE,
+    getattr(pygame, "WINDOWEXPOSED", pygame.VIDEOEXPOSE),
+}
+
 
 class Replay:
-    def __init__(self, history_string: str):
+    def __init__(
+        self,
+        history_string: str,
+        max_cached_surfaces=32,
+        use_cache=True,
+        cache_dir: Optional[str] = None,
+    ):
 
         pygame.init()
         pygame.display.set_caption("Reconchess MHT Replay")
         pygame.display.set_icon(
             pygame.transform.scale(
-                PIECE_IMAGES[chess.Piece(chess.KING, chess.WHITE)], (32, 32)
+                piece_images()[chess.Piece(chess.KING, chess.WHITE)], (32, 32)
             )
         )
 
@@ -66,7 +91,18 @@ class Replay:
         self.screen = pygame.display.set_mode((self.width, self.height))
         self.screen.fill(self.background_color)
 
+        self.empty_board = draw_empty_board(self.board_font, self.board_size)
+        self.surface_sense = pygame.Surface([self.square_size * 3] * 2, pygame.SRCALPHA)
+        self.surface_sense.fill((205, 205, 255, 85))
+        self.surface_capture = pygame.Surface([self.square_size] * 2, pygame.SRCALPHA)
+        self.surface_capture.fill((255, 0, 0, 50))
+
         self.action_index = 0
+        # The contents last drawn at each pane position, see update_view
+        self.rendered = {}
+        # The most recently used pane surfaces, keyed by view index and pane name, see render
+        self.surfaces = OrderedDict()
+        self.max_cached_surfaces = max_cached_surfaces
 
         self.history = tuple(history_string.strip().lower().split())
         self.history_string = " ".join(
@@ -77,8 +113,15 @@ class Replay:
         self.num_moves_by_white = (self.num_moves + 1) // 2
         self.num_moves_by_black = self.num_moves // 2
 
+        # Where the MHT analysis of this game is cached between replays, see ui.cache
+        self.cache_path = (
+            cache_path(cache_dir or default_cache_dir(), self.history_string)
+            if use_cache
+            else None
+        )
+
         board = chess.Board()
-        self.views: List[View] = [View(board, self.board_font, self.board_size)]
+        self.views: List[View] = [View(board)]
 
         # Compute the true board states synchronously since that is fast
         history_iter = iter(self.history)
@@ -90,7 +133,7 @@ class Replay:
                 requested_move = chess.Move.from_uci(next(history_iter))
                 taken_move, capture_square = simulate_move(board, requested_move)
                 board.push(taken_move)
-                self.views.append(View(board, self.board_font, self.board_size))
+                self.views.append(View(board, capture_square))
 
         except StopIteration:
             pass
@@ -99,77 +142,68 @@ class Replay:
         self.win_reason = "timeout" if board.king(board.turn) else "king capture"
 
     @classmethod
-    def from_history(cls, history: GameHistory) -> "Replay":
-        actions = []
-        for turn in history.turns():
-            sense = history.sense(turn)
-            actions.append("00" if sense is None else chess.SQUARE_NAMES[sense])
-            actions.append((history.requested_move(turn) or chess.Move.null()).uci())
-        actions = " ".join(actions)
-        return Replay(actions)
+    def from_history(cls, history: GameHistory, **kwargs) -> "Replay":
+        actions = " ".join(actions_from_history(history))
+        return Replay(actions, **kwargs)
+
+    @classmethod
+    def from_record(cls, record: GameRecord, **kwargs) -> "Replay":
+        return Replay(" ".join(record.actions()), **kwargs)
 
     async def play(self):
-        task_mht = asyncio.create_task(self.update_mht())
+        if self.load_analysis():
+            task_mht = None
+        else:
+            task_mht = asyncio.create_task(self.update_mht())
         task_update = asyncio.create_task(self.update_view())
         await self.respond_to_events()
-        task_mht.cancel()
+        if task_mht is not None:
+            task_mht.cancel()
         task_update.cancel()
         pygame.quit()
 
     def play_sync(self):
         asyncio.run(self.play())
 
+    def load_analysis(self) -> bool:
+        """Fill in the views from the analysis cache, if this game has been analyzed before"""
+        if self.cache_path is None:
+            return False
+        if not load_analysis(self.cache_path, self.history_string, self.views):
+            return False
+        for view in self.views:
+            view.updated_at = time.perf_counter()
+        return True
+
     async def update_mht(self):
         history_iter = iter(self.history)
         board = chess.Board()
-        active, waiting = AsyncMultiHypothesisTracker(), AsyncMultiHypothesisTracker()
+        active, waiting = MultiHypothesisTracker(), MultiHypothesisTracker()
         turn_index = 0
         num_boards = [1, 1]
 
         requested_move = (
             taken_move
         ) = capture_square = piece_moved = piece_captured = None
-        x = y = 10
         view = self.views[0]
 
-        surface_sense = pygame.Surface([self.square_size * 3] * 2, pygame.SRCALPHA)
-        surface_sense.fill((205, 205, 255, 85))
-
-        surface_capture = pygame.Surface([self.square_size] * 2, pygame.SRCALPHA)
-        surface_capture.fill((255, 0, 0, 50))
-
         # TODO: Split white and black MHT views in case one explodes
         try:
             while True:
                 view = self.views[turn_index]
-                if board.turn == chess.WHITE:
-                    view.surface_white = draw_boards(
-                        active.boards, self.board_size, self.board_font
-                    )
-                    view.surface_black = draw_boards(
-                        waiting.boards, self.board_size, self.board_font
-                    )
-                else:
-                    view.surface_white = draw_boards(
-                        waiting.boards, self.board_size, self.board_font
-                    )
-                    view.surface_black = draw_boards(
-                        active.boards, self.board_size, self.board_font
-                    )
-                # Shade capture square
-                if capture_square is not None:
-                    x = self.square_size * chess.square_file(capture_square)
-                    y = self.board_size - self.square_size * (
-                        chess.square_rank(capture_square) + 1
-                    )
-                    view.surface_true.blit(surface_capture, (x, y))
-                    view.surface_white.blit(surface_capture, (x, y))
-                    view.surface_black.blit(surface_capture, (x, y))
-                view.updated_at = time.monotonic()
+                white, black = (
+                    (active, waiting)
+                    if board.turn == chess.WHITE
+                    else (waiting, active)
+                )
+                view.heatmap_white = piece_heatmap(white.boards)
+                view.heatmap_black = piece_heatmap(black.boards)
+                view.board_counts["white"] = len(white.boards)
+                view.board_counts["black"] = len(black.boards)
+                view.updated_at = time.perf_counter()
                 await asyncio.sleep(0)
 
                 # Update info
-                view.surface_info.fill(self.background_color)
                 if turn_index == 0:
                     info = ["White to sense on turn 1"]
                 else:
@@ -194,12 +228,8 @@ class Replay:
                         "",
                         f"{chess.COLOR_NAMES[board.turn].capitalize()} to sense on turn {turn_index // 2 + 1}",
                     ]
-                x = y = 10
-                for line in info:
-                    view.surface_info.blit(
-                        self.body_font.render(line, True, self.body_color), (x, y)
-                    )
-                    y += 20
+                view.info = info
+                view.updated_at = time.perf_counter()
                 num_boards[board.turn] = len(active.boards)
                 num_boards[not board.turn] = len(waiting.boards)
                 await asyncio.sleep(0)
@@ -208,23 +238,15 @@ class Replay:
                 square = next(history_iter)
                 square = None if square == "00" else chess.parse_square(square)
                 result = simulate_sense(board, square)
-                await active.sense(square, result)
-                view.surface_after_sense = draw_boards(
-                    active.boards, self.board_size, self.board_font
-                )
-                # Shade sensed squares
-                if square is not None:
-                    x = self.square_size * (chess.square_file(square) - 1)
-                    y = self.board_size - self.square_size * (
-                        chess.square_rank(square) + 2
-                    )
-                    view.surface_after_sense.blit(surface_sense, (x, y))
-                view.updated_at = time.monotonic()
+                await active.sense_async(square, result)
+                view.heatmap_after_sense = piece_heatmap(active.boards)
+                view.board_counts["after_sense"] = len(active.boards)
+                view.sense_square = square
+                view.updated_at = time.perf_counter()
                 await asyncio.sleep(0)
 
                 # Update info
-                view.surface_info_after_sense.fill(self.background_color)
-                info = [
+                view.info_after_sense = [
                     f"{chess.COLOR_NAMES[board.turn].capitalize()} "
                     + (
                         f"sensed at {chess.SQUARE_NAMES[square]}"
@@ -238,12 +260,7 @@ class Replay:
                     "",
                     f"{chess.COLOR_NAMES[board.turn].capitalize()} to move on turn {(turn_index + 1) // 2 + 1}",
                 ]
-                x = y = 10
-                for line in info:
-                    view.surface_info_after_sense.blit(
-                        self.body_font.render(line, True, self.body_color), (x, y)
-                    )
-                    y += 20
+                view.updated_at = time.perf_counter()
                 num_boards[board.turn] = len(active.boards)
                 await asyncio.sleep(0)
 
@@ -258,8 +275,8 @@ class Replay:
                 piece_captured = (
                     None if capture_square is None else board.piece_at(capture_square)
                 )
-                await active.move(requested_move, taken_move, capture_square)
-                await waiting.op_move(capture_square)
+                await active.move_async(requested_move, taken_move, capture_square)
+                await waiting.op_move_async(capture_square)
                 board.push(taken_move)
                 turn_index += 1
                 active, waiting = waiting, active
@@ -267,23 +284,25 @@ class Replay:
         except StopIteration:
             pass
 
-        info = [
-            "",
-            f"{chess.COLOR_NAMES[self.winner].capitalize()} wins by {self.win_reason}!",
-        ]
-        for line in info:
-            (
-                view.surface_info_after_sense
-                if self.num_actions % 2
-                else view.surface_info
-            ).blit(self.body_font.render(line, True, self.body_color), (x, y))
-            y += 20
+        (view.info_after_sense if self.num_actions % 2 else view.info).extend(
+            [
+                "",
+                f"{chess.COLOR_NAMES[self.winner].capitalize()} wins by {self.win_reason}!",
+            ]
+        )
+        view.updated_at = time.perf_counter()
+
+        if self.cache_path is not None:
+            save_analysis(self.cache_path, self.history_string, self.views)
 
     async def respond_to_events(self):
         while True:
             for event in pygame.event.get():
                 if event.type == pygame.QUIT:
                     return
+                if event.type in _EXPOSE_EVENTS:
+                    # The window contents were lost so every pane must be redrawn
+                    self.rendered.clear()
                 if event.type == pygame.KEYDOWN:
                     if event.key == pygame.K_LEFT:
                         self.action_index = max(0, self.action_index - 1)
@@ -292,118 +311,140 @@ class Replay:
                     elif event.key == pygame.K_ESCAPE:
                         pygame.quit()
                         return
-            await asyncio.sleep(0.005)
+            await asyncio.sleep(1 / 60)
 
     async def update_view(self):
+        """Redraw only the panes whose contents changed, at most 60 times a second
+
+        A pane is identified by its position on the screen and its contents by the view and pane
+        shown there and the time that view was last updated. Navigating to another action changes
+        the panes shown and MHT progress changes the timestamp. Unchanged panes are neither
+        blit-ed nor sent to the display, and frames with nothing to redraw are spent rendering one
+        pane of a nearby action ahead of time instead.
+        """
         dt = 1 / 60
-        actual_fps = 1 / dt
-        alpha = 0.98
-        last_update_time = time.time()
         while True:
-            view = self.views[self.action_index // 2]
-            surface_true = view.surface_true
-            surface_white = view.surface_white
-            surface_black = view.surface_black
-            surface_info = view.surface_info
-            if self.action_index % 2:  # has sensed
-                surface_info = view.surface_info_after_sense
-                if view.active_player == chess.WHITE:
-                    surface_white = view.surface_after_sense
-                else:
-                    surface_black = view.surface_after_sense
+            view_index, panes = self.panes(self.action_index)
+            updated_at = self.views[view_index].updated_at
+            dirty_rects = []
+            for pane, position in panes:
+                contents = (view_index, pane, updated_at)
+                if self.rendered.get(position) != contents:
+                    self.rendered[position] = contents
+                    surface = self.render(view_index, pane)
+                    dirty_rects.append(self.screen.blit(surface, position))
+            if dirty_rects:
+                pygame.display.update(dirty_rects)
+            else:
+                self.prefetch()
+            await asyncio.sleep(dt)
+
+    def panes(self, action_index: int):
+        """Get the view index and the (pane, screen position) pairs to show for an action"""
+        view_index = action_index // 2
+        white, black, info = "white", "black", "info"
+        if action_index % 2:  # has sensed
+            info = "info_after_sense"
+            if self.views[view_index].active_player == chess.WHITE:
+                white = "after_sense"
+            else:
+                black = "after_sense"
+        lower = self.margin * 2 + self.board_size
+        return view_index, [
+            ("true", (self.margin, self.margin)),
+            (white, (self.margin, lower)),
+            (black, (lower, lower)),
+            (info, (lower, self.margin)),
+        ]
 
-            self.screen.blit(surface_true, (self.margin, self.margin))
-            self.screen.blit(
-                surface_white,
-                (self.margin, self.margin * 2 + self.square_size * 8),
-            )
-            self.screen.blit(
-                surface_black,
-                (
-                    self.margin * 2 + self.square_size * 8,
-                    self.margin * 2 + self.square_size * 8,
-                ),
-            )
-            self.screen.blit(
-                surface_info, (self.margin * 2 + self.square_size * 8, self.margin)
-            )
-            pygame.display.flip()
-            current_time = time.time()
-            actual_fps = alpha * actual_fps + (1 - alpha) / max(
-                1e-3, current_time - last_update_time
-            )
-            pygame.display.set_caption(f"Reconchess MHT Replay ({actual_fps:.1f} fps)")
-            await asyncio.sleep(last_update_time + dt - current_time)
-            # await asyncio.sleep(dt)
-            last_update_time = current_time
+    def prefetch(self):
+        """Render the first missing pane of the actions on either side of the current one"""
+        for offset in [1, -1, 2, -2]:
+            action_index = self.action_index + offset
+            if not 0 <= action_index <= self.num_actions:
+                continue
+            view_index, panes = self.panes(action_index)
+            for pane, _ in panes:
+                if not self.is_rendered(view_index, pane):
+                    self.render(view_index, pane)
+                    return
+
+    def is_rendered(self, view_index: int, pane: str) -> bool:
+        cached = self.surfaces.get((view_index, pane))
+        return cached is not None and cached[0] == self.views[view_index].updated_at
+
+    def render(self, view_index: int, pane: str) -> pygame.Surface:
+        """Get the surface for a pane of a view, rendering it if it is not cached and current"""
+        key = (view_index, pane)
+        view = self.views[view_index]
+        if self.is_rendered(view_index, pane):
+            self.surfaces.move_to_end(key)
+            return self.surfaces[key][1]
+        if pane == "info":
+            surface = self.draw_info(view.info)
+        elif pane == "info_after_sense":
+            surface = self.draw_info(view.info_after_sense)
+        elif pane == "true":
+            surface = draw_board(view.true_board, self.empty_board)
+        else:
+            heatmap = getattr(view, f"heatmap_{pane}")
+            if heatmap is None:
+                surface = self.empty_board.copy()
+            else:
+                surface = draw_heatmap(heatmap, self.empty_board)
+        if pane == "after_sense":
+            # Shade sensed squares
+            if view.sense_square is not None:
+                x = self.square_size * (chess.square_file(view.sense_square) - 1)
+                y = self.board_size - self.square_size * (
+                    chess.square_rank(view.sense_square) + 2
+                )
+                surface.blit(self.surface_sense, (x, y))
+        elif pane in ["true", "white", "black"]:
+            # Shade capture square
+            if view.capture_square is not None:
+                x = self.square_size * chess.square_file(view.capture_square)
+                y = self.board_size - self.square_size * (
+                    chess.square_rank(view.capture_square) + 1
+                )
+                surface.blit(self.surface_capture, (x, y))
+        self.surfaces[key] = view.updated_at, surface
+        while len(self.surfaces) > self.max_cached_surfaces:
+            self.surfaces.popitem(last=False)
+        return surface
+
+    def draw_info(self, info: List[str]) -> pygame.Surface:
+        surface = pygame.Surface((self.board_size, self.board_size))
+        surface.fill(self.background_color)
+        x = y = 10
+        for line in info:
+            surface.blit(self.body_font.render(line, True, self.body_color), (x, y))
+            y += self.body_spacing
+        return surface
 
 
 class View:
-    def __init__(self, true_board, font, width):
-        self.surface_true = draw_boards([true_board], width, font)
-        self.surface_white = draw_empty_board(font, width)
-        self.surface_black = draw_empty_board(font, width)
-        self.surface_after_sense = draw_empty_board(font, width)
-        self.surface_info = pygame.Surface((width, width))
-        self.surface_info_after_sense = pygame.Surface((width, width))
-        self.active_player = true_board.turn
-        self.updated_at = time.monotonic()
-
-
-def board_fingerprint(board: chess.Board):
-    return (
-        board.turn,
-        *board.occupied_co,
-        board.kings,
-        board.queens,
-        board.bishops,
-        board.knights,
-        board.rooks,
-        board.pawns,
-        board.castling_rights,
-        board.ep_square,
-    )
-
-
-class AsyncMultiHypothesisTracker:
-    def __init__(self):
-        self.boards = [chess.Board()]
-
-    async def sense(self, square: chess.Square, result: List[Tuple[int, chess.Piece]]):
-        new_boards = []
-        for board in self.boards:
-            if simulate_sense(board, square) == result:
-                new_boards.append(board)
-            await asyncio.sleep(0)
-        self.boards = new_boards
-
-    async def move(
-        self,
-        requested_move: chess.Move,
-        taken_move: chess.Move,
-        capture_square: Optional[chess.Square],
+    """The compact per-turn data from which the replay panes for one turn are rendered
+
+    Surfaces are large, so views only store the true board, MHT heatmaps, and info text, and the
+    replay renders (and caches a bounded number of) surfaces from them on demand.
+    """
+
+    def __init__(
+        self, true_board: chess.Board, capture_square: Optional[chess.Square] = None
     ):
-        new_boards = []
-        for board in self.boards:
-            if simulate_move(board, requested_move) == (taken_move, capture_square):
-                board.push(taken_move)
-                new_boards.append(board)
-            await asyncio.sleep(0)
-        self.boards = new_boards
-
-    async def op_move(self, capture_square: Optional[chess.Square]):
-        new_boards = {}
-        for board in self.boards:
-            for requested_move in possible_requested_moves(board):
-                taken_move, simulated_capture_square = simulate_move(
-                    board, requested_move
-                )
-                if simulated_capture_square == capture_square:
-                    new_board = board.copy(stack=False)
-                    new_board.push(taken_move)
-                    new_boards[board_fingerprint(new_board)] = new_board
-                await asyncio.sleep(0)
-        self.boards = list(new_boards.values())
+        self.true_board = true_board.copy(stack=False)
+        self.active_player = true_board.turn
+        self.capture_square = capture_square
+        self.sense_square: Optional[chess.Square] = None
+        self.heatmap_white: Optional[Heatmap] = None
+        self.heatmap_black: Optional[Heatmap] = None
+        self.heatmap_after_sense: Optional[Heatmap] = None
+        # The number of boards in each heatmap's MHT, which may exceed the number it sampled
+        self.board_counts: Dict[str, int] = {}
+        self.info: List[str] = []
+        self.info_after_sense: List[str] = []
+        self.updated_at = time.perf_counter()
 
 
 def _main():
@@ -1,4 +1,5 @@
-from typing import Iterable, List, Optional, Tuple
+import random
+from typing import Iterable, List, Optional, Sequence, Tuple
 
 import chess
 from reconchess.utilities import (
@@ -10,6 +11,9 @@ from reconchess.utilities import (
 )
 
 _BACKRANK_SQUARES = chess.SquareSet(chess.BB_BACKRANKS)
+_PROMOTIONS = (chess.QUEEN, chess.ROOK, chess.BISHOP, chess.KNIGHT)
+_NO_PROMOTION = (None,)
+_ANY_PROMOTION = _NO_PROMOTION + _PROMOTIONS
 
 
 def simulate_sense(
@@ -40,6 +44,164 @@ def possible_requested_moves(board: chess.Board) -> Iterable[chess.Move]:
     yield chess.Move.null()
 
 
+def requestable_moves(
+    board: chess.Board, from_mask: chess.Bitboard = chess.BB_ALL
+) -> List[chess.Move]:
+    """Get the moves a player may request, like reconchess.utilities.move_actions but faster
+
+    move_actions generates moves on a copy of the board with the opponent's pieces removed. Those
+    moves depend only on the player's own pieces, so here they are read directly from the attack
+    tables with the player's own pieces as the only blockers. The same set of moves is returned,
+    though not in the same order. As with python-chess's move generators, from_mask limits the
+    moves to those of the pieces on the given squares.
+    """
+    return [
+        chess.Move(
+            from_square if from_square is not None else to_square - shift,
+            to_square,
+            promotion,
+        )
+        for from_square, shift, targets, promotions in _requestable_targets(
+            board, from_mask
+        )
+        for to_square in chess.scan_reversed(targets)
+        for promotion in promotions
+    ]
+
+
+def random_requestable_move(board: chess.Board) -> chess.Move:
+    """Choose uniformly among requestable_moves(board) without constructing every move"""
+    groups = _requestable_targets(board)
+    weights = [
+        chess.popcount(targets) * len(promotions)
+        for _, _, targets, promotions in groups
+    ]
+    index = random.randrange(sum(weights))
+    for (from_square, shift, targets, promotions), weight in zip(groups, weights):
+        if index < weight:
+            break
+        index -= weight
+    target_index, promotion_index = divmod(index, len(promotions))
+    for to_square in chess.scan_reversed(targets):
+        if target_index == 0:
+            if from_square is None:
+                from_square = to_square - shift
+            return chess.Move(from_square, to_square, promotions[promotion_index])
+        target_index -= 1
+
+
+def _requestable_targets(
+    board: chess.Board, from_mask: chess.Bitboard = chess.BB_ALL
+) -> List[
+    Tuple[
+        Optional[chess.Square],
+        int,
+        chess.Bitboard,
+        Sequence[Optional[chess.PieceType]],
+    ]
+]:
+    """Group the requestable moves by origin and the promotions requested with them
+
+    Each group is a from square, a shift, a bitboard of to squares, and the promotions (None for
+    no promotion) that may be requested for each of those to squares. Pieces other than pawns have
+    a group per from square (and kind of attack, for queens). Pawn moves are computed for all pawns
+    at once by shifting the pawn bitboard, so their groups have no from square and each move's
+    from square is its to square minus the shift.
+    """
+    turn = board.turn
+    own = board.occupied_co[turn]
+    not_own = ~own & chess.BB_ALL
+    own_from = own & from_mask
+    groups = []
+
+    for from_square in chess.scan_reversed(own_from & board.knights):
+        targets = chess.BB_KNIGHT_ATTACKS[from_square] & not_own
+        if targets:
+            groups.append((from_square, 0, targets, _NO_PROMOTION))
+    for from_square in chess.scan_reversed(own_from & (board.bishops | board.queens)):
+        targets = (
+            chess.BB_DIAG_ATTACKS[from_square][chess.BB_DIAG_MASKS[from_square] & own]
+            & not_own
+        )
+        if targets:
+            groups.append((from_square, 0, targets, _NO_PROMOTION))
+    for from_square in chess.scan_reversed(own_from & (board.rooks | board.queens)):
+        targets = (
+            chess.BB_RANK_ATTACKS[from_square][chess.BB_RANK_MASKS[from_square] & own]
+            | chess.BB_FILE_ATTACKS[from_square][chess.BB_FILE_MASKS[from_square] & own]
+        ) & not_own
+        if targets:
+            groups.append((from_square, 0, targets, _NO_PROMOTION))
+    for from_square in chess.scan_reversed(own_from & board.kings):
+        targets = chess.BB_KING_ATTACKS[from_square] & not_own
+        if targets:
+            groups.append((from_square, 0, targets, _NO_PROMOTION))
+
+    pawns = own_from & board.pawns
+    if pawns:
+        if turn:
+            promotion_rank = chess.BB_RANK_8
+            push = pawns << 8 & not_own
+            double_push = (push & chess.BB_RANK_3) << 8 & not_own
+            # Captures may be requested onto any square not occupied by our own pieces
+            captures = [
+                (7, (pawns & ~chess.BB_FILE_A) << 7 & not_own),
+                (9, (pawns & ~chess.BB_FILE_H) << 9 & not_own),
+            ]
+            pushes = [(8, push), (16, double_push)]
+        else:
+            promotion_rank = chess.BB_RANK_1
+            push = pawns >> 8 & not_own
+            double_push = (push & chess.BB_RANK_6) >> 8 & not_own
+            captures = [
+                (-9, (pawns & ~chess.BB_FILE_A) >> 9 & not_own),
+                (-7, (pawns & ~chess.BB_FILE_H) >> 7 & not_own),
+            ]
+            pushes = [(-8, push), (-16, double_push)]
+        for shift, targets in pushes:
+            if targets & ~promotion_rank:
+                groups.append((None, shift, targets & ~promotion_rank, _NO_PROMOTION))
+            if targets & promotion_rank:
+                groups.append((None, shift, targets & promotion_rank, _PROMOTIONS))
+        for shift, targets in captures:
+            if targets & ~promotion_rank:
+                groups.append((None, shift, targets & ~promotion_rank, _NO_PROMOTION))
+            if targets & promotion_rank:
+                # Captures onto the back rank may be requested with or without a promotion
+                groups.append((None, shift, targets & promotion_rank, _ANY_PROMOTION))
+
+    # Castling is only blocked by our own pieces since the opponent's pieces are unknown
+    backrank = chess.BB_RANK_1 if turn else chess.BB_RANK_8
+    king = own_from & board.kings & backrank
+    if king:
+        king_square = chess.lsb(king)
+        for rook_square in chess.scan_reversed(
+            board.clean_castling_rights() & own & backrank
+        ):
+            a_side = rook_square < king_square
+            king_to = chess.lsb(
+                (chess.BB_FILE_C if a_side else chess.BB_FILE_G) & backrank
+            )
+            rook_to = chess.lsb(
+                (chess.BB_FILE_D if a_side else chess.BB_FILE_F) & backrank
+            )
+            path = (
+                chess.between(king_square, king_to)
+                | chess.between(rook_square, rook_to)
+                | chess.BB_SQUARES[king_to]
+                | chess.BB_SQUARES[rook_to]
+            )
+            blockers = (
+                own & ~chess.BB_SQUARES[king_square] & ~chess.BB_SQUARES[rook_square]
+            )
+            if not blockers & path:
+                groups.append(
+                    (king_square, 0, chess.BB_SQUARES[king_to], _NO_PROMOTION)
+                )
+
+    return groups
+
+
 def possible_taken_moves(board: chess.Board) -> Iterable[chess.Move]:
     for move in board.pseudo_legal_moves:
         yield move
@@ -47,3 +209,67 @@ def possible_taken_moves(board: chess.Board) -> Iterable[chess.Move]:
         if not is_illegal_castle(board, move):
             yield move
     yield chess.Move.null()
+
+
+def board_fingerprint(board: chess.Board):
+    """Compute a fingerprint for fast board comparisons
+
+    This fingerprint is a tuple of integers and booleans that contains the same information as the
+    extended position description (EPD). It does not contain all of the information in the FEN, e.g.
+    half-move counter, because those are not significant in reconchess. Two boards have the same
+    fingerprint, they are identical as far as reconchess is concerned, including allowing the same
+    requested moves, and having the same results for any sense or move action.
+    """
+    return (
+        board.turn,
+        *board.occupied_co,
+        board.kings,
+        board.queens,
+        board.bishops,
+        board.knights,
+        board.rooks,
+        board.pawns,
+        board.castling_rights,
+        board.ep_square,
+    )
+
+
+def board_from_fingerprint(fingerprint) -> chess.Board:
+    """Reconstruct a board from its fingerprint
+
+    The board has an empty move stack, a half-move clock of 0, and a full-move number of 1, since
+    the fingerprint does not record those. It is built the way chess.Board.copy builds boards,
+    which is several times faster than going through a FEN.
+    """
+    (
+        turn,
+        black,
+        white,
+        kings,
+        queens,
+        bishops,
+        knights,
+        rooks,
+        pawns,
+        castling_rights,
+        ep_square,
+    ) = fingerprint
+    board = chess.Board.__new__(chess.Board)
+    board.occupied_co = [black, white]
+    board.occupied = white | black
+    board.kings = kings
+    board.queens = queens
+    board.bishops = bishops
+    board.knights = knights
+    board.rooks = rooks
+    board.pawns = pawns
+    board.promoted = chess.BB_EMPTY
+    board.chess960 = False
+    board.ep_square = ep_square
+    board.castling_rights = castling_rights
+    board.turn = turn
+    board.fullmove_number = 1
+    board.halfmove_clock = 0
+    board.move_stack = []
+    board._stack = []
+    return board
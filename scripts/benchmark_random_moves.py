@@ -7,7 +7,7 @@ from tqdm import trange
 
 
 def main():
-    perf_counter()
+    start = perf_counter()
     n = 10_000
     board = chess.Board()
     for _ in trange(n):
@@ -16,7 +16,7 @@ def main():
         board.push(revised)
         if board.king(chess.WHITE) is None or board.king(chess.BLACK) is None:
             board.reset()
-    t = perf_counter()
+    t = perf_counter() - start
     print(
         f"Finished {n:,.0f} random moves in {t:.2f} seconds "
         f"({n/t:,.2f} moves per second on average)"
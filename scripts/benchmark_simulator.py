@@ -0,0 +1,46 @@
+import random
+from time import perf_counter
+
+import reconchess
+from reconchess.bots.random_bot import RandomBot
+
+from reconchess_tools.simulator import simulate_games
+
+# Both rates are the best of this many runs, since a single run is easily disturbed by other load
+RUNS = 3
+
+
+def local_games(n):
+    plies = 0
+    for _ in range(n):
+        _, _, history = reconchess.play_local_game(RandomBot(), RandomBot())
+        plies += len(list(history.turns()))
+    return plies
+
+
+def simulated_games(n):
+    return sum(len(record.senses) for record in simulate_games(n))
+
+
+def best_rate(play, n):
+    rates = []
+    for run in range(RUNS):
+        random.seed(run)
+        start = perf_counter()
+        plies = play(n)
+        rates.append(plies / (perf_counter() - start))
+    return plies, max(rates)
+
+
+def main():
+    plies, local_rate = best_rate(local_games, 20)
+    print(f"play_local_game: {plies:,.0f} plies ({local_rate:,.0f} plies per second)")
+    plies, rate = best_rate(simulated_games, 500)
+    print(
+        f"simulate_games: {plies:,.0f} plies ({rate:,.0f} plies per second, "
+        f"{rate / local_rate:.1f}x play_local_game)"
+    )
+
+
+if __name__ == "__main__":
+    main()
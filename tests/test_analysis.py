@@ -0,0 +1,57 @@
+import csv
+
+import chess
+import reconchess
+
+from reconchess_tools.analysis import (
+    actions_from_history,
+    analyze_actions,
+    analyze_corpus,
+)
+
+# Sense squares and requested moves of a short game that ends with white capturing the black king
+ACTIONS = "e7 e2e4 d2 f7f6 f7 d1h5 b2 g7g5 f7 h5e8".split()
+
+
+def play_history(actions) -> reconchess.GameHistory:
+    game = reconchess.LocalGame()
+    game.store_players("white", "black")
+    game.start()
+    for sense, move in zip(actions[::2], actions[1::2]):
+        game.sense(chess.parse_square(sense))
+        game.move(chess.Move.from_uci(move))
+        game.end_turn()
+    game.end()
+    return game.get_game_history()
+
+
+def test_actions_from_history():
+    assert actions_from_history(play_history(ACTIONS)) == ACTIONS
+
+
+def test_analyze_actions_tracks_board_counts():
+    rows = list(analyze_actions(ACTIONS))
+    assert [row["color"] for row in rows] == ["white", "black"] * 2 + ["white"]
+    assert rows[-1]["capture_square"] == "e8"
+    for row in rows:
+        assert row["boards_after_sense"] <= row["boards_before_sense"]
+        assert row["boards_before_move"] == row["boards_after_sense"]
+        assert 1 <= row["boards_after_move"] <= row["boards_before_move"]
+    for row, next_row in zip(rows, rows[1:]):
+        # The MHT expanded by the opponent move is the one that senses on the next turn
+        assert next_row["boards_before_sense"] == row["op_boards_after_op_move"]
+
+
+def test_analyze_corpus_resumes(tmp_path):
+    history_dir = tmp_path / "histories"
+    history_dir.mkdir()
+    play_history(ACTIONS).save(str(history_dir / "a.json"))
+    output = str(tmp_path / "metrics.csv")
+
+    assert analyze_corpus(str(history_dir), output, processes=1) == []
+    play_history(ACTIONS[:6]).save(str(history_dir / "b.json"))
+    assert analyze_corpus(str(history_dir), output, processes=1) == []
+
+    with open(output, newline="") as f:
+        games = [row["game"] for row in csv.DictReader(f)]
+    assert games == ["a.json"] * 5 + ["b.json"] * 3
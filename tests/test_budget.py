@@ -0,0 +1,71 @@
+import chess
+
+from reconchess_tools.budget import TimeBudgetController, mobility
+from reconchess_tools.mht import MultiHypothesisTracker
+
+
+def test_budget_shrinks_with_the_clock():
+    controller = TimeBudgetController(expected_turns=40, reserve_seconds=10)
+    controller.start_game(410)
+    boards = [chess.Board()] * 1_000
+    generous = controller.start_turn(boards)
+    controller.end_turn()
+    controller.update_clock(20)
+    tight = controller.start_turn(boards)
+    record = controller.end_turn()
+    assert controller.min_parent_boards <= tight < generous
+    # The 10 seconds above the reserve, over the 39 turns expected to be left
+    assert record.budget_seconds == 10 / 39
+    assert [r.turn for r in controller.records] == [0, 1]
+
+
+def test_hypothesis_cap_follows_parent_mobility():
+    controller = TimeBudgetController(seconds_per_child=1e-4)
+    controller.start_game(900)
+    quiet = controller.start_turn([chess.Board()])
+    controller.end_turn()
+    open_board = chess.Board("4k3/8/8/8/3Q4/8/8/R3K2R w KQ - 0 1")
+    sharp = controller.start_turn([open_board])
+    controller.end_turn()
+    assert mobility([open_board]) > mobility([chess.Board()])
+    assert sharp < quiet
+
+
+def test_vote_gives_up_depth_before_boards():
+    controller = TimeBudgetController(
+        seconds_per_analysis=0.01, min_vote_boards=50, max_depth=12, min_depth=4
+    )
+    controller.start_game(900)
+    controller.start_turn([chess.Board()])
+    relaxed = controller.plan_vote(2_000)
+    assert relaxed.depth == 12 and relaxed.multipv == 4
+    assert relaxed.boards <= controller.max_vote_boards
+
+    controller.update_clock(12)
+    controller.start_turn([chess.Board()])
+    hurried = controller.plan_vote(2_000)
+    assert hurried.depth < relaxed.depth
+    assert 1 <= hurried.boards < relaxed.boards
+    record = controller.end_turn()
+    assert record.vote == hurried
+
+
+def test_costs_are_calibrated_from_measurements():
+    controller = TimeBudgetController(
+        seconds_per_child=1e-5, seconds_per_analysis=0.01, smoothing=1.0
+    )
+    controller.start_game(900)
+    mht = MultiHypothesisTracker()
+    controller.start_turn(mht.boards)
+    requests = mobility(mht.boards)
+    controller.record_op_move(0.001 * requests, 1)
+    assert abs(controller.seconds_per_child - 0.001) < 1e-9
+    plan = controller.plan_vote(100)
+    controller.record_vote(
+        2 * plan.boards * controller.analysis_seconds(plan.depth, plan.multipv),
+        plan.boards,
+    )
+    assert abs(controller.seconds_per_analysis - 0.02) < 1e-9
+    record = controller.end_turn()
+    assert record.op_move_seconds == 0.001 * requests
+    assert record.predicted_op_move_seconds == requests * 1e-5
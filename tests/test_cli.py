@@ -0,0 +1,39 @@
+import subprocess
+import sys
+
+from click.testing import CliRunner
+
+from reconchess_tools.cli.main import cli
+
+HEAVY_MODULES = ["pygame", "pkg_resources", "requests", "reconchess"]
+
+
+def imported_modules(statement):
+    """The heavy modules a fresh interpreter has imported after running a statement"""
+    script = (
+        f"import sys\n{statement}\n"
+        f"print(','.join(m for m in {HEAVY_MODULES!r} if m in sys.modules))"
+    )
+    output = subprocess.run(
+        [sys.executable, "-c", script], check=True, capture_output=True, text=True
+    ).stdout
+    # pygame prints a greeting when imported
+    return set(filter(None, output.rstrip("\n").split("\n")[-1].split(",")))
+
+
+def test_listing_commands_imports_nothing_heavy():
+    assert imported_modules("import reconchess_tools.cli.main") == set()
+    result = CliRunner().invoke(cli, ["--help"])
+    assert result.exit_code == 0
+    assert "fetch-histories" in result.output
+
+
+def test_headless_modules_do_not_import_the_ui():
+    assert imported_modules("import reconchess_tools.analysis").isdisjoint(
+        {"pygame", "pkg_resources"}
+    )
+    # The piece images are loaded when a replay first draws them
+    imported_modules(
+        "import reconchess_tools.ui as ui\n"
+        "assert ui.piece_images.cache_info().currsize == 0"
+    )
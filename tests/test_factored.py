@@ -0,0 +1,81 @@
+from itertools import product
+
+import chess
+from tracking import fingerprints
+
+from reconchess_tools import factored
+from reconchess_tools.factored import Component, FactoredHypotheses, hidden_color
+from reconchess_tools.mht import MultiHypothesisTracker, board_fingerprint
+from reconchess_tools.strategy import non_dominated_sense
+from reconchess_tools.utilities import simulate_sense
+
+
+def test_independent_uncertainty_is_stored_as_a_product():
+    mht = MultiHypothesisTracker(factored=True)
+    board = chess.Board()
+    for op_move, move in [("b1c3", "e7e6"), ("h2h4", "d7d6"), ("c3b5", "g8f6")]:
+        board.push(chess.Move.from_uci(op_move))
+        mht.op_move(None)
+        mht.sense(chess.E7, simulate_sense(board, chess.E7))
+        move = chess.Move.from_uci(move)
+        mht.move(move, move, None)
+        board.push(move)
+    assert board_fingerprint(board) in fingerprints(mht.boards)
+    assert mht.boards.records < len(mht.boards) / 2
+
+
+def test_components_past_the_factor_budget_are_still_factored():
+    # A pawn on each of 12 squares or not, independently: 4,096 alternatives on 12 squares
+    squares = list(chess.SquareSet(chess.BB_RANK_3 | chess.BB_RANK_4))[:12]
+    alternatives = []
+    for occupied in product([False, True], repeat=len(squares)):
+        pawns = 0
+        for square, pawn in zip(squares, occupied):
+            if pawn:
+                pawns |= chess.BB_SQUARES[square]
+        alternatives.append((0, 0, 0, 0, 0, pawns, 0, 0))
+    assert len(squares) ** 2 * len(alternatives) > factored._FACTOR_BUDGET
+    factors = factored._factor(Component(alternatives))
+    assert sorted(len(factor) for factor in factors) == [2] * len(squares)
+
+
+def test_indexing_builds_the_boards_in_iteration_order():
+    mht = MultiHypothesisTracker(factored=True)
+    mht.op_move(None)
+    mht.sense(chess.B7, simulate_sense(chess.Board(), chess.B7))
+    mht.move(chess.Move.from_uci("e7e5"), chess.Move.from_uci("e7e5"), None)
+    mht.op_move(None)
+    boards = list(mht.boards)
+    assert len(boards) == len(mht.boards) > 1
+    assert [board.fen() for board in mht.boards[::7]] == [
+        board.fen() for board in boards[::7]
+    ]
+    assert mht.boards[-1].fen() == boards[-1].fen()
+
+
+def test_speculation_groups_share_equal_boards():
+    flat, factored = MultiHypothesisTracker(), MultiHypothesisTracker(factored=True)
+    move = chess.Move.from_uci("e7e5")
+    for mht in [flat, factored]:
+        mht.op_move(None)
+        mht.move(move, move, None)
+        mht.op_move(None)
+        mht.speculate_sense()
+    # non_dominated_sense compares the groups by the identity of their boards
+    assert non_dominated_sense(factored.sense_speculation) == non_dominated_sense(
+        flat.sense_speculation
+    )
+
+
+def test_loading_a_snapshot_factors_the_hidden_color(tmp_path):
+    flat = MultiHypothesisTracker()
+    flat.op_move(None)
+    path = str(tmp_path / "hypotheses.snapshot")
+    flat.save(path)
+    assert hidden_color(flat.boards) == chess.WHITE
+
+    mht = MultiHypothesisTracker(factored=True)
+    mht.load(path)
+    assert isinstance(mht.boards, FactoredHypotheses)
+    assert mht.boards.color == chess.WHITE
+    assert fingerprints(mht.boards) == fingerprints(flat.boards)
@@ -0,0 +1,81 @@
+import json
+import re
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+import reconchess
+from reconchess.bots.random_bot import RandomBot
+
+from reconchess_tools.histories import HistoryCache, fetch_histories, fetch_history
+
+
+@pytest.fixture(scope="module")
+def history():
+    _, _, history = reconchess.play_local_game(RandomBot(), RandomBot())
+    return history
+
+
+@pytest.fixture
+def server(history):
+    """A stand-in for the reconchess server that serves the same history for every game"""
+    body = json.dumps(
+        {"game_history": history}, cls=reconchess.GameHistoryEncoder
+    ).encode()
+    requested = []
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            match = re.fullmatch(r"/api/games/(\d+)/game_history", self.path)
+            requested.append(int(match.group(1)) if match else self.path)
+            if match is None or int(match.group(1)) >= 100:
+                self.send_response(404)
+                self.end_headers()
+                self.wfile.write(b"No such game")
+                return
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{httpd.server_port}", requested
+    httpd.shutdown()
+    httpd.server_close()
+
+
+def test_histories_are_downloaded_once(tmp_path, server, history):
+    url, requested = server
+    cache = HistoryCache(str(tmp_path))
+    results = fetch_histories(url, [1, 2, 3, 2, 100], ("user", "pass"), cache, 2)
+    assert list(results) == [1, 2, 3, 100]
+    assert isinstance(results[100], Exception)
+    for game_id in [1, 2, 3]:
+        assert results[game_id].num_turns() == history.num_turns()
+    assert sorted(requested) == [1, 2, 3, 100]
+
+    again = fetch_histories(url, [1, 2, 3], ("user", "pass"), cache)
+    assert fetch_history(url, 3, ("user", "pass"), cache).num_turns() == (
+        history.num_turns()
+    )
+    assert all(h.num_turns() == history.num_turns() for h in again.values())
+    assert sorted(requested) == [1, 2, 3, 100]
+    # The three games have the same content, so it is stored once
+    assert len(list((tmp_path / "objects").rglob("*.json"))) == 1
+
+
+def test_corrupt_objects_are_downloaded_again(tmp_path, server):
+    url, requested = server
+    cache = HistoryCache(str(tmp_path))
+    fetch_history(url, 7, None, cache)
+    (path,) = (tmp_path / "objects").rglob("*.json")
+    path.write_bytes(b"{}")
+    assert cache.get(url, 7) is None
+    fetch_history(url, 7, None, cache)
+    assert requested == [7, 7]
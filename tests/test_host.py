@@ -0,0 +1,96 @@
+import asyncio
+
+import chess
+import chess.engine
+from reconchess.bots.random_bot import RandomBot
+
+from reconchess_tools.host import ClockScheduler, EnginePool, GameHost
+
+
+class CountingEngine:
+    """Stands in for a UCI engine, recording the analyses it is asked for"""
+
+    def __init__(self):
+        self.analysed = []
+        self.closed = False
+
+    def analyse(self, board, limit, **kwargs):
+        self.analysed.append(board.fen())
+        return [{"pv": [next(iter(board.legal_moves))]}]
+
+    def quit(self):
+        self.closed = True
+
+
+class EngineBot(RandomBot):
+    def __init__(self, engine=None):
+        super().__init__()
+        self.engine = engine
+
+
+def test_host_plays_concurrent_games():
+    host = GameHost(workers=2)
+
+    async def play_all():
+        games = [host.play_local_game(RandomBot(), RandomBot()) for _ in range(4)]
+        return await asyncio.gather(*games)
+
+    try:
+        results = asyncio.run(play_all())
+    finally:
+        host.close()
+    assert len(results) == 4
+    for winner_color, win_reason, history in results:
+        assert history.num_turns() > 0
+        assert win_reason is not None
+
+
+def test_scheduler_serves_the_shortest_clock_first():
+    async def run():
+        scheduler = ClockScheduler(1)
+        order = []
+        await scheduler.acquire(100.0)
+
+        async def wait(name, seconds_left):
+            await scheduler.acquire(seconds_left)
+            order.append(name)
+            scheduler.release()
+
+        waiters = [
+            asyncio.create_task(wait("relaxed", 500.0)),
+            asyncio.create_task(wait("hurried", 5.0)),
+            asyncio.create_task(wait("middling", 50.0)),
+        ]
+        await asyncio.sleep(0)
+        scheduler.release()
+        await asyncio.gather(*waiters)
+        return order, scheduler.free
+
+    order, free = asyncio.run(run())
+    assert order == ["hurried", "middling", "relaxed"]
+    assert free == 1
+
+
+def test_engine_pool_caches_depth_limited_analyses():
+    engines = []
+
+    def factory():
+        engines.append(CountingEngine())
+        return engines[-1]
+
+    pool = EnginePool(size=2, engine_factory=factory)
+    board = chess.Board()
+    first = pool.analyse(board, chess.engine.Limit(depth=8), multipv=4)
+    again = pool.analyse(board.copy(), chess.engine.Limit(depth=8), multipv=4)
+    assert again is first
+    pool.analyse(board, chess.engine.Limit(depth=8), multipv=1)
+    pool.analyse(board, chess.engine.Limit(time=0.1))
+    pool.analyse(board, chess.engine.Limit(time=0.1))
+    assert sum(len(engine.analysed) for engine in engines) == 4
+    assert (pool.hits, pool.misses) == (1, 2)
+
+    host = GameHost(workers=1, engine_pool=pool)
+    assert host.create_player(EngineBot).engine is pool
+    assert isinstance(host.create_player(RandomBot), RandomBot)
+    host.close()
+    assert all(engine.closed for engine in engines)
@@ -0,0 +1,50 @@
+import io
+import json
+
+import chess
+
+from reconchess_tools.instrumentation import (
+    JsonlSink,
+    PrometheusSink,
+    RingBufferSink,
+)
+from reconchess_tools.mht import MultiHypothesisTracker
+from reconchess_tools.utilities import simulate_sense
+
+
+def test_mht_emits_an_event_per_update():
+    ring, stream, prometheus = (
+        RingBufferSink(capacity=3),
+        io.StringIO(),
+        PrometheusSink(),
+    )
+    mht = MultiHypothesisTracker(sinks=[ring, JsonlSink(stream), prometheus])
+    board = chess.Board()
+    board.push(chess.Move.from_uci("e2e4"))
+
+    mht.op_move(None)
+    mht.speculate_sense([chess.E4, chess.D4])
+    mht.sense(chess.E4, simulate_sense(board, chess.E4))
+    move = chess.Move.from_uci("e7e5")
+    mht.move(move, move, None)
+
+    events = [json.loads(line) for line in stream.getvalue().splitlines()]
+    assert [event["step"] for event in events] == [
+        "op_move",
+        "speculate_sense",
+        "sense",
+        "move",
+    ]
+    op_move = events[0]
+    # Every requestable move of white's first turn, with the moves that would be revised to the
+    # same taken move (such as pawn captures onto empty squares) collapsing into one board
+    assert op_move["boards_in"] == 1
+    assert op_move["boards_out"] == 21
+    assert op_move["branching_factor"] == op_move["dedup_collisions"] + 21
+    assert events[2]["boards_out"] == len(mht.boards) < events[2]["boards_in"]
+    assert all(event["duration_seconds"] >= 0 for event in events)
+
+    assert [event.step for event in ring.events] == ["speculate_sense", "sense", "move"]
+    metrics = prometheus.render()
+    assert 'reconchess_mht_updates_total{step="op_move"} 1' in metrics
+    assert 'reconchess_mht_boards{step="move"} 1' in metrics
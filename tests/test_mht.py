@@ -0,0 +1,97 @@
+import asyncio
+
+import chess
+import pytest
+from tracking import fingerprints, play
+
+from reconchess_tools.factored import FactoredHypotheses
+from reconchess_tools.mht import MultiHypothesisTracker, board_fingerprint
+from reconchess_tools.move_tree import MoveTreeHypotheses
+from reconchess_tools.utilities import simulate_sense
+
+
+def play_opening(mht: MultiHypothesisTracker):
+    board = chess.Board()
+    for op_move, sense_square, move in [
+        ("g1h3", chess.C2, "d7d5"),
+        ("h3f4", chess.F2, "e7e5"),
+    ]:
+        board.push(chess.Move.from_uci(op_move))
+        mht.op_move(None)
+        mht.sense(sense_square, simulate_sense(board, sense_square))
+        move = chess.Move.from_uci(move)
+        mht.move(move, move, None)
+        board.push(move)
+    return board
+
+
+def test_cooperative_updates_match_synchronous_updates():
+    expected = MultiHypothesisTracker()
+    play_opening(expected)
+    expected.op_move(None)
+    expected.speculate_sense([chess.E4])
+
+    mht = MultiHypothesisTracker()
+    play_opening(mht)
+    asyncio.run(mht.op_move_async(None))
+    asyncio.run(mht.speculate_sense_async([chess.E4]))
+
+    assert {board_fingerprint(board) for board in mht.boards} == {
+        board_fingerprint(board) for board in expected.boards
+    }
+    assert {
+        result: len(boards)
+        for result, boards in mht.sense_speculation[chess.E4].items()
+    } == {
+        result: len(boards)
+        for result, boards in expected.sense_speculation[chess.E4].items()
+    }
+
+
+def test_cooperative_updates_yield_to_the_event_loop():
+    mht = MultiHypothesisTracker(time_slice=0.0)
+    play_opening(mht)
+    ticks = 0
+
+    async def count_ticks():
+        nonlocal ticks
+        while True:
+            ticks += 1
+            await asyncio.sleep(0)
+
+    async def run():
+        ticker = asyncio.create_task(count_ticks())
+        await asyncio.sleep(0)
+        await mht.op_move_async(None)
+        ticker.cancel()
+
+    asyncio.run(run())
+    assert ticks > 1
+
+
+@pytest.mark.parametrize(
+    "options, representation",
+    [
+        ({"factored": True}, FactoredHypotheses),
+        ({"move_tree": True}, MoveTreeHypotheses),
+        ({"indexed": True}, list),
+    ],
+    ids=["factored", "move_tree", "indexed"],
+)
+def test_representations_track_like_a_list_of_boards(options, representation):
+    for seed in range(2):
+        flat, mht = MultiHypothesisTracker(), MultiHypothesisTracker(**options)
+
+        def check():
+            assert isinstance(mht.boards, representation)
+            assert fingerprints(mht.boards) == fingerprints(flat.boards)
+            if mht.index is not None:
+                # The index leaves the boards exactly as they are without it
+                assert [b.fen() for b in mht.boards] == [b.fen() for b in flat.boards]
+                assert len(mht.index) == len(mht.boards)
+            else:
+                # The other representations drop duplicate positions as they go
+                assert len(mht.boards) == len(fingerprints(mht.boards))
+
+        board = play([flat, mht], seed, check=check)
+        assert board_fingerprint(board) in fingerprints(mht.boards)
@@ -0,0 +1,62 @@
+import chess
+import pytest
+
+from reconchess_tools.mht import MultiHypothesisTracker, board_fingerprint
+from reconchess_tools.move_tree import MoveTreeHypotheses
+from reconchess_tools.strategy import non_dominated_sense
+from reconchess_tools.utilities import simulate_sense
+
+
+def test_children_share_their_ancestors():
+    mht = MultiHypothesisTracker(move_tree=True)
+    board = chess.Board()
+    for op_move, move in [("e2e4", "e7e5"), ("g1f3", "b8c6")]:
+        board.push(chess.Move.from_uci(op_move))
+        mht.op_move(None)
+        move = chess.Move.from_uci(move)
+        mht.move(move, move, None)
+        board.push(move)
+    boards = mht.boards
+    assert len(boards.roots) == 1
+    # Positions shared by several hypotheses' histories are stored once
+    assert boards.nodes < 4 * len(boards) - len(boards) // 2
+    order = [board_fingerprint(b) for b in boards]
+    assert order == [board_fingerprint(boards[index]) for index in range(len(boards))]
+    assert board_fingerprint(board) in order
+
+    kept = boards[:5]
+    assert isinstance(kept, MoveTreeHypotheses)
+    assert [board_fingerprint(b) for b in kept] == order[:5]
+    assert kept.nodes < boards.nodes
+    mht.keep_most_likely(5)
+    assert [board_fingerprint(b) for b in mht.boards] == order[:5]
+
+
+def test_speculation_groups_share_equal_boards():
+    flat, tree = MultiHypothesisTracker(), MultiHypothesisTracker(move_tree=True)
+    move = chess.Move.from_uci("e7e5")
+    for mht in [flat, tree]:
+        mht.op_move(None)
+        mht.move(move, move, None)
+        mht.op_move(None)
+        mht.speculate_sense()
+    # non_dominated_sense compares the groups by the identity of their boards
+    assert non_dominated_sense(tree.sense_speculation) == non_dominated_sense(
+        flat.sense_speculation
+    )
+    # Sensing with a speculation keeps a group, whose boards are still built correctly
+    board = chess.Board()
+    for uci in ["e2e4", "e7e5", "d2d4"]:
+        board.push(chess.Move.from_uci(uci))
+    for mht in [flat, tree]:
+        mht.sense(chess.D3, simulate_sense(board, chess.D3))
+    order = [board_fingerprint(b) for b in flat.boards]
+    assert [board_fingerprint(b) for b in tree.boards] == order
+    assert [board_fingerprint(b) for b in tree.boards[::-1]] == order[::-1]
+
+
+def test_move_tree_rejects_other_representations():
+    with pytest.raises(ValueError):
+        MultiHypothesisTracker(move_tree=True, factored=True)
+    with pytest.raises(ValueError):
+        MultiHypothesisTracker(move_tree=True, spill_threshold=100)
@@ -0,0 +1,121 @@
+import chess
+import pytest
+from tracking import fingerprints
+
+from reconchess_tools.mht import MultiHypothesisTracker
+from reconchess_tools.openings import (
+    OpeningTableError,
+    build_opening_table,
+    load_opening_table,
+    move_observation,
+    save_opening_table,
+)
+from reconchess_tools.utilities import simulate_move, simulate_sense
+
+# Sense squares and requested moves, alternating, as in the analysis module
+GAMES = [
+    ["e2", "e2e4", "e7", "e7e5", "d7", "g1f3", "00", "b8c6"],
+    ["e2", "e2e4", "e7", "e7e5", "d7", "g1f3", "f2", "g8f6"],
+    ["e2", "e2e4", "d7", "d7d5", "d7", "e4d5", "e4", "d8d5"],
+]
+
+
+def play_black(mht, actions):
+    """Track black's hypotheses through a game, returning them after each update"""
+    board = chess.Board()
+    sets = []
+    for turn, (sense, requested_move) in enumerate(zip(actions[::2], actions[1::2])):
+        requested_move = chess.Move.from_uci(requested_move)
+        taken_move, capture_square = simulate_move(board, requested_move)
+        if turn % 2 == 0:
+            board.push(taken_move)
+            mht.op_move(capture_square)
+            sets.append(fingerprints(mht.boards))
+            continue
+        if sense != "00":
+            square = chess.parse_square(sense)
+            mht.sense(square, simulate_sense(board, square))
+            sets.append(fingerprints(mht.boards))
+        mht.move(requested_move, taken_move, capture_square)
+        sets.append(fingerprints(mht.boards))
+        board.push(taken_move)
+    return sets
+
+
+def test_opening_table_round_trip(tmp_path):
+    table = build_opening_table(GAMES, max_turns=4, min_games=2)
+    # Both colors' first observations are shared by all games, the rest only by the first two
+    assert "s:e2:QKBPPP..." in table
+    assert "o:-" in table
+    assert "o:- s:d7:...pppbqk" not in table
+    assert len(table["o:- s:e7:...pppqkb m:e7e5:e7e5:- o:-"]) == 398
+    path = str(tmp_path / "openings.table")
+    save_opening_table(path, table)
+    loaded = load_opening_table(path)
+    assert len(loaded) == len(table)
+    for key, boards in table.items():
+        assert fingerprints(loaded.get(key)) == fingerprints(boards)
+    assert loaded.get("o:e4") is None
+
+
+def test_tracker_uses_the_table_until_the_game_leaves_it(tmp_path):
+    path = str(tmp_path / "openings.table")
+    save_opening_table(path, build_opening_table(GAMES, max_turns=4, min_games=2))
+    table = load_opening_table(path)
+
+    for actions in GAMES:
+        expected = play_black(MultiHypothesisTracker(), actions)
+        mht = MultiHypothesisTracker(opening_table=table)
+        assert play_black(mht, actions) == expected
+    # The last game diverges from the others at black's first sense
+    assert mht.opening_key is None
+
+    mht = MultiHypothesisTracker(opening_table=table)
+    play_black(mht, GAMES[0][:6])
+    assert mht.opening_key == "o:- s:e7:...pppqkb m:e7e5:e7e5:- o:-"
+    mht.reset()
+    assert mht.opening_key == ""
+
+
+def test_corrupt_opening_table_is_rejected(tmp_path):
+    path = str(tmp_path / "openings.table")
+    save_opening_table(path, build_opening_table(GAMES, max_turns=2, min_games=1))
+    with open(path, "r+b") as f:
+        f.seek(-1, 2)
+        f.write(b"\xff")
+    with pytest.raises(OpeningTableError):
+        load_opening_table(path)
+
+
+def test_passes_are_looked_up_in_the_table(tmp_path):
+    null = chess.Move.null()
+    assert move_observation(None, None, None) == move_observation(null, null, None)
+    revised = chess.Move.from_uci("d8d5")
+    assert move_observation(revised, None, None) == move_observation(
+        revised, null, None
+    )
+
+    # Black passes, then requests a queen move its own pawn blocks, which becomes a pass
+    games = [["e2", "e2e4", "e7", "0000", "d7", "g1f3", "00", "d8d5"]] * 2
+    path = str(tmp_path / "openings.table")
+    save_opening_table(path, build_opening_table(games, max_turns=4, min_games=2))
+    table = load_opening_table(path)
+    expected = MultiHypothesisTracker()
+    mht = MultiHypothesisTracker(opening_table=table)
+    board = chess.Board()
+    board.push(chess.Move.from_uci("e2e4"))
+    for tracker in [expected, mht]:
+        tracker.op_move(None)
+        tracker.sense(chess.E7, simulate_sense(board, chess.E7))
+    # The tracker needs a pass as the null move to compute it itself
+    expected.move(null, null, None)
+    mht.move(None, None, None)
+    board.push(null)
+    board.push(chess.Move.from_uci("g1f3"))
+    for tracker in [expected, mht]:
+        tracker.op_move(None)
+    expected.move(revised, null, None)
+    mht.move(revised, None, None)
+    assert mht.opening_key is not None
+    assert mht.opening_key.endswith("o:- m:d8d5:0000:-")
+    assert fingerprints(mht.boards) == fingerprints(expected.boards)
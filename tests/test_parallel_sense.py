@@ -0,0 +1,77 @@
+import multiprocessing
+import subprocess
+import sys
+
+import chess
+import pytest
+
+from reconchess_tools import parallel_sense
+from reconchess_tools.mht import MultiHypothesisTracker
+from reconchess_tools.strategy import minimax_sense, non_dominated_sense
+
+
+@pytest.fixture(scope="module")
+def pool():
+    with multiprocessing.Pool(2) as pool:
+        yield pool
+
+
+def tracked_boards():
+    mht = MultiHypothesisTracker()
+    mht.op_move(None)
+    mht.sense(None, [])
+    move = chess.Move.from_uci("e7e5")
+    mht.move(move, move, None)
+    mht.op_move(None)
+    return mht
+
+
+def test_parallel_speculation_matches_sequential(pool, monkeypatch):
+    monkeypatch.setattr(parallel_sense, "MIN_PARALLEL_BOARDS", 1)
+    mht = tracked_boards()
+    mht.speculate_sense()
+    sequential = mht.sense_speculation
+    mht.speculate_sense(pool=pool)
+    parallel = mht.sense_speculation
+
+    assert list(parallel) == list(sequential)
+    for square, results in sequential.items():
+        assert parallel[square].keys() == results.keys()
+        for result, boards in results.items():
+            assert [id(board) for board in parallel[square][result]] == [
+                id(board) for board in boards
+            ]
+    assert minimax_sense(parallel) == minimax_sense(sequential)
+    assert non_dominated_sense(parallel) == non_dominated_sense(sequential)
+
+
+def test_few_boards_are_partitioned_in_process():
+    mht = MultiHypothesisTracker()
+    # The pool is not used below MIN_PARALLEL_BOARDS
+    speculation = parallel_sense.speculate_sense_parallel(mht.boards, [9, 54], None)
+    assert list(speculation) == [9, 54]
+    assert all(len(results) == 1 for results in speculation.values())
+
+
+@pytest.mark.parametrize("tracker_first", [False, True])
+def test_workers_leave_the_shared_memory_to_the_parent(tracker_first):
+    # Workers forked before the parent starts its resource tracker start their own, and those
+    # forked after share the parent's, so both orders are checked for warnings at shutdown
+    script = f"""
+import multiprocessing
+from multiprocessing import resource_tracker
+from reconchess_tools import parallel_sense
+from reconchess_tools.mht import MultiHypothesisTracker
+parallel_sense.MIN_PARALLEL_BOARDS = 1
+if {tracker_first}:
+    resource_tracker.ensure_running()
+with multiprocessing.Pool(2) as pool:
+    mht = MultiHypothesisTracker()
+    mht.op_move(None)
+    for _ in range(2):
+        mht.speculate_sense(pool=pool)
+"""
+    result = subprocess.run(
+        [sys.executable, "-c", script], check=True, capture_output=True, text=True
+    )
+    assert result.stderr == ""
@@ -1,7 +1,16 @@
+import random
+from collections import Counter
+
 import chess
 import pytest
+from reconchess.utilities import move_actions
 
-from reconchess_tools.utilities import possible_requested_moves
+from reconchess_tools.utilities import (
+    possible_requested_moves,
+    random_requestable_move,
+    requestable_moves,
+    simulate_move,
+)
 
 
 @pytest.mark.parametrize(
@@ -72,3 +81,41 @@ def test_possible_requested_moves(move_history: str, expected: str):
         missing == set()
     ), f"Missing these expected moves {[m.uci() for m in missing]}"
     assert moves_under_test == expected_moves
+
+
+@pytest.mark.parametrize(
+    "fen",
+    [
+        chess.STARTING_FEN,
+        "r3k2r/pppq1ppp/2npbn2/4p3/2B1P3/2NP1N2/PPPQ1PPP/R3K2R w KQkq - 0 8",
+        "r3k2r/pppq1ppp/2npbn2/4p3/2B1P3/2NP1N2/PPPQ1PPP/R3K2R b KQkq - 0 8",
+        "1n2k3/PPP5/8/8/8/8/5ppp/4K1N1 w - - 0 1",
+        "1n2k3/PPP5/8/8/8/8/5ppp/4K1N1 b - - 0 1",
+        "rnbqkbnr/ppp1p1pp/8/3pPp2/8/8/PPPP1PPP/RNBQKBNR w KQkq f6 0 3",
+    ],
+)
+def test_requestable_moves_match_move_actions(fen: str):
+    board = chess.Board(fen)
+    moves = requestable_moves(board)
+    assert len(moves) == len(set(moves))
+    assert set(moves) == set(move_actions(board))
+
+
+def test_requestable_moves_match_move_actions_in_random_games():
+    rng = random.Random(0)
+    for _ in range(20):
+        board = chess.Board()
+        while (
+            board.king(chess.WHITE) is not None and board.king(chess.BLACK) is not None
+        ):
+            moves = requestable_moves(board)
+            assert set(moves) == set(move_actions(board)), board.fen()
+            taken_move, _ = simulate_move(board, rng.choice(moves))
+            board.push(taken_move)
+
+
+def test_random_requestable_move_covers_requestable_moves():
+    random.seed(0)
+    board = chess.Board("1n2k3/PPP5/8/8/8/8/5ppp/4K1N1 w - - 0 1")
+    counts = Counter(random_requestable_move(board) for _ in range(10_000))
+    assert set(counts) == set(requestable_moves(board))
@@ -0,0 +1,126 @@
+import chess
+import pytest
+from tracking import fingerprints
+
+from reconchess_tools.mht import MultiHypothesisTracker, board_fingerprint
+from reconchess_tools.priors import static_move_prior, uniform_move_prior
+from reconchess_tools.utilities import (
+    possible_requested_moves,
+    simulate_move,
+    simulate_sense,
+)
+
+
+def test_uniform_prior_keeps_every_board_with_equal_likelihood():
+    expected = MultiHypothesisTracker()
+    mht = MultiHypothesisTracker(move_prior=uniform_move_prior)
+    for tracker in [expected, mht]:
+        tracker.op_move(None)
+    assert fingerprints(mht.boards) == fingerprints(expected.boards)
+    assert sum(mht.likelihoods.values()) == pytest.approx(1)
+    # Requests that fail, such as pawn captures, all leave the board unchanged
+    passed = chess.Board()
+    passed.push(chess.Move.null())
+    unchanged = mht.likelihoods.pop(board_fingerprint(passed))
+    assert len({round(p, 9) for p in mht.likelihoods.values()}) == 1
+    assert unchanged > max(mht.likelihoods.values())
+
+
+def test_top_k_keeps_the_most_likely_boards():
+    full = MultiHypothesisTracker(move_prior=static_move_prior)
+    pruned = MultiHypothesisTracker(move_prior=static_move_prior, top_k=5)
+    for tracker in [full, pruned]:
+        tracker.op_move(None)
+    assert len(pruned.boards) == 5
+    assert fingerprints(pruned.boards) == set(pruned.likelihoods)
+    kept = [full.likelihoods[f] for f in pruned.likelihoods]
+    dropped = [p for f, p in full.likelihoods.items() if f not in pruned.likelihoods]
+    assert min(kept) >= max(dropped)
+    assert sum(pruned.likelihoods.values()) == pytest.approx(1)
+
+
+def test_prune_threshold_drops_unlikely_boards():
+    full = MultiHypothesisTracker(move_prior=static_move_prior)
+    pruned = MultiHypothesisTracker(move_prior=static_move_prior, prune_threshold=0.04)
+    for tracker in [full, pruned]:
+        tracker.op_move(None)
+    assert 0 < len(pruned.boards) < len(full.boards)
+    assert set(pruned.likelihoods) == {
+        fingerprint for fingerprint, p in full.likelihoods.items() if p >= 0.04
+    }
+
+
+def test_static_prior_favors_captures_and_development():
+    board = chess.Board("rnbqkbnr/ppp1pppp/8/3p4/4P3/8/PPPP1PPP/RNBQKBNR w KQkq - 0 2")
+    requested_moves = list(possible_requested_moves(board))
+    taken_moves = [simulate_move(board, move)[0] for move in requested_moves]
+    weights = dict(
+        zip(requested_moves, static_move_prior(board, requested_moves, taken_moves))
+    )
+    capture = chess.Move.from_uci("e4d5")
+    development = chess.Move.from_uci("g1f3")
+    rook_lift = chess.Move.from_uci("a2a3")
+    assert weights[capture] > weights[development] > weights[rook_lift]
+    assert weights[chess.Move.null()] < weights[rook_lift]
+
+
+def test_move_keeps_the_likelihoods_of_the_remaining_boards():
+    mht = MultiHypothesisTracker(move_prior=static_move_prior)
+    mht.op_move(None)
+    move = chess.Move.from_uci("e7e5")
+    mht.move(move, move, None)
+    assert fingerprints(mht.boards) == set(mht.likelihoods)
+    assert sum(mht.likelihoods.values()) == pytest.approx(1)
+
+
+def test_pruning_requires_a_prior():
+    with pytest.raises(ValueError):
+        MultiHypothesisTracker(top_k=10)
+    with pytest.raises(ValueError):
+        MultiHypothesisTracker(move_prior=static_move_prior, spill_threshold=10)
+
+
+def test_keep_most_likely_discards_the_least_likely_boards():
+    mht = MultiHypothesisTracker(move_prior=static_move_prior)
+    mht.op_move(None)
+    likelihoods = dict(mht.likelihoods)
+    mht.keep_most_likely(3)
+    assert len(mht.boards) == 3
+    kept = fingerprints(mht.boards)
+    assert set(mht.likelihoods) == kept
+    assert min(likelihoods[f] for f in kept) >= max(
+        p for f, p in likelihoods.items() if f not in kept
+    )
+
+
+def test_keep_most_likely_counts_boards_without_a_likelihood_as_1():
+    mht = MultiHypothesisTracker(move_prior=static_move_prior)
+    mht.op_move(None)
+    assigned = chess.Board()
+    for move in ["e2e4", "e7e5", "g1f3"]:
+        assigned.push(chess.Move.from_uci(move))
+    # As op_move and move weigh it, the assigned board outweighs any tracked board
+    mht.boards = list(mht.boards) + [assigned]
+    mht.keep_most_likely(2)
+    assert board_fingerprint(assigned) in fingerprints(mht.boards)
+
+
+def test_likelihoods_stay_a_distribution_over_the_boards():
+    mht = MultiHypothesisTracker(move_prior=static_move_prior)
+    board = chess.Board()
+    board.push(chess.Move.from_uci("e2e4"))
+    mht.op_move(None)
+    mht.sense(chess.G2, simulate_sense(board, chess.G2))
+    assert 1 < len(mht.boards) < 21
+    assert set(mht.likelihoods) == fingerprints(mht.boards)
+    assert sum(mht.likelihoods.values()) == pytest.approx(1)
+
+    move = chess.Move.from_uci("e7e5")
+    mht.move(move, move, None)
+    assert set(mht.likelihoods) == fingerprints(mht.boards)
+    assert sum(mht.likelihoods.values()) == pytest.approx(1)
+
+    mht.op_move(None)
+    mht.boards = mht.boards[:10]
+    assert set(mht.likelihoods) == fingerprints(mht.boards)
+    assert sum(mht.likelihoods.values()) == pytest.approx(1)
@@ -0,0 +1,44 @@
+import os
+from collections import Counter
+
+import chess
+from reconchess.bots.attacker_bot import AttackerBot
+from reconchess.bots.random_bot import RandomBot
+
+from reconchess_tools.profiling import (
+    play_profiled_game,
+    read_timings,
+    summarize_timings,
+)
+from reconchess_tools.tournament import run_tournament
+
+
+def test_play_profiled_game_times_every_callback(tmp_path):
+    _, _, history = play_profiled_game(
+        RandomBot(), AttackerBot(), str(tmp_path), profiler="cprofile"
+    )
+    assert history.get_white_player_name() == "RandomBot"
+
+    timings = read_timings(str(tmp_path / "timings.csv"))
+    for color in chess.COLORS:
+        name = chess.COLOR_NAMES[color]
+        calls = Counter(t.callback for t in timings if t.color == name)
+        assert calls["handle_game_start"] == calls["handle_game_end"] == 1
+        assert calls["choose_move"] == history.num_turns(color)
+        assert calls["choose_sense"] == history.num_turns(color)
+        turns = [
+            t.turn for t in timings if t.color == name and t.callback == "choose_move"
+        ]
+        assert turns == list(range(history.num_turns(color)))
+        assert os.path.exists(tmp_path / "profiles" / f"{name}_choose_move.prof")
+    assert all(t.seconds >= 0 and t.peak_bytes >= 0 for t in timings)
+
+    summary = summarize_timings(timings)
+    assert summary["white", "choose_move"]["calls"] == history.num_turns(chess.WHITE)
+
+
+def test_run_tournament_writes_profiles(tmp_path):
+    bot_a, bot_b = "reconchess.bots.random_bot", "reconchess.bots.attacker_bot"
+    run_tournament(bot_a, bot_b, 2, str(tmp_path), processes=1, profile=True)
+    for game in ["game_00000", "game_00001"]:
+        assert read_timings(str(tmp_path / "profiles" / game / "timings.csv"))
@@ -0,0 +1,58 @@
+import json
+
+import pytest
+import reconchess
+from reconchess.bots.random_bot import RandomBot
+
+from reconchess_tools.analysis import actions_from_history
+from reconchess_tools.records import (
+    GameRecordError,
+    history_from_record,
+    index_path,
+    load_game_records,
+    record_from_history,
+    save_game_records,
+)
+from reconchess_tools.simulator import simulate_games
+
+
+def test_games_are_read_back_by_index(tmp_path):
+    records = simulate_games(20, max_turns=30)
+    path = str(tmp_path / "games.rcg")
+    save_game_records(path, records)
+    loaded = load_game_records(path)
+    assert len(loaded) == len(records)
+    for index in [7, -1, 0]:
+        assert loaded[index] == records[index]
+    assert list(loaded) == records
+    with pytest.raises(IndexError):
+        loaded[20]
+
+
+def test_history_round_trips_through_a_record(tmp_path):
+    _, _, history = reconchess.play_local_game(RandomBot(), RandomBot())
+    history.store_players("alice", "bob")
+    path = str(tmp_path / "games.rcg")
+    save_game_records(path, [record_from_history(history)])
+    record = load_game_records(path)[0]
+    assert record.white_name == "alice" and record.black_name == "bob"
+    assert record.actions() == actions_from_history(history)
+
+    rebuilt = history_from_record(record)
+    encoded = json.dumps(history, cls=reconchess.GameHistoryEncoder)
+    assert json.dumps(rebuilt, cls=reconchess.GameHistoryEncoder) == encoded
+    assert (tmp_path / "games.rcg").stat().st_size < len(encoded) / 20
+
+
+def test_mismatched_index_is_rejected(tmp_path):
+    path = str(tmp_path / "games.rcg")
+    save_game_records(path, simulate_games(3, max_turns=10))
+    with open(path, "ab") as f:
+        f.write(b"\0")
+    with pytest.raises(GameRecordError):
+        load_game_records(path)
+    (tmp_path / "other.rcg").write_bytes(b"not a game record file")
+    with open(index_path(str(tmp_path / "other.rcg")), "wb") as f:
+        f.write(b"\0" * 24)
+    with pytest.raises(GameRecordError):
+        load_game_records(str(tmp_path / "other.rcg"))
@@ -0,0 +1,52 @@
+import chess
+
+from reconchess_tools.mht import MultiHypothesisTracker
+from reconchess_tools.ui import piece_heatmap
+from reconchess_tools.ui.cache import cache_path, load_analysis, save_analysis
+from reconchess_tools.ui.replay import View
+
+
+def make_views():
+    mht = MultiHypothesisTracker()
+    board = chess.Board()
+    views = [View(board)]
+    mht.op_move(None)
+    views[0].heatmap_white = piece_heatmap([board])
+    views[0].heatmap_black = piece_heatmap(mht.boards)
+    views[0].board_counts = {"white": 1, "black": len(mht.boards)}
+    views[0].sense_square = chess.E7
+    views[0].info = ["White to sense on turn 1"]
+    views[0].info_after_sense = ["White sensed at e7 on turn 1"]
+    board.push(chess.Move.from_uci("e2e4"))
+    views.append(View(board))
+    return views
+
+
+def test_analysis_round_trips_through_cache(tmp_path):
+    history = "e7 e2e4"
+    path = cache_path(str(tmp_path), history)
+    views = make_views()
+    save_analysis(path, history, views)
+
+    loaded = [View(view.true_board) for view in views]
+    assert load_analysis(path, history, loaded)
+    for view, loaded_view in zip(views, loaded):
+        for pane in ["white", "black", "after_sense"]:
+            heatmap = getattr(view, f"heatmap_{pane}")
+            loaded_heatmap = getattr(loaded_view, f"heatmap_{pane}")
+            if heatmap is None:
+                assert loaded_heatmap is None
+            else:
+                assert loaded_heatmap.num_boards == heatmap.num_boards
+                assert list(loaded_heatmap.counts) == list(heatmap.counts)
+        assert loaded_view.board_counts == view.board_counts
+        assert loaded_view.sense_square == view.sense_square
+        assert loaded_view.info == view.info
+        assert loaded_view.info_after_sense == view.info_after_sense
+
+
+def test_cache_is_ignored_for_other_histories(tmp_path):
+    path = cache_path(str(tmp_path), "e7 e2e4")
+    save_analysis(path, "e7 e2e4", make_views())
+    assert not load_analysis(path, "e7 d2d4", make_views())
+    assert not load_analysis(str(tmp_path / "missing.rcra"), "e7 e2e4", make_views())
@@ -0,0 +1,71 @@
+import math
+import random
+
+import chess
+import pytest
+
+from reconchess_tools.mht import MultiHypothesisTracker
+from reconchess_tools.sampled_sense import sampled_sense
+from reconchess_tools.strategy import SENSE_SQUARES, minimax_sense
+
+
+@pytest.fixture(scope="module")
+def mht():
+    mht = MultiHypothesisTracker()
+    mht.op_move(None)
+    move = chess.Move.from_uci("e7e5")
+    mht.move(move, move, None)
+    mht.op_move(None)
+    return mht
+
+
+def test_small_sets_are_scored_exactly(mht):
+    mht.speculate_sense()
+    speculation = mht.sense_speculation
+    total = len(mht.boards)
+
+    choice = sampled_sense(mht.boards)
+    assert choice.exact and choice.sample_size == total
+    assert choice.square == minimax_sense(speculation)
+    for estimate in choice.estimates:
+        largest = max(len(group) for group in speculation[estimate.square].values())
+        assert estimate.score == estimate.low == estimate.high == largest
+
+    expected = sampled_sense(mht.boards, criterion="expected")
+    entropy = sampled_sense(mht.boards, criterion="entropy")
+    for square, by_expected, by_entropy in zip(
+        SENSE_SQUARES, expected.estimates, entropy.estimates
+    ):
+        sizes = [len(group) for group in speculation[square].values()]
+        remaining = sum(size * size for size in sizes) / total
+        assert by_expected.score == pytest.approx(remaining)
+        bits = -sum(size / total * math.log2(size / total) for size in sizes)
+        assert by_entropy.score == pytest.approx(-bits)
+
+
+def test_large_sets_are_sampled_until_the_best_square_stands_out(mht):
+    random.seed(0)
+    boards = [board for board in mht.boards for _ in range(20)]
+    mht.speculate_sense()
+    worst_cases = {
+        square: 20 * max(len(group) for group in results.values())
+        for square, results in mht.sense_speculation.items()
+    }
+
+    choice = sampled_sense(boards, exact_threshold=0, initial_sample=200)
+    assert not choice.exact and choice.sample_size < len(boards)
+    best = next(e for e in choice.estimates if e.square == choice.square)
+    assert all(
+        best.high < estimate.low
+        for estimate in choice.estimates
+        if estimate.square != choice.square
+    )
+    assert worst_cases[choice.square] == min(worst_cases.values())
+
+
+def test_time_budget_stops_sampling(mht):
+    boards = [board for board in mht.boards for _ in range(20)]
+    choice = sampled_sense(boards, exact_threshold=0, initial_sample=100, seconds=0)
+    assert choice.sample_size == 100
+    with pytest.raises(ValueError):
+        sampled_sense(boards, criterion="variance")
@@ -0,0 +1,55 @@
+import random
+
+import chess
+from reconchess import WinReason
+
+from reconchess_tools.analysis import analyze_actions
+from reconchess_tools.simulator import decode_move, encode_move, simulate_games
+
+
+def test_move_codes_round_trip():
+    for uci in ["e2e4", "a7b8q", "h2h1n", "e1g1", "0000"]:
+        move = chess.Move.from_uci(uci)
+        assert decode_move(encode_move(move)) == move
+    assert encode_move(None) == 0
+
+
+def test_simulate_games_records_finished_games():
+    random.seed(0)
+    records = simulate_games(20)
+    assert len(records) == 20
+    for record in records:
+        assert record.win_reason in (WinReason.KING_CAPTURE, WinReason.MOVE_LIMIT)
+        assert (record.winner is None) == (record.win_reason != WinReason.KING_CAPTURE)
+        board = chess.Board()
+        for taken_move in record.taken_moves:
+            board.push(decode_move(taken_move))
+        if record.winner is not None:
+            assert board.king(not record.winner) is None
+            assert board.king(record.winner) is not None
+
+
+def test_simulate_games_with_scripted_policies():
+    actions = "e7 e2e4 d2 f7f6 f7 d1h5 b2 g7g5 f7 h5e8".split()
+
+    def sense_policy(games):
+        return [chess.parse_square(actions[2 * len(game.senses)]) for game in games]
+
+    def move_policy(games):
+        return [
+            chess.Move.from_uci(actions[2 * len(game.requested_moves) + 1])
+            for game in games
+        ]
+
+    records = simulate_games(3, sense_policy, move_policy)
+    for record in records:
+        assert record.winner == chess.WHITE
+        assert record.win_reason == WinReason.KING_CAPTURE
+        assert record.actions() == actions
+    assert len(list(analyze_actions(records[0].actions()))) == 5
+
+
+def test_simulate_games_stops_at_max_turns():
+    random.seed(0)
+    records = simulate_games(5, max_turns=6)
+    assert all(len(record.senses) <= 6 for record in records)
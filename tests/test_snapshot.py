@@ -0,0 +1,45 @@
+import chess
+import pytest
+
+from reconchess_tools.mht import MultiHypothesisTracker, board_fingerprint
+from reconchess_tools.snapshot import SnapshotError, load_snapshot
+
+
+def test_snapshot_round_trips_hypotheses(tmp_path):
+    mht = MultiHypothesisTracker()
+    board = chess.Board()
+    board.push(chess.Move.from_uci("e2e4"))
+    mht.boards = [board]
+    mht.op_move(None)  # includes black double pushes, which set an en passant square
+    assert any(board.ep_square is not None for board in mht.boards)
+    path = str(tmp_path / "mht.rcmh")
+    mht.save(path)
+
+    loaded = MultiHypothesisTracker()
+    loaded.load(path)
+    assert [board_fingerprint(b) for b in loaded.boards] == [
+        board_fingerprint(b) for b in mht.boards
+    ]
+    assert load_snapshot(path)[-1].epd() == mht.boards[-1].epd()
+
+    # The restored tracker keeps working
+    mht.op_move(None)
+    loaded.op_move(None)
+    assert {board_fingerprint(b) for b in loaded.boards} == {
+        board_fingerprint(b) for b in mht.boards
+    }
+
+
+def test_corrupt_snapshot_is_rejected(tmp_path):
+    mht = MultiHypothesisTracker()
+    mht.op_move(None)
+    path = tmp_path / "mht.rcmh"
+    mht.save(str(path))
+    data = bytearray(path.read_bytes())
+    data[-1] ^= 1
+    path.write_bytes(bytes(data))
+    with pytest.raises(SnapshotError):
+        load_snapshot(str(path))
+    path.write_bytes(b"")
+    with pytest.raises(SnapshotError):
+        load_snapshot(str(path))
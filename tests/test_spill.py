@@ -0,0 +1,54 @@
+import os
+from collections import Counter
+
+import chess
+
+from reconchess_tools.mht import MultiHypothesisTracker, board_fingerprint
+from reconchess_tools.snapshot import Snapshot
+from reconchess_tools.strategy import non_dominated_sense
+from reconchess_tools.utilities import simulate_sense
+
+
+def fingerprints(mht):
+    return Counter(board_fingerprint(board) for board in mht.boards)
+
+
+def test_spilled_tracking_matches_in_memory_tracking(tmp_path):
+    expected = MultiHypothesisTracker()
+    mht = MultiHypothesisTracker(spill_threshold=50, spill_dir=str(tmp_path))
+    board = chess.Board()
+    spilled = False
+    for op_move, sense_square, move in [
+        ("g1h3", None, "d7d5"),
+        ("h3f4", chess.F2, "e7e5"),
+        ("b1c3", chess.B2, "g8f6"),
+    ]:
+        board.push(chess.Move.from_uci(op_move))
+        for tracker in [expected, mht]:
+            tracker.op_move(None)
+        assert fingerprints(mht) == fingerprints(expected)
+        spilled |= isinstance(mht.boards, Snapshot)
+        for tracker in [expected, mht]:
+            tracker.sense(sense_square, simulate_sense(board, sense_square))
+            move_ = chess.Move.from_uci(move)
+            tracker.move(move_, move_, None)
+        assert fingerprints(mht) == fingerprints(expected)
+        board.push(chess.Move.from_uci(move))
+    assert spilled
+    # Only the file behind the current hypothesis set is left on disk
+    assert len(os.listdir(tmp_path)) <= 1
+    mht.reset()
+    assert os.listdir(tmp_path) == []
+
+
+def test_spilled_speculation_groups_share_equal_boards(tmp_path):
+    expected = MultiHypothesisTracker()
+    mht = MultiHypothesisTracker(spill_threshold=10, spill_dir=str(tmp_path))
+    for tracker in [expected, mht]:
+        tracker.op_move(None)
+        tracker.speculate_sense()
+    assert isinstance(mht.boards, Snapshot)
+    # non_dominated_sense compares the groups by the identity of their boards
+    assert non_dominated_sense(mht.sense_speculation) == non_dominated_sense(
+        expected.sense_speculation
+    )
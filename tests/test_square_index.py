@@ -0,0 +1,84 @@
+import chess
+
+from reconchess_tools.mht import MultiHypothesisTracker
+from reconchess_tools.square_index import SquareIndex
+from reconchess_tools.utilities import simulate_sense
+
+
+def test_group_sizes_match_sense_speculation():
+    mht = MultiHypothesisTracker(indexed=True)
+    mht.op_move(None)
+    move = chess.Move.from_uci("e7e5")
+    mht.move(move, move, None)
+    mht.op_move(None)
+    mht.speculate_sense()
+    for square, results in mht.sense_speculation.items():
+        sizes = {result: len(group) for result, group in results.items()}
+        assert mht.sense_group_sizes([square])[square] == sizes
+    mht.indexed, mht.index = False, None
+    assert mht.sense_group_sizes() == {
+        square: {result: len(group) for result, group in results.items()}
+        for square, results in mht.sense_speculation.items()
+    }
+
+
+def test_matching_filters_like_simulated_senses():
+    mht = MultiHypothesisTracker()
+    mht.op_move(None)
+    index = SquareIndex(mht.boards)
+    for square in [chess.B2, chess.E4, chess.H7]:
+        result = simulate_sense(mht.boards[3], square)
+        expected = [b for b in mht.boards if simulate_sense(b, square) == result]
+        assert index.boards(index.matching(result)) == expected
+    index.keep(index.matching(simulate_sense(mht.boards[3], chess.B2)))
+    assert mht.boards[3] in index.boards()
+    assert len(index) < len(mht.boards)
+
+
+def test_trimmed_boards_stay_trimmed():
+    trackers = [MultiHypothesisTracker(), MultiHypothesisTracker(indexed=True)]
+    board = chess.Board()
+    board.push(chess.Move.from_uci("e2e4"))
+    for mht in trackers:
+        mht.op_move(None)
+        mht.boards = mht.boards[:5]
+    for mht in trackers:
+        mht.sense(chess.B7, simulate_sense(board, chess.B7))
+    assert len(trackers[1].boards) == len(trackers[0].boards) == 5
+
+    move = chess.Move.from_uci("b7b6")
+    for mht in trackers:
+        mht.move(move, move, None)
+        mht.op_move(None)
+        del mht.boards[3:]
+    for mht in trackers:
+        mht.sense(chess.B2, simulate_sense(mht.boards[0], chess.B2))
+        move = chess.Move.from_uci("a7a6")
+        mht.move(move, move, None)
+    assert [b.fen() for b in trackers[1].boards] == [
+        b.fen() for b in trackers[0].boards
+    ]
+    assert len(trackers[1].boards) <= 3
+    assert len(trackers[1].index) == len(trackers[1].boards)
+
+
+def test_reordered_boards_are_reindexed():
+    mht = MultiHypothesisTracker(indexed=True)
+    boards = []
+    for reply in ["d7d5", "c7c5", "e7e5", "g8f6"]:
+        board = chess.Board()
+        board.push(chess.Move.from_uci("e2e4"))
+        board.push(chess.Move.from_uci(reply))
+        boards.append(board)
+    mht.boards = boards
+    # Reordering in place, as MhtBot shuffles the boards, keeps their number
+    mht.boards.reverse()
+    move = chess.Move.from_uci("e4d5")
+    mht.move(move, move, chess.D5)
+    assert [b.fen() for b in mht.boards] == [
+        "rnbqkbnr/ppp1pppp/8/3P4/8/8/PPPP1PPP/RNBQKBNR b KQkq - 0 2"
+    ]
+    assert mht.index.boards() == mht.boards
+    assert mht.sense_group_sizes([chess.D6]) == {
+        chess.D6: {tuple(simulate_sense(mht.boards[0], chess.D6)): 1}
+    }
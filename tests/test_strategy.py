@@ -0,0 +1,75 @@
+import random
+
+import chess
+from reconchess.utilities import move_actions
+
+from reconchess_tools.strategy import certain_win, king_attackers
+from reconchess_tools.utilities import random_requestable_move, simulate_move
+
+
+def reference_certain_win(boards):
+    """certain_win by simulating every requested move on every board"""
+    for requested_move in move_actions(boards[0]):
+        for board in boards:
+            op_king_square = board.king(not board.turn)
+            if requested_move.to_square != op_king_square:
+                break
+            if board.color_at(requested_move.from_square) != board.turn:
+                break
+            _, capture_square = simulate_move(board, requested_move)
+            if capture_square != op_king_square:
+                break
+        else:
+            return requested_move
+
+
+def random_boards(count, seed=0):
+    random.seed(seed)
+    boards = []
+    while len(boards) < count:
+        board = chess.Board()
+        for _ in range(random.randrange(60)):
+            move = random_requestable_move(board)
+            taken_move, _ = simulate_move(board, move)
+            board.push(taken_move or chess.Move.null())
+            if not board.king(chess.WHITE) or not board.king(chess.BLACK):
+                break
+        boards.append(board)
+    return boards
+
+
+def test_king_attackers_match_board_attackers():
+    boards = random_boards(300)
+    expected = [
+        int(board.attackers(board.turn, board.king(not board.turn)))
+        if board.king(not board.turn) is not None
+        else 0
+        for board in boards
+    ]
+    assert king_attackers(boards) == expected
+    assert any(expected)
+
+
+def test_certain_win_needs_a_capture_on_every_board():
+    # The rook on h1 and the pawn on g7 capture the king on h8, unless the knight blocks the rook
+    open_file = chess.Board("7k/6P1/8/8/8/8/8/4K2R w - - 0 1")
+    blocked = open_file.copy()
+    blocked.set_piece_at(chess.H4, chess.Piece(chess.KNIGHT, chess.BLACK))
+    elsewhere = chess.Board("6k1/6P1/8/8/8/8/8/4K2R w - - 0 1")
+    open_rank = chess.Board("R6k/8/8/8/8/8/8/4K3 w - - 0 1")
+
+    assert chess.popcount(king_attackers([open_file])[0]) == 2
+    assert king_attackers([blocked]) == [chess.BB_G7]
+    assert certain_win([open_file, blocked]).from_square == chess.G7
+    assert certain_win([open_file, elsewhere]) is None
+    assert certain_win([open_rank]) == chess.Move.from_uci("a8h8")
+    for boards in [[open_file], [open_file, blocked], [open_file, elsewhere]]:
+        assert certain_win(boards) == reference_certain_win(boards)
+
+
+def test_certain_win_matches_simulation():
+    boards = random_boards(200, seed=1)
+    for i in range(0, len(boards), 2):
+        for group in [boards[i : i + 1], boards[i : i + 2]]:
+            if len({board.turn for board in group}) == 1:
+                assert certain_win(group) == reference_certain_win(group)
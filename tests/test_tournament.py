@@ -0,0 +1,36 @@
+import json
+import os
+
+import pytest
+
+from reconchess_tools.tournament import run_tournament, summarize, wilson_interval
+
+
+def test_wilson_interval():
+    assert wilson_interval(0, 0) == (0.0, 1.0)
+    low, high = wilson_interval(5, 10)
+    assert low == pytest.approx(0.2366, abs=1e-4)
+    assert high == pytest.approx(0.7634, abs=1e-4)
+    low, high = wilson_interval(10, 10)
+    assert 0.6 < low < 1.0
+    assert high == 1.0
+
+
+def test_run_tournament_alternates_colors(tmp_path):
+    bot_a, bot_b = "reconchess.bots.random_bot", "reconchess.bots.attacker_bot"
+    results = run_tournament(bot_a, bot_b, 4, str(tmp_path), processes=1)
+    assert [(result["white"], result["black"]) for result in results] == [
+        (bot_a, bot_b),
+        (bot_b, bot_a),
+    ] * 2
+    for result in results:
+        assert os.path.exists(result["history"])
+    with open(tmp_path / "results.json") as f:
+        assert json.load(f) == results
+
+    summary = summarize(results)
+    for bot in [bot_a, bot_b]:
+        assert summary[bot]["games"] == 4
+        assert summary[bot]["turns"] > 0
+        assert 0 <= summary[bot]["score"] <= 1
+    assert summary[bot_a]["wins"] == summary[bot_b]["losses"]
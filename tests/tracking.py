@@ -0,0 +1,60 @@
+"""Helpers for tests that track the same game with several trackers"""
+
+import random
+from typing import Callable, Iterable, Sequence
+
+import chess
+
+from reconchess_tools.mht import MultiHypothesisTracker
+from reconchess_tools.utilities import (
+    board_fingerprint,
+    random_requestable_move,
+    simulate_move,
+    simulate_sense,
+)
+
+
+def fingerprints(boards: Iterable[chess.Board]) -> set:
+    return {board_fingerprint(board) for board in boards}
+
+
+def play(
+    trackers: Sequence[MultiHypothesisTracker],
+    seed: int,
+    turns: int = 3,
+    check: Callable[[], None] = lambda: None,
+) -> chess.Board:
+    """Play the same random game against every tracker, from black's side
+
+    Every other turn the trackers speculate on the sense square first, so that both ways of
+    sensing are covered. check is called after every update. Returns the true board.
+    """
+    random.seed(seed)
+    board = chess.Board()
+    for turn in range(turns):
+        op_move = random_requestable_move(board)
+        taken_move, capture_square = simulate_move(board, op_move)
+        board.push(taken_move or chess.Move.null())
+        for tracker in trackers:
+            tracker.op_move(capture_square)
+        check()
+        if board.king(chess.BLACK) is None:
+            break
+
+        square = random.choice(chess.SQUARES)
+        result = simulate_sense(board, square)
+        for tracker in trackers:
+            if turn % 2:
+                tracker.speculate_sense([square])
+            tracker.sense(square, result)
+        check()
+
+        requested_move = random_requestable_move(board)
+        taken_move, capture_square = simulate_move(board, requested_move)
+        for tracker in trackers:
+            tracker.move(requested_move, taken_move, capture_square)
+        check()
+        board.push(taken_move or chess.Move.null())
+        if board.king(chess.WHITE) is None:
+            break
+    return board